@@ -0,0 +1,423 @@
+import io
+import json
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mashumaro import DataClassDictMixin
+
+# Forms kept by default; every other form is skipped while indexing, which keeps the index small
+DEFAULT_INDEXED_FORMS = ("10-K", "10-Q", "20-F")
+
+# (cik, form, filing date, accession number, report date, primary document, isXBRL, isInlineXBRL)
+FilingRow = Tuple[int, str, str, str, str, str, int, int]
+
+
+@dataclass
+class IndexedCompany:
+    cik: int
+    name: str
+    state_of_incorporation: str
+    ein: str
+    # the "addresses" of the company's submissions; None if it was only found in full-index files
+    addresses: Optional[Dict[str, Any]]
+    # date the company's submissions were written to submissions.zip, so filings made after it
+    # may be missing; "" if it was only found in full-index files
+    updated_on: str
+
+
+@dataclass
+class IndexedFiling:
+    form: str
+    filing_date: str
+    accession_number: str
+    report_date: str
+    # "" if unknown, e.g. for filings only found in full-index files
+    primary_document: str
+    is_xbrl: int
+    is_inline_xbrl: int
+
+
+@dataclass
+class IndexSource(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    path: str
+    kind: str
+    filings: int
+    first_filing_date: Optional[str]
+    last_filing_date: Optional[str]
+    indexed_at: float
+
+
+class FilingIndex:
+    """
+    A local index of EDGAR filings, built from the SEC's bulk data instead of one request per company:
+
+        submissions.zip: the nightly archive of every company's submissions
+            (https://www.sec.gov/Archives/edgar/daily-index/bulkdata/submissions.zip)
+        form.idx, company.idx or master.idx: the quarterly lists of every filing
+            (https://www.sec.gov/Archives/edgar/full-index/)
+
+    It's an SQLite database whose filings table is clustered on (CIK, form, filing date), so the
+    filings of a company for a range of dates are a single range scan. Full-index files don't name
+    the primary document of a filing, or anything about the company but its name; when both
+    sources list a filing, the submissions are kept.
+
+    Lookups are safe from any thread. Indexing opens its own connection, so it can run in a thread
+    of its own while lookups go on.
+    """
+
+    SCHEMA_VERSION = 2
+    # files of submissions.zip indexed per transaction
+    BATCH_SIZE = 2000
+    # the full-index files listing every filing; the others (e.g. xbrl.idx) only list some
+    FULL_INDEX_FILES = ("form.idx", "company.idx", "master.idx")
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        with self._connection:
+            if version != FilingIndex.SCHEMA_VERSION:
+                for table in ("companies", "filings", "sources"):
+                    self._connection.execute(f"DROP TABLE IF EXISTS {table}")
+                self._connection.execute(
+                    f"PRAGMA user_version = {FilingIndex.SCHEMA_VERSION}"
+                )
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS companies (
+                    cik INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    state_of_incorporation TEXT NOT NULL,
+                    ein TEXT NOT NULL,
+                    addresses TEXT,
+                    updated_on TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS filings (
+                    cik INTEGER NOT NULL,
+                    form TEXT NOT NULL,
+                    filing_date TEXT NOT NULL,
+                    accession_number TEXT NOT NULL,
+                    report_date TEXT NOT NULL,
+                    primary_document TEXT NOT NULL,
+                    is_xbrl INTEGER NOT NULL,
+                    is_inline_xbrl INTEGER NOT NULL,
+                    PRIMARY KEY (cik, form, filing_date, accession_number)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS sources (
+                    path TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    filings INTEGER NOT NULL,
+                    first_filing_date TEXT,
+                    last_filing_date TEXT,
+                    indexed_at REAL NOT NULL
+                );
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def company(self, cik: int) -> Optional[IndexedCompany]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT cik, name, state_of_incorporation, ein, addresses, updated_on FROM companies WHERE cik = ?",
+                (cik,),
+            ).fetchone()
+        if row is None:
+            return None
+        return IndexedCompany(
+            row[0],
+            row[1],
+            row[2],
+            row[3],
+            json.loads(row[4]) if row[4] else None,
+            row[5],
+        )
+
+    def filings(
+        self, cik: int, forms: List[str], start_date: str, end_date: str
+    ) -> List[IndexedFiling]:
+        """The company's filings of the given forms filed between the dates (inclusive), newest first"""
+        placeholders = ", ".join("?" for _ in forms)
+        with self._lock:
+            rows = self._connection.execute(
+                f"""
+                SELECT form, filing_date, accession_number, report_date, primary_document, is_xbrl, is_inline_xbrl
+                FROM filings
+                WHERE cik = ? AND form IN ({placeholders}) AND filing_date BETWEEN ? AND ?
+                ORDER BY filing_date DESC, accession_number DESC
+                """,
+                (cik, *forms, start_date, end_date),
+            ).fetchall()
+        return [IndexedFiling(*row) for row in rows]
+
+    def sources(self) -> List[IndexSource]:
+        """The files indexed so far, oldest first"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, kind, filings, first_filing_date, last_filing_date, indexed_at FROM sources ORDER BY indexed_at"
+            ).fetchall()
+        return [IndexSource(*row) for row in rows]
+
+    def ingest(
+        self,
+        path: Path,
+        forms: Iterable[str] = DEFAULT_INDEXED_FORMS,
+        on_progress: Optional[Callable[[int], None]] = None,
+    ) -> List[IndexSource]:
+        """
+        Indexes a submissions.zip, a full-index file (form.idx, company.idx or master.idx), or every
+        such file in a folder (e.g. a copy of full-index/2023/). Blocks until it's done, so run it in a
+        thread. on_progress is called with the number of filings indexed so far, every now and then.
+        Returns the sources indexed.
+        """
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(
+                file
+                for file in path.rglob("*")
+                if file.suffix.lower() == ".zip"
+                or file.name.lower() in FilingIndex.FULL_INDEX_FILES
+            )
+        else:
+            files = [path]
+        if not files:
+            raise ValueError(f"No submissions.zip or .idx files in {path}")
+        forms = set(forms)
+        indexed = 0
+        sources = []
+
+        def progress(count: int):
+            if on_progress is not None:
+                on_progress(indexed + count)
+
+        for file in files:
+            if file.suffix.lower() == ".zip":
+                source = self._ingest_submissions_zip(file, forms, progress)
+            else:
+                source = self._ingest_full_index(file, forms, progress)
+            indexed += source.filings
+            sources.append(source)
+        return sources
+
+    def _ingest_submissions_zip(
+        self, path: Path, forms: set, on_progress: Callable[[int], None]
+    ) -> IndexSource:
+        connection = self._connect()
+        filing_count = 0
+        dates: List[str] = []
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = [
+                    info
+                    for info in archive.infolist()
+                    if re.fullmatch(
+                        r"CIK\d{10}(-submissions-\d+)?\.json", info.filename
+                    )
+                ]
+                for start in range(0, len(members), FilingIndex.BATCH_SIZE):
+                    end = start + FilingIndex.BATCH_SIZE
+                    companies = []
+                    filings: List[FilingRow] = []
+                    for info in members[start:end]:
+                        cik = int(info.filename[3:13])
+                        with archive.open(info) as file:
+                            document = json.load(io.TextIOWrapper(file, "utf-8"))
+                        if "filings" in document:
+                            companies.append(
+                                (
+                                    cik,
+                                    document.get("name") or "",
+                                    document.get("stateOfIncorporation") or "",
+                                    document.get("ein") or "",
+                                    json.dumps(document.get("addresses")),
+                                    date(*info.date_time[:3]).isoformat(),
+                                )
+                            )
+                            columns = document["filings"].get("recent", {})
+                        else:  # one of the pages of older filings of a company
+                            columns = document
+                        filings.extend(
+                            FilingIndex._submission_rows(cik, columns, forms)
+                        )
+                    with connection:
+                        connection.executemany(
+                            "INSERT OR REPLACE INTO companies VALUES (?, ?, ?, ?, ?, ?)",
+                            companies,
+                        )
+                        connection.executemany(
+                            "INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            filings,
+                        )
+                    filing_count += len(filings)
+                    dates.extend(FilingIndex._date_range(filings))
+                    on_progress(filing_count)
+            return self._record_source(
+                connection, path, "submissions", filing_count, dates
+            )
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _submission_rows(
+        cik: int, columns: Dict[str, List[Any]], forms: set
+    ) -> Iterator[FilingRow]:
+        for i, form in enumerate(columns.get("form", [])):
+            if form in forms:
+                yield (
+                    cik,
+                    form,
+                    columns["filingDate"][i],
+                    columns["accessionNumber"][i],
+                    columns["reportDate"][i] or "",
+                    columns["primaryDocument"][i] or "",
+                    columns["isXBRL"][i] or 0,
+                    columns["isInlineXBRL"][i] or 0,
+                )
+
+    def _ingest_full_index(
+        self, path: Path, forms: set, on_progress: Callable[[int], None]
+    ) -> IndexSource:
+        companies: Dict[int, str] = {}
+        filings: List[FilingRow] = []
+        with open(path, mode="r", encoding="latin-1") as file:
+            for cik, name, form, filing_date, file_name in FilingIndex._read_full_index(
+                file
+            ):
+                if form not in forms:
+                    continue
+                # e.g. edgar/data/320193/0000320193-23-000106.txt
+                accession_number = Path(file_name).stem
+                companies.setdefault(cik, name)
+                filings.append((cik, form, filing_date, accession_number, "", "", 0, 0))
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO companies VALUES (?, ?, '', '', NULL, '')",
+                    companies.items(),
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO filings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    filings,
+                )
+            on_progress(len(filings))
+            return self._record_source(
+                connection,
+                path,
+                "full-index",
+                len(filings),
+                list(FilingIndex._date_range(filings)),
+            )
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _read_full_index(
+        lines: Iterable[str],
+    ) -> Iterator[Tuple[int, str, str, str, str]]:
+        """
+        Yields (CIK, company name, form, filing date, file name) for each filing of a full-index file.
+        master.idx separates its columns with "|"; form.idx and company.idx have fixed-width columns,
+        which start where the titles of the header start.
+        """
+        lines = iter(lines)
+        header = next(
+            (line for line in lines if "Company Name" in line and "CIK" in line), None
+        )
+        if header is None:
+            raise ValueError("Not an EDGAR full-index file")
+        next(lines, None)  # the line of dashes under the header
+        if "|" in header:
+            titles = [title.strip() for title in header.split("|")]
+
+            def split(line: str) -> List[str]:
+                return line.split("|")
+
+        else:
+            titles = re.split(r"\s{2,}", header.strip())
+            starts = [header.index(title) for title in titles]
+            bounds = list(zip(starts, starts[1:] + [None]))  # type: ignore
+
+            def split(line: str) -> List[str]:
+                return [line[start:end] for start, end in bounds]
+
+        for line in lines:
+            if not line.strip():
+                continue
+            row = dict(zip(titles, (value.strip() for value in split(line))))
+            filing_date = row["Date Filed"]
+            if len(filing_date) == 8:  # older files leave out the dashes
+                filing_date = f"{filing_date[:4]}-{filing_date[4:6]}-{filing_date[6:]}"
+            yield (
+                int(row["CIK"]),
+                row["Company Name"],
+                row["Form Type"],
+                filing_date,
+                row.get("File Name") or row["Filename"],
+            )
+
+    @staticmethod
+    def _date_range(filings: List[FilingRow]) -> Iterator[str]:
+        if filings:
+            yield min(filing[2] for filing in filings)
+            yield max(filing[2] for filing in filings)
+
+    def _record_source(
+        self,
+        connection: sqlite3.Connection,
+        path: Path,
+        kind: str,
+        filing_count: int,
+        dates: List[str],
+    ) -> IndexSource:
+        source = IndexSource(
+            str(Path(path).resolve()),
+            kind,
+            filing_count,
+            min(dates) if dates else None,
+            max(dates) if dates else None,
+            time.time(),
+        )
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    source.path,
+                    source.kind,
+                    source.filings,
+                    source.first_filing_date,
+                    source.last_filing_date,
+                    source.indexed_at,
+                ),
+            )
+        return source
+
+
+class FilingIndexed:
+    """
+    Parent class for classes whose lookups of filings may be answered from a FilingIndex.
+    Lookups go to SEC EDGAR unless a FilingIndex is assigned to _filing_index.
+    """
+
+    _filing_index: Optional[FilingIndex] = None
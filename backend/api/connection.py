@@ -1,14 +1,13 @@
-import gzip
 import json
 import os
 import re
 import sys
 from dataclasses import dataclass
 from datetime import date
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
 
+import gevent.pool  # type: ignore
 from mashumaro import DataClassDictMixin
 
 # Weird way to import a parent module in Python
@@ -16,7 +15,14 @@ folder_dir = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.dirname(folder_dir)
 sys.path.append(parent_dir)
 
+from api.bulk_index import FilingIndexed  # noqa: E402
+from api.entity_index import EntityIndex, EntityIndexed  # noqa: E402
 from misc import serializable_dataclass  # noqa: E402
+from misc.filing_cache import CacheEntryMissing  # noqa: E402
+from misc.filing_cache import FilingCache, FilingCached  # noqa: E402
+from misc.http_session import HTTPClient, decode_content  # noqa: E402
+from misc.memo_cache import MemoCacheStats, Memoized  # noqa: E402
+from misc.rate_limiting import RateLimited, RateLimitTracker  # noqa: E402
 
 
 @dataclass
@@ -72,6 +78,120 @@ class FormData(
     filings: List[FilingData]
 
 
+@dataclass
+class FilingColumns(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    """
+    Filings as parallel lists, like the "filings" of the submissions JSON of SEC EDGAR:
+    the i-th filing is made of the i-th element of each list.
+    """
+
+    reportDate: List[str]
+    filingDate: List[str]
+    form: List[str]
+    accessionNumber: List[str]
+    # "" if the filing has none; see ColumnarFormData.archive_url
+    primaryDocument: List[str]
+    isXBRL: List[int]
+    isInlineXBRL: List[int]
+
+    def __len__(self) -> int:
+        return len(self.accessionNumber)
+
+    def _columns(self) -> List[List[Any]]:
+        return [
+            self.reportDate,
+            self.filingDate,
+            self.form,
+            self.accessionNumber,
+            self.primaryDocument,
+            self.isXBRL,
+            self.isInlineXBRL,
+        ]
+
+    def extend(self, other: "FilingColumns"):
+        for column, other_column in zip(self._columns(), other._columns()):
+            column.extend(other_column)
+
+    def sort_newest_first(self):
+        """Sorts by filing date, newest first; stable, so same-day filings keep their order"""
+        order = sorted(range(len(self)), key=lambda i: self.filingDate[i], reverse=True)
+        for column in self._columns():
+            column[:] = [column[i] for i in order]
+
+
+@dataclass
+class ColumnarFormData(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    """
+    FormData with its filings as FilingColumns. The document of a filing isn't spelled out;
+    it's at {archive_url}/{accessionNumber without dashes}/{primaryDocument}, or
+    {archive_url}/{accessionNumber without dashes}/{accessionNumber}.txt if primaryDocument is "".
+    """
+
+    cik: str
+    issuing_entity: str
+    state_of_incorporation: str
+    ein: str
+    forms: List[str]
+    address: BulkAddressData
+    archive_url: str
+    filings: FilingColumns
+
+    def document_url(self, i: int) -> str:
+        """The URL of the document of the i-th filing"""
+        return ColumnarFormData.filing_document_url(
+            self.archive_url,
+            self.filings.accessionNumber[i],
+            self.filings.primaryDocument[i],
+        )
+
+    @staticmethod
+    def filing_document_url(
+        archive_url: str, accession_number: str, primary_document: str
+    ) -> str:
+        """The URL of the document of a filing; see ColumnarFormData"""
+        document = primary_document or f"{accession_number}.txt"
+        return f"{archive_url}/{accession_number.replace('-', '')}/{document}"
+
+    def with_filing_rows(self) -> FormData:
+        """The same data as a FormData, with a FilingData per filing"""
+        filings = self.filings
+        return FormData(
+            self.cik,
+            self.issuing_entity,
+            self.state_of_incorporation,
+            self.ein,
+            self.forms,
+            self.address,
+            [
+                FilingData(
+                    filings.reportDate[i],
+                    filings.filingDate[i],
+                    filings.form[i],
+                    self.document_url(i),
+                    filings.isXBRL[i],
+                    filings.isInlineXBRL[i],
+                )
+                for i in range(len(filings))
+            ],
+        )
+
+
+@dataclass
+class FormInfoBatchItem(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    cik: str
+    forms: List[str]
+    start_date: str
+    end_date: str
+    result: Optional[FormData]  # None if there was an error, or no forms were requested
+    error: Optional[str]
+
+
 class APIConnectionError(Exception):
     """
     Exception class for the APIConnection class
@@ -121,6 +241,10 @@ class APIConnectionError(Exception):
         APIConnectionError.DATE-INPUT_ERROR
             Message format passed to the raised APIConnectionError class when the start date is later than the end date.
 
+        APIConnectionError.BATCH_QUERY_ERROR
+            Message reported for a query of APIConnection.search_form_info_batch that doesn't have
+            between one and four elements.
+
     Object Properties
         APIConnectionError.message
             This string property represents the reason for the error.
@@ -156,6 +280,7 @@ class APIConnectionError(Exception):
     UNEXPECTED_ERROR = "Something occured when decompressing and/or decoding response from SEC EDGAR server"
     NO_CIK_EXISTS_ERROR = "The CIK number input does not exist in SEC EDGAR database"
     FORM_KIND_ERROR = "The form type inputted is not supported by this application"
+    BATCH_QUERY_ERROR = "Each query must hold a CIK number, and at most forms, a start date and an end date"
 
     def __init__(self, message, *values, originalError=None):
         self.message = message
@@ -172,7 +297,9 @@ class APIConnectionError(Exception):
         super().__init__(self.message)
 
 
-class APIConnection:
+class APIConnection(
+    RateLimited, FilingCached, FilingIndexed, EntityIndexed, Memoized, HTTPClient
+):
     """
     A class that handles the connection to the SEC EDGAR database
 
@@ -180,19 +307,43 @@ class APIConnection:
         APIConnection.SEARCH_URL
             SEC hidden API endpoint used to fulfil the search functionality.
 
+        APIConnection.COMPANY_TICKERS_URL
+            List of every company with a ticker, which the EntityIndex is built from.
+
+        APIConnection.SEARCH_MEMO, APIConnection.FORM_INFO_MEMO
+            First element of the keys of the search and search_form_info results kept in the MemoCache.
+
         APIConnection.MINIMUM_SEARCH_START_DATE
             The earliest filing start date input for document querying. This date is the
             earliest filing record that the SEC EDGAR database has in storage on any entity or company.
+
+        APIConnection.BATCH_CONCURRENCY
+            The maximum number of CIKs looked up at once by APIConnection.search_form_info_batch.
     """
 
     # Global properties
     SEARCH_URL = "https://efts.sec.gov/LATEST/search-index"
+    COMPANY_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+
+    # Kinds of results kept in the MemoCache; see APIConnection.invalidate_search_cache
+    SEARCH_MEMO = "search"
+    FORM_INFO_MEMO = "form_info"
 
     # Update APIConnectionError.START_DATE_INPUT_ERROR when MINIMUM_SEARCH_START_DATE value changes
     MINIMUM_SEARCH_START_DATE = "1994-01-01"
 
     ALLOWED_FORMS = ["10-K", "10-Q", "20-F"]
 
+    BATCH_CONCURRENCY = 8
+
+    def __init__(self, limit_counter: Optional[RateLimitTracker] = None) -> None:
+        """
+        Constructor. Takes in a RateLimitTracker to rate-limit requests to SEC EDGAR, shared
+        with the other users of the SEC API. Without one, the process-wide shared_rate_limit_tracker()
+        is used.
+        """
+        super().__init__(limit_counter)
+
     def _format_cik(self, cik: int) -> str:
         """
         Helper function that converts the numerical CIK value returned by the EDGAR database (format: \\d{1:10})
@@ -205,7 +356,9 @@ class APIConnection:
     def search(self, search_key: str) -> List[SearchData]:
         """
         Calls to the SEC EDGAR interface to search through the database to return entities
-         that match the search key
+         that match the search key. Answered from the EntityIndex instead, if one is configured
+         and the key is the ticker or CIK of one of its entities, or the start of their names;
+         its looser matches come after those of SEC EDGAR, or instead of them if it can't be reached.
 
         Parameters
             search_key
@@ -228,28 +381,63 @@ class APIConnection:
         if len(search_key) == 0:
             raise APIConnectionError(APIConnectionError.SEARCH_KEY_ERROR)
 
+        # Entities with a ticker are found locally; SEC EDGAR is asked about the rest, since it
+        # also knows the filers without one
+        fuzzy_matches: List[SearchData] = []
+        if self._entity_index is not None:
+            matches = self._entity_index.search(search_key, fuzzy=False)
+            if matches:
+                return [
+                    SearchData(self._format_cik(cik), name) for cik, name in matches
+                ]
+            fuzzy_matches = [
+                SearchData(self._format_cik(cik), name)
+                for cik, name in self._entity_index.search(search_key)
+            ]
+
+        # Searches SEC EDGAR has answered lately are answered the same again
+        try:
+            if self._memo_cache is None:
+                results = self._search(search_key)
+            else:
+                results = self._memo_cache.get_or_compute(
+                    (
+                        APIConnection.SEARCH_MEMO,
+                        " ".join(search_key.casefold().split()),
+                    ),
+                    lambda: self._search(search_key),
+                )
+        except APIConnectionError:
+            if not fuzzy_matches:
+                raise
+            return fuzzy_matches
+        found = {result.cik for result in results}
+        return results + [match for match in fuzzy_matches if match.cik not in found]
+
+    def _search(self, search_key: str) -> List[SearchData]:
+        """Implementation of APIConnection.search, asking SEC EDGAR"""
         # Define request to server
         data_sent = str.encode(f'{{"keysTyped":"{search_key}"}}')
-        req = Request(APIConnection.SEARCH_URL, data=data_sent, method="POST")
+
+        def fetch():
+            return self._http.request("POST", APIConnection.SEARCH_URL, body=data_sent)
 
         # Data aggregation
         try:
-            with urlopen(req) as res:
-                data = res.read()
-                try:
-                    encoding = res.info().get_content_charset("utf-8")
-                    data = json.loads(data.decode(encoding))
-                except Exception as e:
-                    raise APIConnectionError(
-                        APIConnectionError.UNEXPECTED_ERROR, originalError=e
-                    )
-
-                hits = data["hits"] if data["hits"] else []
-                hits = hits["hits"] if hits["hits"] else []
-                return [
-                    SearchData(self._format_cik(hit["_id"]), hit["_source"]["entity"])
-                    for hit in hits
-                ]
+            res = self._rate_limited_request(APIConnection.SEARCH_URL, fetch)
+            try:
+                data = json.loads(res.decoded_data().decode(res.charset()))
+            except Exception as e:
+                raise APIConnectionError(
+                    APIConnectionError.UNEXPECTED_ERROR, originalError=e
+                )
+
+            hits = data["hits"] if data["hits"] else []
+            hits = hits["hits"] if hits["hits"] else []
+            return [
+                SearchData(self._format_cik(hit["_id"]), hit["_source"]["entity"])
+                for hit in hits
+            ]
 
         # HTTPError has to come before URLError. HTTPError is a subset of URLError
         except HTTPError as e:
@@ -266,7 +454,8 @@ class APIConnection:
         forms: List[str] = ["10-K"],
         start_date: str = MINIMUM_SEARCH_START_DATE,
         end_date: str = date.today().isoformat(),
-    ) -> Union[FormData, None]:
+        columnar: bool = False,
+    ) -> Union[FormData, ColumnarFormData, None]:
         """
         Calls to the SEC EDGAR interface to search through the database to return entities
          that match the search key
@@ -285,6 +474,11 @@ class APIConnection:
             end_date
                 String input in Date ISO Format. Must not be greater than today's date
 
+            columnar
+                If True, the filings are returned as parallel lists, like the submissions
+                JSON of SEC EDGAR, which is much smaller for entities with many filings;
+                see ColumnarFormData.
+
         Returns
             A map object that contains the Filing year,
             Commission File number of the issuing entity,
@@ -328,6 +522,20 @@ class APIConnection:
                 }
         """
 
+        return self._search_form_info(cik_number, forms, start_date, end_date, columnar)
+
+    def _search_form_info(
+        self,
+        cik_number: str,
+        forms: List[str],
+        start_date: str,
+        end_date: str,
+        columnar: bool = False,
+    ) -> Union[FormData, ColumnarFormData, None]:
+        """
+        Implementation of APIConnection.search_form_info, returning the FormData itself
+        rather than its serializable form.
+        """
         # Data validation
         if len(forms) == 0:
             return None
@@ -362,140 +570,533 @@ class APIConnection:
                 APIConnectionError.DATE_INPUT_ERROR, start_date, end_date
             )
 
-        return self._send_request(
-            cik_number_updated,
-            forms_updated,
-            start_date,
-            end_date,
-            f"{cik_number_updated}.json",
+        def lookup() -> Union[FormData, ColumnarFormData]:
+            form_data = None
+            if self._filing_index is not None:
+                form_data = self._indexed_form_data(
+                    cik_number_updated, forms_updated, start_date, end_date, columnar
+                )
+            if form_data is None:
+                form_data = self._send_request(
+                    cik_number_updated,
+                    forms_updated,
+                    start_date,
+                    end_date,
+                    f"{cik_number_updated}.json",
+                    columnar,
+                )
+            return form_data
+
+        if self._memo_cache is None:
+            return lookup()
+        return self._memo_cache.get_or_compute(
+            (
+                APIConnection.FORM_INFO_MEMO,
+                cik_number_updated,
+                tuple(forms_updated),
+                start_date,
+                end_date,
+                columnar,
+            ),
+            lookup,
         )
 
-    def _convert_to_address_data(self, dictionary: Dict[str, Any]) -> AddressData:
-        return AddressData(
-            dictionary["street1"] if dictionary["street1"] else None,
-            dictionary["street2"] if dictionary["street2"] else None,
-            dictionary["city"] if dictionary["city"] else None,
-            dictionary["stateOrCountry"] if dictionary["stateOrCountry"] else "",
-            dictionary["zipCode"] if dictionary["zipCode"] else None,
-            dictionary["stateOrCountryDescription"]
-            if dictionary["stateOrCountryDescription"]
-            else "",
-        )
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def search_form_info_batch(
+        self, queries: List[List[Any]]
+    ) -> List[FormInfoBatchItem]:
+        """
+        Runs APIConnection.search_form_info for many entities at once, e.g. for a bulk import.
+        Queries are run concurrently, under the rate limit shared with the rest of the application.
 
-    """
-    A helper function for APIConnection.search_form_info
-    """
+        Parameters
+            queries
+                List of [cik_number, forms, start_date, end_date] lists, each holding the arguments
+                of a call to APIConnection.search_form_info. As with search_form_info, forms,
+                start_date and end_date can be left out.
 
-    def _send_request(
+        Returns
+            A list with one map object per query, in the same order. Each holds the normalized
+            query, and either the result of search_form_info for it, or the message of the error
+            it raised. An error in one query doesn't affect the others.
+
+            Example:
+            [
+                {
+                    "cik": "CIK##########",
+                    "forms": ["10-K"],
+                    "start_date": "1994-01-01",
+                    "end_date": "2022-04-01",
+                    "result": { ...same as search_form_info... },
+                    "error": None
+                },
+                ...
+            ]
+        """
+        items = [self._normalize_batch_query(query) for query in queries]
+
+        # Identical queries are only run once. Queries for the same CIK run one after the other,
+        # so that all but the first are answered from the FilingCache, rather than the server.
+        query_indices: Dict[Tuple[str, Tuple[str, ...], str, str], List[int]] = {}
+        for index, item in enumerate(items):
+            if item.error is None:
+                key = (item.cik, tuple(item.forms), item.start_date, item.end_date)
+                query_indices.setdefault(key, []).append(index)
+        queries_by_cik: Dict[str, List[Tuple[str, Tuple[str, ...], str, str]]] = {}
+        for key in query_indices:
+            queries_by_cik.setdefault(key[0], []).append(key)
+
+        def run_queries(keys: List[Tuple[str, Tuple[str, ...], str, str]]):
+            for key in keys:
+                result = None
+                error = None
+                try:
+                    form_data = self._search_form_info(
+                        key[0], list(key[1]), key[2], key[3], columnar=False
+                    )
+                    # without columnar, it's a FormData (or None)
+                    result = cast(Optional[FormData], form_data)
+                except APIConnectionError as e:
+                    error = e.message
+                except Exception as e:
+                    error = str(e)
+                for index in query_indices[key]:
+                    items[index].result = result
+                    items[index].error = error
+
+        pool = gevent.pool.Pool(APIConnection.BATCH_CONCURRENCY)
+        for keys in queries_by_cik.values():
+            pool.spawn(run_queries, keys)
+        pool.join()
+        return items
+
+    def _normalize_batch_query(self, query: List[Any]) -> FormInfoBatchItem:
+        """
+        Fills in the defaults of search_form_info for the missing arguments of a query, and
+        converts the rest to the types it expects.
+        """
+        if not isinstance(query, (list, tuple)):
+            query = [query]
+        arguments = list(query) + [None] * (4 - len(query))
+        cik_number, forms, start_date, end_date = arguments[:4]
+        if forms is None:
+            forms = ["10-K"]
+        elif isinstance(forms, str):
+            forms = [forms]
+        item = FormInfoBatchItem(
+            str(cik_number or "").strip().upper(),
+            [str(form).strip().upper() for form in forms],
+            str(start_date or APIConnection.MINIMUM_SEARCH_START_DATE).strip(),
+            str(end_date or date.today().isoformat()).strip(),
+            None,
+            None,
+        )
+        if len(query) == 0 or len(query) > 4:
+            item.error = APIConnectionError.BATCH_QUERY_ERROR
+        return item
+
+    def _indexed_form_data(
         self,
         cik_number: str,
         forms: List[str],
         start_date: str,
         end_date: str,
-        request_document: str,
-        prev_data=None,
-    ) -> FormData:
-        # Making request to server
-        data_api = f"https://data.sec.gov/submissions/{request_document}"
-        hdrs = {
-            "Host": "data.sec.gov",
-            "User-Agent": "Lafayette College yevenyos@lafayette.edu",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept": "*/*",
-        }
-        req = Request(data_api, headers=hdrs, method="GET")
+        columnar: bool = False,
+    ) -> Union[FormData, ColumnarFormData, None]:
+        """
+        Answers APIConnection.search_form_info from the FilingIndex, without any requests.
+        Returns None, so that it's looked up on SEC EDGAR instead, unless the company was indexed
+        from submissions.zip after end_date and each of its filings has a primary document.
+        Companies only found in full-index files have neither the documents nor the EIN, state
+        and addresses; filings made after the company was indexed aren't in the index at all.
+        """
+        cik = int(cik_number[3:])
+        company = self._filing_index.company(cik)  # type: ignore
+        if company is None or not company.updated_on or end_date > company.updated_on:
+            return None
+        filings = self._filing_index.filings(  # type: ignore
+            cik, forms, start_date, end_date
+        )
+        if not all(filing.primary_document for filing in filings):
+            return None
+        addresses = company.addresses or {}
+        address = BulkAddressData(
+            self._convert_to_address_data(addresses.get("mailing") or {}),
+            self._convert_to_address_data(addresses.get("business") or {}),
+        )
+        archive_url = self._archive_url(cik)
+        if not columnar:
+            return FormData(
+                cik_number,
+                company.name,
+                company.state_of_incorporation,
+                company.ein,
+                forms,
+                address,
+                [
+                    FilingData(
+                        filing.report_date,
+                        filing.filing_date,
+                        filing.form,
+                        ColumnarFormData.filing_document_url(
+                            archive_url,
+                            filing.accession_number,
+                            filing.primary_document,
+                        ),
+                        filing.is_xbrl,
+                        filing.is_inline_xbrl,
+                    )
+                    for filing in filings
+                ],
+            )
+        return ColumnarFormData(
+            cik_number,
+            company.name,
+            company.state_of_incorporation,
+            company.ein,
+            forms,
+            address,
+            archive_url,
+            FilingColumns(
+                [filing.report_date for filing in filings],
+                [filing.filing_date for filing in filings],
+                [filing.form for filing in filings],
+                [filing.accession_number for filing in filings],
+                [filing.primary_document for filing in filings],
+                [filing.is_xbrl for filing in filings],
+                [filing.is_inline_xbrl for filing in filings],
+            ),
+        )
+
+    def _archive_url(self, cik: int) -> str:
+        """URL of the folder of the filings of an entity; see ColumnarFormData.archive_url"""
+        return f"https://sec.gov/Archives/edgar/data/{cik}"
+
+    def _convert_to_address_data(self, dictionary: Dict[str, Any]) -> AddressData:
+        return AddressData(
+            dictionary.get("street1") or None,
+            dictionary.get("street2") or None,
+            dictionary.get("city") or None,
+            dictionary.get("stateOrCountry") or "",
+            dictionary.get("zipCode") or None,
+            dictionary.get("stateOrCountryDescription") or "",
+        )
+
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def search_cache_stats(self) -> Optional[MemoCacheStats]:
+        """
+        Hits, misses and size of the cache of search and search_form_info results, or None
+        if they aren't cached
+        """
+        return self._memo_cache.stats() if self._memo_cache is not None else None
+
+    def invalidate_search_cache(self, cik_number: Optional[str] = None) -> int:
+        """
+        Forgets the cached results of search and search_form_info, or only the search_form_info
+        results of cik_number, so that they're looked up again. Returns how many were forgotten.
+        """
+        if self._memo_cache is None:
+            return 0
+        if cik_number is None:
+            return self._memo_cache.invalidate()
+        cik_number = cik_number.strip().upper()
+        return self._memo_cache.invalidate(
+            lambda key: key[0] == APIConnection.FORM_INFO_MEMO and key[1] == cik_number
+        )
 
+    def refresh_entity_index(self) -> Dict[str, int]:
+        """
+        Updates the EntityIndex searched by APIConnection.search from SEC EDGAR's list of companies
+        with a ticker, which is kept in the FilingCache and revalidated once it's stale. If SEC EDGAR
+        can't be reached, the cached copy is used however old it is.
+
+        Returns the number of entities "added", "renamed" and "removed", and how many there are now
+        ("entities").
+        """
+        if self._entity_index is None:
+            raise ValueError("No entity index is configured")
         try:
-            with urlopen(req) as res:
-                data = res.read()
-                encoding = res.info().get_content_charset("utf-8")
-                # Decompressing received data
+            data, encoding, content_encoding = self._request_cached(
+                APIConnection.COMPANY_TICKERS_URL
+            )
+        except (HTTPError, URLError) as e:
+            cache = self._filing_cache
+            url_key = FilingCache.url_key(APIConnection.COMPANY_TICKERS_URL)
+            cache_entry = cache.get(url_key) if cache is not None else None
+            cached = None
+            if cache is not None and cache_entry is not None:
                 try:
-                    decompressed_data = gzip.decompress(data)
-                    data = json.loads(decompressed_data.decode(encoding))
-                except Exception as e:
+                    cached = (
+                        cache.read(cache_entry),
+                        cache_entry.charset,
+                        cache_entry.content_encoding,
+                    )
+                except CacheEntryMissing:
+                    pass
+            if cached is None:
+                if isinstance(e, HTTPError):
                     raise APIConnectionError(
-                        APIConnectionError.UNEXPECTED_ERROR, originalError=e
+                        APIConnectionError.SERVER_ERROR, originalError=e
                     )
+                raise APIConnectionError(
+                    APIConnectionError.CONNECTION_ERROR, originalError=e
+                )
+            data, encoding, content_encoding = cached
+        try:
+            document = json.loads(
+                decode_content(data, content_encoding).decode(encoding)
+            )
+            entries = EntityIndex.parse_company_tickers(document)
+        except Exception as e:
+            raise APIConnectionError(
+                APIConnectionError.UNEXPECTED_ERROR, originalError=e
+            )
+        return self._entity_index.update(entries)
+
+    def _request_submissions(
+        self, request_document: str
+    ) -> Tuple[bytes, str, Optional[str]]:
+        """Requests a document from the SEC EDGAR submissions API; see APIConnection._request_cached"""
+        return self._request_cached(
+            f"https://data.sec.gov/submissions/{request_document}"
+        )
 
-                if prev_data is None:
-                    mailing_address = self._convert_to_address_data(
-                        data["addresses"]["mailing"]
-                    )
-                    business_address = self._convert_to_address_data(
-                        data["addresses"]["business"]
+    def _request_cached(self, data_api: str) -> Tuple[bytes, str, Optional[str]]:
+        """
+        Requests a document from SEC EDGAR, answering from the FilingCache instead if we
+        have a current copy. Stale copies are revalidated with the ETag/Last-Modified the
+        server sent with them.
+
+        Returns the body of the response, as received, its charset and its Content-Encoding.
+        """
+        cache = self._filing_cache
+        cache_key = cache.url_key(data_api) if cache is not None else ""
+        cache_entry = cache.get(cache_key) if cache is not None else None
+        if cache is not None and cache_entry is not None:
+            if not cache.is_stale(cache_entry):
+                try:
+                    return (
+                        cache.read(cache_entry),
+                        cache_entry.charset,
+                        cache_entry.content_encoding,
                     )
-                    address = BulkAddressData(mailing_address, business_address)
-                    returned_data = FormData(
-                        cik_number,
-                        data["name"],
-                        data["stateOfIncorporation"],
-                        data["ein"] if data["ein"] is not None else "",
-                        forms,
-                        address,
-                        [],
+                except CacheEntryMissing:  # evicted since get()
+                    cache_entry = None
+
+        # Making request to server
+        hdrs = cache.conditional_headers(cache_entry) if cache is not None else {}
+
+        def fetch():
+            return self._http.request("GET", data_api, headers=hdrs)
+
+        try:
+            # other greenlets (e.g. the rest of a batch) keep running while we wait
+            res = self._rate_limited_request(data_api, fetch)
+            if cache is not None:
+                cache.put(
+                    cache_key,
+                    data_api,
+                    res.data,
+                    charset=res.charset(),
+                    content_encoding=res.headers.get("Content-Encoding"),
+                    etag=res.headers.get("ETag"),
+                    last_modified=res.headers.get("Last-Modified"),
+                )
+            return res.data, res.charset(), res.headers.get("Content-Encoding")
+        except HTTPError as e:
+            if e.code == 304 and cache is not None and cache_entry is not None:
+                cache.refresh(cache_entry)
+                try:
+                    return (
+                        cache.read(cache_entry),
+                        cache_entry.charset,
+                        cache_entry.content_encoding,
                     )
-                    recent_filings = data["filings"]["recent"]
-                else:
-                    returned_data = prev_data
-                    recent_filings = data
-                for i in range(len(recent_filings["accessionNumber"])):
-                    filing_date = recent_filings["filingDate"][i]
-                    if filing_date >= start_date and filing_date <= end_date:
-                        if recent_filings["form"][i] in forms:
-                            cik = cik_number.strip("CIK").strip("0")
-                            raw_accession_number = recent_filings["accessionNumber"][i]
-                            accession_number = raw_accession_number.replace("-", "")
-                            doc = (
-                                f"{recent_filings['accessionNumber'][i]}.txt"
-                                if len(recent_filings["primaryDocument"][i]) == 0
-                                else recent_filings["primaryDocument"][i]
-                            )
-                            is_xbrl = recent_filings["isXBRL"][i]
-                            is_inline_xbrl = recent_filings["isInlineXBRL"][i]
-
-                            returned_data.filings.append(
-                                FilingData(
-                                    recent_filings["reportDate"][i],
-                                    recent_filings["filingDate"][i],
-                                    recent_filings["form"][i],
-                                    f"https://sec.gov/Archives/edgar/data/{cik}/{accession_number}/{doc}",
-                                    is_xbrl,
-                                    is_inline_xbrl,
-                                )
-                            )
-                    elif filing_date < start_date:
-                        break
-                if prev_data is None and "files" in data["filings"]:
-                    for i in range(len(data["filings"]["files"])):
-                        if data["filings"]["files"][i]["filingTo"] >= start_date:
-                            returned_data = self._send_request(
-                                cik_number,
-                                forms,
-                                start_date,
-                                end_date,
-                                data["filings"]["files"][i]["name"],
-                                prev_data=returned_data,
-                            )
-                return returned_data
+                except CacheEntryMissing:  # evicted since; ask for the whole document
+                    return self._request_cached(data_api)
+            raise
+
+    def _load_submissions(self, request_document: str) -> Dict[str, Any]:
+        """
+        Requests a document from the SEC EDGAR submissions API and decodes it.
+        HTTPError and URLError are raised as they are.
+        """
+        data, encoding, content_encoding = self._request_submissions(request_document)
+        # Decompressing received data
+        try:
+            decompressed_data = decode_content(data, content_encoding)
+            return json.loads(decompressed_data.decode(encoding))
+        except Exception as e:
+            raise APIConnectionError(
+                APIConnectionError.UNEXPECTED_ERROR, originalError=e
+            )
+
+    def _load_history_page(self, request_document: str) -> Optional[Dict[str, Any]]:
+        """
+        Requests one of the documents listed in the 'files' property of a CIK's submissions,
+        which hold the filings that don't fit in its 'recent' property.
+        Returns None if the document doesn't exist.
+        """
+        try:
+            return self._load_submissions(request_document)
         # HTTPError has to come before URLError. HTTPError is a subset of URLError
         except HTTPError as e:
             if e.code == 404:
-                if f"{cik_number}.json" == request_document:
-                    # Thrown when cik number input does not exist but meets format.
-                    raise APIConnectionError(
-                        APIConnectionError.NO_CIK_EXISTS_ERROR,
-                        cik_number,
-                        originalError=e,
-                    )
-                else:
-                    # Thrown when requested json document found in 'files' property of a legit cik_number's
-                    # f'https://data.sec.gov/submissions/{cik_number}.json' request response does not exist.
-                    # Can be ignored but should preferrably be logged.
-                    return returned_data
+                # Thrown when requested json document found in 'files' property of a legit cik_number's
+                # f'https://data.sec.gov/submissions/{cik_number}.json' request response does not exist.
+                # Can be ignored but should preferrably be logged.
+                return None
+            raise APIConnectionError(APIConnectionError.SERVER_ERROR, originalError=e)
+        except URLError as f:
+            raise APIConnectionError(
+                APIConnectionError.CONNECTION_ERROR, originalError=f
+            )
+
+    def _matching_filings(
+        self,
+        forms: List[str],
+        start_date: str,
+        end_date: str,
+        filings: Dict[str, List[Any]],
+    ) -> List[int]:
+        """
+        Indices of the filings of the requested forms and dates in the columns of a
+        submissions document, picked by masking the columns as a whole.
+        """
+        # imported here, since it takes a while and isn't needed until the first search
+        import numpy as np
+
+        filing_dates = np.asarray(filings["filingDate"], dtype=str)
+        mask = (filing_dates >= start_date) & (filing_dates <= end_date)
+        mask &= np.isin(np.asarray(filings["form"], dtype=str), forms)
+        return np.flatnonzero(mask).tolist()
+
+    def _filing_columns(
+        self, filings: Dict[str, List[Any]], matching: List[int]
+    ) -> FilingColumns:
+        """The given filings of the columns of a submissions document, as FilingColumns"""
+
+        def column(name: str) -> List[Any]:
+            values = filings[name]
+            return [values[i] for i in matching]
+
+        return FilingColumns(
+            column("reportDate"),
+            column("filingDate"),
+            column("form"),
+            column("accessionNumber"),
+            column("primaryDocument"),
+            column("isXBRL"),
+            column("isInlineXBRL"),
+        )
+
+    def _filing_rows(
+        self, archive_url: str, filings: Dict[str, List[Any]], matching: List[int]
+    ) -> List[FilingData]:
+        """The given filings of the columns of a submissions document, as FilingData"""
+        return [
+            FilingData(
+                filings["reportDate"][i],
+                filings["filingDate"][i],
+                filings["form"][i],
+                ColumnarFormData.filing_document_url(
+                    archive_url,
+                    filings["accessionNumber"][i],
+                    filings["primaryDocument"][i],
+                ),
+                filings["isXBRL"][i],
+                filings["isInlineXBRL"][i],
+            )
+            for i in matching
+        ]
+
+    """
+    A helper function for APIConnection.search_form_info
+    """
 
+    def _send_request(
+        self,
+        cik_number: str,
+        forms: List[str],
+        start_date: str,
+        end_date: str,
+        request_document: str,
+        columnar: bool = False,
+    ) -> Union[FormData, ColumnarFormData]:
+        try:
+            data = self._load_submissions(request_document)
+        # HTTPError has to come before URLError. HTTPError is a subset of URLError
+        except HTTPError as e:
+            if e.code == 404:
+                # Thrown when cik number input does not exist but meets format.
+                raise APIConnectionError(
+                    APIConnectionError.NO_CIK_EXISTS_ERROR,
+                    cik_number,
+                    originalError=e,
+                )
             raise APIConnectionError(APIConnectionError.SERVER_ERROR, originalError=e)
         except URLError as f:
             raise APIConnectionError(
                 APIConnectionError.CONNECTION_ERROR, originalError=f
             )
+
+        mailing_address = self._convert_to_address_data(data["addresses"]["mailing"])
+        business_address = self._convert_to_address_data(data["addresses"]["business"])
+        address = BulkAddressData(mailing_address, business_address)
+        archive_url = self._archive_url(int(cik_number[3:]))
+
+        # Filings that don't fit in 'recent' are split over older documents, each covering a range of dates.
+        # Only those overlapping the requested range are fetched, all at once (within the rate limit).
+        pages = [data["filings"]["recent"]]
+        history_pages = [
+            file["name"]
+            for file in data["filings"].get("files", [])
+            if file["filingTo"] >= start_date and file.get("filingFrom", "") <= end_date
+        ]
+        if len(history_pages) > 0:
+            pool = gevent.pool.Pool(APIConnection.BATCH_CONCURRENCY)
+            pages += [
+                page
+                for page in pool.map(self._load_history_page, history_pages)
+                if page is not None
+            ]
+        matches = [
+            (page, self._matching_filings(forms, start_date, end_date, page))
+            for page in pages
+        ]
+
+        ein = data["ein"] if data["ein"] is not None else ""
+        # only the columns of the selected filings are built, or only their rows
+        if not columnar:
+            rows = [
+                row
+                for page, matching in matches
+                for row in self._filing_rows(archive_url, page, matching)
+            ]
+            if len(pages) > 1:
+                # stable, so same-day filings keep their order
+                rows.sort(key=lambda row: row.filingDate, reverse=True)
+            return FormData(
+                cik_number,
+                data["name"],
+                data["stateOfIncorporation"],
+                ein,
+                forms,
+                address,
+                rows,
+            )
+        columns = self._filing_columns(*matches[0])
+        for page, matching in matches[1:]:
+            columns.extend(self._filing_columns(page, matching))
+        if len(pages) > 1:
+            columns.sort_newest_first()
+        return ColumnarFormData(
+            cik_number,
+            data["name"],
+            data["stateOfIncorporation"],
+            ein,
+            forms,
+            address,
+            archive_url,
+            columns,
+        )
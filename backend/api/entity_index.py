@@ -0,0 +1,199 @@
+import bisect
+import collections
+import itertools
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# (CIK, ticker, entity name), as listed in company_tickers.json
+TickerEntry = Tuple[int, str, str]
+
+
+def normalize_name(name: str) -> str:
+    """Case-folds a name and reduces its punctuation and whitespace to single spaces"""
+    return " ".join(re.sub(r"[^0-9a-z&]+", " ", name.casefold()).split())
+
+
+def trigrams(normalized_name: str) -> Set[str]:
+    # padded, so that the start and end of a name weigh as much as its middle
+    padded = f"  {normalized_name} "
+    return {a + b + c for a, b, c in zip(padded, padded[1:], padded[2:])}
+
+
+class EntityIndex:
+    """
+    An in-memory index of SEC EDGAR entities for search as you type, without a request per keystroke.
+    Built from company_tickers.json (https://www.sec.gov/files/company_tickers.json), which lists
+    every company with a ticker; other filers are only found by searching SEC EDGAR.
+
+    search() ranks, in this order:
+        an exact ticker or CIK match
+        names starting with the search key (a binary search over the sorted names)
+        names sharing enough trigrams with the search key, best first (for typos and
+            words out of order)
+
+    update() applies a new copy of company_tickers.json, only reindexing the entities that changed.
+    """
+
+    # fraction of the trigrams of the search key a name must hold to be a fuzzy match;
+    # a key is usually part of a name, so how much of the name it covers doesn't matter
+    MIN_FUZZY_SIMILARITY = 0.5
+    # trigrams in more than this fraction of names don't make a name a fuzzy match candidate
+    # on their own, if the search key has any others
+    COMMON_TRIGRAM_FRACTION = 0.05
+    # search keys shorter than this are only matched by ticker and name prefix
+    MIN_FUZZY_KEY_LENGTH = 3
+
+    def __init__(self) -> None:
+        # CIK -> (entity name, normalized name)
+        self._entities: Dict[int, Tuple[str, str]] = {}
+        # ticker -> CIK; a company may have several tickers, e.g. one per class of shares
+        self._tickers: Dict[str, int] = {}
+        # (normalized name, CIK), sorted, for prefix searches
+        self._sorted_names: List[Tuple[str, int]] = []
+        # trigram -> CIKs of the names containing it
+        self._postings: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    @staticmethod
+    def parse_company_tickers(document: Dict[str, Any]) -> List[TickerEntry]:
+        """
+        Reads the entries of company_tickers.json, which looks like
+            {"0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}, ...}
+        """
+        return [
+            (int(entry["cik_str"]), str(entry["ticker"]), str(entry["title"]))
+            for entry in document.values()
+        ]
+
+    def update(self, entries: Iterable[TickerEntry]) -> Dict[str, int]:
+        """
+        Makes the index hold exactly the given entities. Returns the number of entities
+        "added", "renamed" and "removed", and how many there are now ("entities").
+        """
+        names: Dict[int, str] = {}
+        tickers: Dict[str, int] = {}
+        for cik, ticker, name in entries:
+            # the first entry of a company holds its name; later ones only add tickers
+            names.setdefault(cik, name)
+            tickers.setdefault(ticker.upper(), cik)
+
+        removed = [cik for cik in self._entities if cik not in names]
+        added = [cik for cik in names if cik not in self._entities]
+        renamed = [
+            cik
+            for cik, name in names.items()
+            if cik in self._entities and self._entities[cik][0] != name
+        ]
+        for cik in removed + renamed:
+            self._unindex(cik)
+        for cik in added + renamed:
+            self._index(cik, names[cik])
+        self._tickers = tickers
+        if removed or added or renamed:
+            self._sorted_names = sorted(
+                (normalized, cik) for cik, (_, normalized) in self._entities.items()
+            )
+        return {
+            "added": len(added),
+            "renamed": len(renamed),
+            "removed": len(removed),
+            "entities": len(self._entities),
+        }
+
+    def _index(self, cik: int, name: str):
+        normalized = normalize_name(name)
+        self._entities[cik] = (name, normalized)
+        for trigram in trigrams(normalized):
+            self._postings.setdefault(trigram, set()).add(cik)
+
+    def _unindex(self, cik: int):
+        _, normalized = self._entities.pop(cik)
+        for trigram in trigrams(normalized):
+            postings = self._postings[trigram]
+            postings.discard(cik)
+            if not postings:
+                del self._postings[trigram]
+
+    def search(
+        self, search_key: str, limit: int = 10, fuzzy: bool = True
+    ) -> List[Tuple[int, str]]:
+        """
+        The (CIK, entity name) of up to limit entities matching the search key, best first.
+        Without fuzzy, only the exact ticker or CIK match and the names starting with the key.
+        """
+        matches: List[int] = []
+        seen: Set[int] = set()
+
+        def add(cik: Optional[int]) -> bool:
+            """Adds a match; returns False once there are enough"""
+            if cik is not None and cik not in seen:
+                seen.add(cik)
+                matches.append(cik)
+            return len(matches) < limit
+
+        key = normalize_name(search_key)
+        cik_match = re.fullmatch(r"(?:CIK)?0*(\d{1,10})", search_key.strip().upper())
+        cik = int(cik_match.group(1)) if cik_match is not None else None
+        if (
+            add(self._tickers.get(search_key.strip().upper()))
+            and add(cik if cik in self._entities else None)
+            and key
+        ):
+            start = bisect.bisect_left(self._sorted_names, (key,))
+            for normalized, cik in itertools.islice(self._sorted_names, start, None):
+                if not normalized.startswith(key) or not add(cik):
+                    break
+            if (
+                fuzzy
+                and len(matches) < limit
+                and len(key) >= EntityIndex.MIN_FUZZY_KEY_LENGTH
+            ):
+                for cik in self._fuzzy_matches(key):
+                    if not add(cik):
+                        break
+        return [(cik, self._entities[cik][0]) for cik in matches[:limit]]
+
+    def _fuzzy_matches(self, key: str) -> List[int]:
+        key_trigrams = trigrams(key)
+        # trigrams of words like "inc" and "corp" are in too many names to count quickly; if the key
+        # has rarer ones, only the names holding one of those are candidates
+        most_names = EntityIndex.COMMON_TRIGRAM_FRACTION * len(self._entities)
+        common_trigrams = [
+            trigram
+            for trigram in key_trigrams
+            if len(self._postings.get(trigram, ())) > most_names
+        ]
+        counted = key_trigrams.difference(common_trigrams)
+        if not any(trigram in self._postings for trigram in counted):
+            counted, common_trigrams = key_trigrams, []
+        shared = collections.Counter(
+            itertools.chain.from_iterable(
+                self._postings.get(trigram, ()) for trigram in counted
+            )
+        )
+        for trigram in common_trigrams:
+            postings = self._postings[trigram]
+            for cik in shared:
+                if cik in postings:
+                    shared[cik] += 1
+
+        minimum = EntityIndex.MIN_FUZZY_SIMILARITY * len(key_trigrams)
+        scores = []
+        for cik, count in shared.items():
+            if count >= minimum:
+                name = self._entities[cik][1]
+                # of names holding as much of the key, the closest in length come first
+                scores.append((-count, len(name), name, cik))
+        scores.sort()
+        return [cik for _, _, _, cik in scores]
+
+
+class EntityIndexed:
+    """
+    Parent class for classes whose entity searches may be answered from an EntityIndex.
+    Searches go to SEC EDGAR unless an EntityIndex is assigned to _entity_index.
+    """
+
+    _entity_index: Optional[EntityIndex] = None
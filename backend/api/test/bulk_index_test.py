@@ -0,0 +1,157 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from datetime import date
+from pathlib import Path
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from bulk_index import FilingIndex  # type: ignore # noqa: E402
+
+SUBMISSIONS = {
+    "cik": "37996",
+    "name": "FORD MOTOR CO",
+    "stateOfIncorporation": "DE",
+    "ein": "380549190",
+    "addresses": {"mailing": {"city": "DEARBORN"}, "business": {"city": "DEARBORN"}},
+    "filings": {
+        "recent": {
+            "accessionNumber": ["0000037996-21-000012", "0000037996-21-000010"],
+            "filingDate": ["2021-02-04", "2021-01-20"],
+            "reportDate": ["2020-12-31", ""],
+            "form": ["10-K", "8-K"],
+            "primaryDocument": ["f-20201231.htm", "f-8k.htm"],
+            "isXBRL": [1, 0],
+            "isInlineXBRL": [1, 0],
+        },
+        "files": [{"name": "CIK0000037996-submissions-001.json"}],
+    },
+}
+
+OLDER_SUBMISSIONS = {
+    "accessionNumber": ["0000037996-11-000003"],
+    "filingDate": ["2011-02-28"],
+    "reportDate": ["2010-12-31"],
+    "form": ["10-K"],
+    "primaryDocument": ["f10k_2010.htm"],
+    "isXBRL": [0],
+    "isInlineXBRL": [0],
+}
+
+FORM_IDX = """Description:           Master Index of EDGAR Dissemination Feed by Form Type
+Last Data Received:    March 31, 2021
+
+Form Type   Company Name                                                  CIK         Date Filed  File Name
+---------------------------------------------------------------------------------------------------------------------------------------------
+10-K        APPLE INC                                                     320193      2020-10-30  edgar/data/320193/0000320193-20-000096.txt
+10-K        FORD MOTOR CO                                                 37996       2021-02-04  edgar/data/37996/0000037996-21-000012.txt
+8-K         APPLE INC                                                     320193      2021-01-27  edgar/data/320193/0000320193-21-000009.txt
+"""
+
+MASTER_IDX = """Description:           Master Index of EDGAR Dissemination Feed
+
+CIK|Company Name|Form Type|Date Filed|Filename
+--------------------------------------------------------------------------------
+320193|APPLE INC|10-Q|20210128|edgar/data/320193/0000320193-21-000010.txt
+"""
+
+
+class TestFilingIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = Path(self.temp_dir.name)
+        self.index = FilingIndex(self.folder / "index.sqlite3")
+
+        bulk = self.folder / "bulk"
+        (bulk / "2021" / "QTR1").mkdir(parents=True)
+        with zipfile.ZipFile(bulk / "submissions.zip", "w") as archive:
+            archive.writestr("CIK0000037996.json", json.dumps(SUBMISSIONS))
+            archive.writestr(
+                "CIK0000037996-submissions-001.json", json.dumps(OLDER_SUBMISSIONS)
+            )
+        (bulk / "2021" / "QTR1" / "form.idx").write_text(FORM_IDX)
+        (bulk / "2021" / "QTR1" / "master.idx").write_text(MASTER_IDX)
+        (bulk / "2021" / "QTR1" / "xbrl.idx").write_text(MASTER_IDX)
+        self.bulk = bulk
+
+    def tearDown(self):
+        self.index.close()
+        self.temp_dir.cleanup()
+
+    def test_submissions_zip(self):
+        progress = []
+        sources = self.index.ingest(
+            self.bulk / "submissions.zip", on_progress=progress.append
+        )
+        self.assertEqual(1, len(sources))
+        self.assertEqual("submissions", sources[0].kind)
+        self.assertEqual(2, sources[0].filings)
+        self.assertEqual("2011-02-28", sources[0].first_filing_date)
+        self.assertEqual([2], progress)
+
+        company = self.index.company(37996)
+        self.assertEqual("FORD MOTOR CO", company.name)
+        self.assertEqual("DE", company.state_of_incorporation)
+        self.assertEqual("DEARBORN", company.addresses["business"]["city"])
+        # the date the archive's files were written
+        self.assertEqual(date.today().isoformat(), company.updated_on)
+        self.assertIsNone(self.index.company(320193))
+
+        filings = self.index.filings(37996, ["10-K", "8-K"], "1994-01-01", "2021-12-31")
+        # the 8-K isn't one of the forms indexed
+        self.assertListEqual(
+            ["2021-02-04", "2011-02-28"], [filing.filing_date for filing in filings]
+        )
+        self.assertEqual("f-20201231.htm", filings[0].primary_document)
+        self.assertEqual(1, filings[0].is_xbrl)
+        self.assertListEqual(
+            [], self.index.filings(37996, ["10-K"], "2012-01-01", "2020-12-31")
+        )
+
+    def test_folder(self):
+        sources = self.index.ingest(self.bulk)
+        # form.idx, master.idx and submissions.zip; xbrl.idx is left out
+        self.assertEqual(3, len(sources))
+        self.assertEqual(3, len(self.index.sources()))
+
+        # filings of full-index files are the same as those of the submissions
+        ford = self.index.filings(37996, ["10-K"], "2021-01-01", "2021-12-31")
+        self.assertEqual(1, len(ford))
+        self.assertEqual("0000037996-21-000012", ford[0].accession_number)
+        self.assertEqual("f-20201231.htm", ford[0].primary_document)
+        self.assertEqual("DE", self.index.company(37996).state_of_incorporation)
+
+        apple = self.index.company(320193)
+        self.assertEqual("APPLE INC", apple.name)
+        self.assertIsNone(apple.addresses)
+        self.assertEqual("", apple.updated_on)
+        filings = self.index.filings(
+            320193, ["10-K", "10-Q"], "2020-01-01", "2021-12-31"
+        )
+        self.assertListEqual(
+            [("10-Q", "2021-01-28", ""), ("10-K", "2020-10-30", "")],
+            [(f.form, f.filing_date, f.primary_document) for f in filings],
+        )
+        self.assertEqual("0000320193-20-000096", filings[1].accession_number)
+
+        # indexing a file again replaces its source rather than adding another
+        self.index.ingest(self.bulk / "2021" / "QTR1" / "form.idx")
+        self.assertEqual(3, len(self.index.sources()))
+
+    def test_not_an_index(self):
+        with self.assertRaises(ValueError):
+            self.index.ingest(self.folder / "index.sqlite3")
+        empty = self.folder / "empty"
+        empty.mkdir()
+        with self.assertRaises(ValueError):
+            self.index.ingest(empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,13 @@
+import gzip
+import json
 import os
 import sys
+import tempfile
 import unittest
 import warnings
+import zipfile
+from email.message import Message
+from pathlib import Path
 from unittest.mock import patch
 from urllib.error import HTTPError, URLError
 from urllib.request import urlopen
@@ -12,6 +18,52 @@ parent_dir = os.path.dirname(folder_dir)
 sys.path.append(parent_dir)
 from connection import APIConnection  # type: ignore # noqa: E402
 from connection import APIConnectionError  # type: ignore # noqa: E402
+from connection import ColumnarFormData  # type: ignore # noqa: E402
+
+from api.bulk_index import FilingIndex  # type: ignore # noqa: E402
+from api.entity_index import EntityIndex  # type: ignore # noqa: E402
+from misc.filing_cache import FilingCache  # type: ignore # noqa: E402
+from misc.http_session import HTTPResponse  # type: ignore # noqa: E402
+from misc.memo_cache import MemoCache  # type: ignore # noqa: E402
+
+SUBMISSIONS_JSON = {
+    "name": "FORD MOTOR CO",
+    "stateOfIncorporation": "DE",
+    "ein": "380549190",
+    "addresses": {
+        address_type: {
+            "street1": "ONE AMERICAN RD",
+            "street2": None,
+            "city": "DEARBORN",
+            "stateOrCountry": "MI",
+            "zipCode": "48126",
+            "stateOrCountryDescription": "MI",
+        }
+        for address_type in ["mailing", "business"]
+    },
+    "filings": {
+        "recent": {
+            "accessionNumber": ["0000037996-21-000012"],
+            "filingDate": ["2021-02-04"],
+            "reportDate": ["2020-12-31"],
+            "form": ["10-K"],
+            "primaryDocument": ["f-20201231.htm"],
+            "isXBRL": [1],
+            "isInlineXBRL": [1],
+        },
+        "files": [],
+    },
+}
+
+
+def mock_response(body: bytes, headers=None):
+    """Builds a response like those of HTTPSession.request()"""
+    message = Message()
+    message["Content-Type"] = "application/json; charset=utf-8"
+    message["Content-Encoding"] = "gzip"
+    for key, value in (headers or {}).items():
+        message[key] = value
+    return HTTPResponse("https://data.sec.gov/submissions/", 200, message, body)
 
 
 class TestAPIConnectionError(unittest.TestCase):
@@ -151,9 +203,9 @@ class TestAPIConnection(unittest.TestCase):
         for key in filing_obj:
             self.assertTrue(key in keys, f"Unexpected key: {key}")
 
-    @patch("connection.urlopen")
-    def test_no_internet_connection(self, mock_urlopen):
-        mock_urlopen.side_effect = URLError(reason=None)
+    @patch.object(APIConnection, "_http_session")
+    def test_no_internet_connection(self, mock_session):
+        mock_session.request.side_effect = URLError(reason=None)
         with self.assertRaises(APIConnectionError) as cm:
             self.api_conn.search(self.search_key_results)
         exception = cm.exception
@@ -347,6 +399,293 @@ class TestAPIConnection(unittest.TestCase):
         self.assertEqual(APIConnectionError.NO_TYPE_ERROR, exception.type)
         self.assertTupleEqual((self.unsupported_form,), exception.values)
 
+    @patch.object(APIConnection, "_http_session")
+    def test_submissions_served_from_cache(self, mock_session):
+        mock_session.request.return_value = mock_response(
+            gzip.compress(json.dumps(SUBMISSIONS_JSON).encode("utf-8")),
+            {"ETag": '"v1"'},
+        )
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.api_conn._filing_cache = FilingCache(Path(cache_dir))
+            first = self.api_conn.search_form_info(self.real_cik)
+            second = self.api_conn.search_form_info(self.real_cik)
+            self.assertEqual(1, mock_session.request.call_count)
+            self.assertDictEqual(first, second)
+            self.validate_form_metadata(second)
+            self.assertEqual(1, len(second["filings"]))
+
+            # once stale, the copy is revalidated; 304 means it can still be used
+            self.api_conn._filing_cache.ttl_seconds = -1
+            mock_session.request.side_effect = HTTPError(
+                url=None, code=304, hdrs=None, msg=None, fp=None
+            )
+            self.assertDictEqual(first, self.api_conn.search_form_info(self.real_cik))
+            self.assertEqual(2, mock_session.request.call_count)
+            revalidation_headers = mock_session.request.call_args.kwargs["headers"]
+            self.assertEqual('"v1"', revalidation_headers["If-None-Match"])
+
+    @patch.object(APIConnection, "_http_session")
+    def test_search_form_info_batch(self, mock_session):
+        def respond(method, url, headers=None, body=None):
+            if "CIK0000000001" in url:
+                raise HTTPError(url=None, code=404, hdrs=None, msg=None, fp=None)
+            return mock_response(
+                gzip.compress(json.dumps(SUBMISSIONS_JSON).encode("utf-8"))
+            )
+
+        mock_session.request.side_effect = respond
+        results = self.api_conn.search_form_info_batch(
+            [
+                [self.real_cik.lower(), ["10-k"], "2020-01-01", "2021-12-31"],
+                ["CIK0000000001", ["10-K"], "2020-01-01", "2021-12-31"],
+                [self.real_cik, ["10-K"], "2020-01-01", "2021-12-31"],
+                ["not a cik"],
+                [],
+            ]
+        )
+        self.assertEqual(5, len(results))
+        # the first and third query are the same once normalized, so they're only run once
+        self.assertEqual(2, mock_session.request.call_count)
+        self.assertDictEqual(results[0], results[2])
+        self.assertIsNone(results[0]["error"])
+        self.validate_form_metadata(results[0]["result"])
+        self.assertEqual(1, len(results[0]["result"]["filings"]))
+        self.assertEqual(APIConnectionError.NO_CIK_EXISTS_ERROR, results[1]["error"])
+        self.assertEqual(APIConnectionError.CIK_INPUT_ERROR, results[3]["error"])
+        self.assertEqual("1994-01-01", results[3]["start_date"])
+        self.assertListEqual(["10-K"], results[3]["forms"])
+        self.assertEqual(APIConnectionError.BATCH_QUERY_ERROR, results[4]["error"])
+        for result in results[1:]:
+            if result is not results[2]:
+                self.assertIsNone(result["result"])
+
+    @patch.object(APIConnection, "_http_session")
+    def test_history_pages(self, mock_session):
+        def page(dates):
+            return {
+                "accessionNumber": [f"0000037996-{d[2:4]}-000001" for d in dates],
+                "filingDate": dates,
+                "reportDate": dates,
+                "form": ["10-K"] * len(dates),
+                "primaryDocument": ["f.htm"] * len(dates),
+                "isXBRL": [0] * len(dates),
+                "isInlineXBRL": [0] * len(dates),
+            }
+
+        submissions = json.loads(json.dumps(SUBMISSIONS_JSON))
+        submissions["filings"]["files"] = [
+            {"name": "p1.json", "filingFrom": "2015-01-01", "filingTo": "2020-12-31"},
+            {"name": "p2.json", "filingFrom": "2010-01-01", "filingTo": "2014-12-31"},
+            {"name": "p3.json", "filingFrom": "2005-01-01", "filingTo": "2009-12-31"},
+            {"name": "p4.json", "filingFrom": "1994-01-01", "filingTo": "2004-12-31"},
+        ]
+        documents = {
+            f"{self.real_cik}.json": submissions,
+            "p1.json": page(["2020-02-01", "2016-02-01"]),
+            "p2.json": page(["2013-02-01", "2011-02-01"]),
+        }
+
+        def respond(method, url, headers=None, body=None):
+            name = url.rsplit("/", 1)[1]
+            if name not in documents:  # p3.json is missing from the server
+                raise HTTPError(url=None, code=404, hdrs=None, msg=None, fp=None)
+            return mock_response(
+                gzip.compress(json.dumps(documents[name]).encode("utf-8"))
+            )
+
+        mock_session.request.side_effect = respond
+        results = self.api_conn.search_form_info(
+            self.real_cik, ["10-K"], "2006-01-01", "2021-12-31"
+        )
+        self.assertListEqual(
+            ["2021-02-04", "2020-02-01", "2016-02-01", "2013-02-01", "2011-02-01"],
+            [filing["filingDate"] for filing in results["filings"]],
+        )
+        # p4.json only holds filings from before the start date
+        requested = [call[0][1] for call in mock_session.request.call_args_list]
+        self.assertFalse(any(url.endswith("p4.json") for url in requested))
+        self.assertEqual(4, len(requested))
+
+        # the same filings as parallel lists
+        columnar = self.api_conn.search_form_info(
+            self.real_cik, ["10-K"], "2006-01-01", "2021-12-31", columnar=True
+        )
+        self.assertSetEqual(set(results) | {"archive_url"}, set(columnar))
+        self.assertListEqual(
+            [filing["filingDate"] for filing in results["filings"]],
+            columnar["filings"]["filingDate"],
+        )
+        self.assertListEqual(
+            ["0000037996-21-000012", "0000037996-20-000001"],
+            columnar["filings"]["accessionNumber"][:2],
+        )
+        self.assertEqual(
+            "https://sec.gov/Archives/edgar/data/37996", columnar["archive_url"]
+        )
+        self.assertEqual(
+            results["filings"][1]["document"],
+            f"{columnar['archive_url']}/000003799620000001/f.htm",
+        )
+        # the rows aren't built from the columns, but hold the same filings
+        rows = ColumnarFormData.from_dict(columnar).with_filing_rows().to_dict()
+        self.assertListEqual(results["filings"], rows["filings"])
+
+    @patch.object(APIConnection, "_http_session")
+    def test_search_form_info_from_bulk_index(self, mock_session):
+        mock_session.request.side_effect = URLError(reason=None)
+        with tempfile.TemporaryDirectory() as folder:
+            submissions = Path(folder) / "submissions.zip"
+            with zipfile.ZipFile(submissions, "w") as archive:
+                archive.writestr(f"{self.real_cik}.json", json.dumps(SUBMISSIONS_JSON))
+            index = FilingIndex(Path(folder) / "index.sqlite3")
+            index.ingest(submissions)
+            self.api_conn._filing_index = index
+            try:
+                results = self.api_conn.search_form_info(self.real_cik)
+                self.assertEqual(0, mock_session.request.call_count)
+                self.validate_form_metadata(results)
+                self.assertEqual("FORD MOTOR CO", results["issuing_entity"])
+                self.assertEqual("DEARBORN", results["address"]["business"]["city"])
+                self.assertEqual(1, len(results["filings"]))
+                self.validate_individual_filing(results["filings"][0])
+                self.assertEqual(
+                    "https://sec.gov/Archives/edgar/data/37996/000003799621000012/f-20201231.htm",
+                    results["filings"][0]["document"],
+                )
+
+                # companies that aren't in the index are looked up on SEC EDGAR
+                with self.assertRaises(APIConnectionError):
+                    self.api_conn.search_form_info("CIK0000320193")
+                self.assertEqual(1, mock_session.request.call_count)
+
+                # as are those only found in full-index files, which don't name the documents
+                form_idx = Path(folder) / "form.idx"
+                form_idx.write_text(
+                    "Form Type   Company Name    CIK         Date Filed  File Name\n"
+                    "---------------------------------------------------------------\n"
+                    "10-K        APPLE INC       320193      2020-10-30  "
+                    "edgar/data/320193/0000320193-20-000096.txt\n"
+                )
+                index.ingest(form_idx)
+                with self.assertRaises(APIConnectionError):
+                    self.api_conn.search_form_info("CIK0000320193")
+                self.assertEqual(2, mock_session.request.call_count)
+
+                # and filings made after the company's submissions were indexed
+                with zipfile.ZipFile(submissions, "w") as archive:
+                    archive.writestr(
+                        zipfile.ZipInfo(f"{self.real_cik}.json", (2021, 3, 1, 0, 0, 0)),
+                        json.dumps(SUBMISSIONS_JSON),
+                    )
+                index.ingest(submissions)
+                results = self.api_conn.search_form_info(
+                    self.real_cik, ["10-K"], "2021-01-01", "2021-03-01"
+                )
+                self.assertEqual(1, len(results["filings"]))
+                self.assertEqual(2, mock_session.request.call_count)
+                with self.assertRaises(APIConnectionError):
+                    self.api_conn.search_form_info(
+                        self.real_cik, ["10-K"], "2021-01-01", "2021-03-02"
+                    )
+                self.assertEqual(3, mock_session.request.call_count)
+            finally:
+                self.api_conn._filing_index = None
+                index.close()
+
+    @patch.object(APIConnection, "_http_session")
+    def test_search_from_entity_index(self, mock_session):
+        company_tickers = {
+            "0": {"cik_str": 37996, "ticker": "F", "title": "FORD MOTOR CO"},
+            "1": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."},
+        }
+        mock_session.request.return_value = mock_response(
+            gzip.compress(json.dumps(company_tickers).encode("utf-8"))
+        )
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.api_conn._filing_cache = FilingCache(Path(cache_dir))
+            self.api_conn._entity_index = EntityIndex()
+            self.assertEqual(2, self.api_conn.refresh_entity_index()["added"])
+
+            mock_session.request.side_effect = URLError(reason=None)
+            self.assertListEqual(
+                [{"cik": self.real_cik, "entity": "FORD MOTOR CO"}],
+                self.api_conn.search("ford"),
+            )
+            self.assertEqual("CIK0000320193", self.api_conn.search("aapl")[0]["cik"])
+            self.assertEqual(1, mock_session.request.call_count)
+
+            # entities that aren't in the index are searched for on SEC EDGAR
+            with self.assertRaises(APIConnectionError):
+                self.api_conn.search("berkshire")
+            self.assertEqual(2, mock_session.request.call_count)
+
+            # as are keys only loosely matching an entity of the index, whose matches are
+            # used if SEC EDGAR can't be reached, and otherwise follow its own
+            self.assertListEqual(
+                [{"cik": self.real_cik, "entity": "FORD MOTOR CO"}],
+                self.api_conn.search("frod motor"),
+            )
+            self.assertEqual(3, mock_session.request.call_count)
+            hits = [{"_id": "1000001", "_source": {"entity": "FROD MOTOR TRUST"}}]
+            mock_session.request.side_effect = None
+            mock_session.request.return_value = mock_response(
+                gzip.compress(json.dumps({"hits": {"hits": hits}}).encode("utf-8"))
+            )
+            self.assertListEqual(
+                ["CIK0001000001", self.real_cik],
+                [match["cik"] for match in self.api_conn.search("frod motor")],
+            )
+            self.assertEqual(4, mock_session.request.call_count)
+            mock_session.request.side_effect = URLError(reason=None)
+
+            # a stale copy is used if SEC EDGAR can't be reached
+            self.api_conn._filing_cache.ttl_seconds = -1
+            self.assertDictEqual(
+                {"added": 0, "renamed": 0, "removed": 0, "entities": 2},
+                self.api_conn.refresh_entity_index(),
+            )
+            self.assertEqual(5, mock_session.request.call_count)
+
+    @patch.object(APIConnection, "_http_session")
+    def test_memoized_results(self, mock_session):
+        def respond(method, url, headers=None, body=None):
+            if url == APIConnection.SEARCH_URL:
+                hits = [{"_id": "37996", "_source": {"entity": "FORD MOTOR CO"}}]
+                body = {"hits": {"hits": hits}}
+            else:
+                body = SUBMISSIONS_JSON
+            return mock_response(gzip.compress(json.dumps(body).encode("utf-8")))
+
+        mock_session.request.side_effect = respond
+        self.api_conn._memo_cache = MemoCache()
+        try:
+            first = self.api_conn.search("Ford Motor")
+            self.assertListEqual(first, self.api_conn.search("  ford   MOTOR "))
+            form_info = self.api_conn.search_form_info(self.real_cik)
+            self.assertDictEqual(
+                form_info, self.api_conn.search_form_info(self.real_cik_lowercase)
+            )
+            self.assertEqual(2, mock_session.request.call_count)
+            stats = self.api_conn.search_cache_stats()
+            self.assertEqual(
+                (2, 2, 2), (stats["hits"], stats["misses"], stats["entries"])
+            )
+
+            # errors aren't cached
+            with self.assertRaises(APIConnectionError):
+                self.api_conn.search_form_info("CIK")
+            self.assertEqual(2, self.api_conn.search_cache_stats()["entries"])
+
+            self.assertEqual(
+                1, self.api_conn.invalidate_search_cache(self.real_cik_lowercase)
+            )
+            self.api_conn.search_form_info(self.real_cik)
+            self.api_conn.search("ford motor")
+            self.assertEqual(3, mock_session.request.call_count)
+            self.assertEqual(2, self.api_conn.invalidate_search_cache())
+        finally:
+            self.api_conn._memo_cache = None
+
     def test_legit_request(self):
         # Reason for warning supression: https://stackoverflow.com/a/55411485
         warnings.filterwarnings(
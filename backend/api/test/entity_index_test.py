@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import unittest
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from entity_index import EntityIndex  # type: ignore # noqa: E402
+
+COMPANY_TICKERS = {
+    "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."},
+    "1": {"cik_str": 37996, "ticker": "F", "title": "FORD MOTOR CO"},
+    "2": {"cik_str": 1652044, "ticker": "GOOGL", "title": "Alphabet Inc."},
+    "3": {"cik_str": 1652044, "ticker": "GOOG", "title": "Alphabet Inc."},
+    "4": {"cik_str": 1418091, "ticker": "TWTR", "title": "Twitter, Inc."},
+    "5": {"cik_str": 1467858, "ticker": "GM", "title": "General Motors Co"},
+    "6": {
+        "cik_str": 1094084,
+        "ticker": "APLE",
+        "title": "Apple Hospitality REIT, Inc.",
+    },
+}
+
+
+class TestEntityIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = EntityIndex()
+        self.counts = self.index.update(
+            EntityIndex.parse_company_tickers(COMPANY_TICKERS)
+        )
+
+    def ciks(self, search_key, limit=10):
+        return [cik for cik, _ in self.index.search(search_key, limit)]
+
+    def test_update_counts(self):
+        # Alphabet has two tickers
+        self.assertDictEqual(
+            {"added": 6, "renamed": 0, "removed": 0, "entities": 6}, self.counts
+        )
+        self.assertEqual(6, len(self.index))
+
+    def test_ticker(self):
+        self.assertListEqual([(1652044, "Alphabet Inc.")], self.index.search("goog"))
+        self.assertEqual(1652044, self.ciks("GOOGL")[0])
+        # a ticker match comes first, then names starting with the key
+        self.assertListEqual(
+            [37996, 1094084], self.ciks("f")[:1] + self.ciks("aple")[:1]
+        )
+
+    def test_cik(self):
+        self.assertListEqual([(37996, "FORD MOTOR CO")], self.index.search("37996"))
+        self.assertEqual(37996, self.ciks("cik0000037996")[0])
+        self.assertListEqual([], self.ciks("0000000001"))
+
+    def test_name_prefix(self):
+        # in alphabetical order
+        self.assertListEqual([1094084, 320193], self.ciks("apple"))
+        self.assertEqual(320193, self.ciks("Apple Inc")[0])
+        self.assertListEqual([1418091], self.ciks("twitter inc"))
+        self.assertListEqual([1094084], self.ciks("app", limit=1))
+        self.assertListEqual([], self.ciks("zz"))
+
+    def test_fuzzy(self):
+        self.assertEqual(37996, self.ciks("frod motor")[0])
+        self.assertEqual(1467858, self.ciks("motors general")[0])
+        self.assertListEqual([], self.ciks("qqqqqqq"))
+        self.assertListEqual([], self.index.search("frod motor", fuzzy=False))
+
+    def test_incremental_update(self):
+        entries = EntityIndex.parse_company_tickers(COMPANY_TICKERS)
+        entries = [entry for entry in entries if entry[0] != 1418091]
+        entries = [
+            (cik, ticker, "Meta Platforms, Inc.")
+            if cik == 37996
+            else (cik, ticker, name)
+            for cik, ticker, name in entries
+        ]
+        entries.append((1318605, "TSLA", "Tesla, Inc."))
+        self.assertDictEqual(
+            {"added": 1, "renamed": 1, "removed": 1, "entities": 6},
+            self.index.update(entries),
+        )
+        self.assertListEqual([], self.ciks("twitter"))
+        self.assertListEqual([], self.ciks("TWTR"))
+        self.assertListEqual([37996], self.ciks("meta"))
+        self.assertListEqual([1318605], self.ciks("tesla"))
+        # the trigrams of the old name are gone with it
+        self.assertNotIn(" fo", self.index._postings)
+
+    def test_search_speed(self):
+        entries = [
+            (n, f"T{n}", f"Company {n} Holdings {n % 97} Inc") for n in range(12000)
+        ]
+        self.index.update(entries)
+        started = time.perf_counter()
+        for key in ["c", "company 11", "T5000", "holdngs 42"]:
+            self.assertTrue(self.index.search(key))
+        self.assertLess(time.perf_counter() - started, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
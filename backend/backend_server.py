@@ -1,143 +1,602 @@
+# first, so that the time the other imports take is measured too
+from misc.startup_timing import startup_timer  # isort: skip
+import multiprocessing
+import os
 import sys
 import threading
-from enum import Enum
+import time
 from pathlib import Path
-from typing import Any, Dict, List  # noqa:F401
+from typing import Any, Dict, List, Optional, Set, Tuple, Union  # noqa:F401
 
 import gevent  # type: ignore
 import zerorpc  # type: ignore
+from gevent.queue import Queue  # type: ignore
 from zmq import ZMQError  # type: ignore
 
+from api.bulk_index import FilingIndex, IndexSource
 from api.connection import APIConnection
-from misc.rate_limiting import RateLimitTracker
-from parse.parse import Parse
+from api.entity_index import EntityIndex
+from misc import job_manager, serializable_dataclass
+from misc.filing_cache import FilingCache, default_cache_directory
+from misc.job_journal import FilingStage, JobJournal
+from misc.job_manager import Job, JobEventType, JobInfo, JobManager, JobState
+from misc.memo_cache import MemoCache
+from misc.process_pool import ProcessPool
+from misc.rate_limiting import RateLimitTracker, shared_rate_limit_tracker
+from misc.threadpool import run_blocking
+from parse import parse
+from parse.parse import AnalyzedDocument, DocumentSource, Parse
+from writer.columnar_writer import ColumnarFormat, ColumnarWriter, pq
+from writer.summary_writer import SummaryWriter
 from writer.write_to_excel import DataWriter
 
 killServer = False  # Will be mutated unsafely by a kill-listener thread; doesn't result in race conditions
 
 
-class JobState(str, Enum):
-    NO_WORK = "No Work"
-    WORKING = "Working"
-    COMPLETE = "Complete"
-    ERROR = "Error"
-
-
 class BackendServer(APIConnection, DataWriter, Parse):
-    def __init__(self, limit_counter: RateLimitTracker) -> None:
+    # maximum number of filings waiting between two stages of _process_filings()
+    PIPELINE_QUEUE_SIZE = 8
+    # maximum number of filings analyzed together, so that nlp.pipe() batches the sections of
+    # several filings, while the filings of a job are still spread over the worker processes
+    FILINGS_PER_ANALYSIS = 4
+    # failed filings listed in the error of a job; the rest are only counted
+    MAX_REPORTED_FAILURES = 5
+    # jobs run at once by default; they share the rate limit and the worker pool, so a second
+    # job mostly overlaps its downloads with the parsing and saving of the first
+    DEFAULT_MAX_CONCURRENT_JOBS = 2
+
+    def __init__(
+        self,
+        limit_counter: RateLimitTracker,
+        filing_cache: Optional[FilingCache] = None,
+        worker_count: int = 0,
+        max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+        filing_index: Optional[FilingIndex] = None,
+        entity_index: Optional[EntityIndex] = None,
+        memo_cache: Optional[MemoCache] = None,
+    ) -> None:
+        """
+        Parameters:
+            limit_counter: rate limiter shared by every request to SEC EDGAR
+            filing_cache: on-disk cache of EDGAR responses; no caching if None
+            worker_count: number of processes to parse documents and apply NER in;
+                if 0, they are processed in this process instead
+            max_concurrent_jobs: number of process_filing_set() jobs run at once;
+                the rest wait in a queue
+            filing_index: local index of EDGAR's bulk data, which search_form_info()
+                answers from where it can; see load_bulk_index()
+            entity_index: in-memory index of companies with a ticker, which search() answers
+                from where it can; see refresh_entity_index()
+            memo_cache: in-memory cache of the results of search() and search_form_info();
+                no caching if None
+        """
         super().__init__(limit_counter)
-        self.processing_state = JobState.NO_WORK
-        self.processing_error = None
-
-    def _set_job_state(self, state: JobState, err=None):
-        self.processing_state = state
-        self.processing_error = err
-
-    def _rate_limited_html_download(self, url: str, dest_folder: Path, filename: str):
+        self._filing_cache = filing_cache
+        self._worker_pool = (
+            ProcessPool(worker_count, initializer=parse.initialize_parse_worker)
+            if worker_count > 0
+            else None
+        )
+        self._jobs = JobManager(max_concurrent_jobs)
+        self._filing_index = filing_index
+        self._entity_index = entity_index
+        self._memo_cache = memo_cache
+
+    def _rate_limited_html_download(
+        self, url: str, dest_folder: Path, filename: str
+    ) -> Path:
         dest_folder.mkdir(parents=True, exist_ok=True)
-        dest_path = Path(dest_folder, filename)
-        data = self._get_html_data(url)
-        with open(dest_path.resolve(), mode="w") as file:
-            file.write(data)
+        return self._download_html(url, Path(dest_folder, filename).resolve())
 
     def get_job_state(self):
-        return {"state": self.processing_state, "error": self.processing_error}
+        """
+        The state of the jobs as a whole: WORKING while any job is queued or running, and
+        otherwise the state (and error) of the job that finished last. See get_job() for
+        the state and progress of a single job.
+        """
+        jobs = self._jobs.jobs()
+        if any(job.state not in job_manager.FINISHED_STATES for job in jobs):
+            return {"state": JobState.WORKING, "error": None}
+        if not jobs:
+            return {"state": JobState.NO_WORK, "error": None}
+        last_job = max(jobs, key=lambda job: job.finished_at)  # type: ignore
+        return {"state": last_job.state, "error": last_job.error}
+
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def get_job(self, job_id: str) -> Optional[JobInfo]:
+        """The state and progress of a job, or None if there's no such job"""
+        job = self._jobs.get(job_id)
+        return job.info() if job is not None else None
+
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def list_jobs(self) -> List[JobInfo]:
+        """Every queued, running and recently finished job, oldest first"""
+        return [job.info() for job in self._jobs.jobs()]
+
+    def cancel_job(self, job_id: str) -> bool:
+        """
+        Cancels a queued or running job. A running job stops where it is; its journal keeps
+        the work it finished (see _process_filings()), so running it again resumes it.
+        Returns False if there's no such job, or it had already finished.
+        """
+        return self._jobs.cancel(job_id)
+
+    @zerorpc.stream
+    def stream_job_events(self, job_id: Optional[str] = None):
+        """
+        Streams the progress of the jobs (or only job_id) as it happens, as JobEvent dicts,
+        instead of polling get_job(). Starts with the current state of each job; with a job_id,
+        the stream ends once the job has finished. See JobManager.subscribe_events().
+        """
+        for event in self._jobs.subscribe_events(job_id):
+            yield event.to_dict()
+
+    def set_max_concurrent_jobs(self, max_concurrent_jobs: int):
+        self._jobs.set_max_concurrent_jobs(max_concurrent_jobs)
 
     def process_filing_set(
         self,
         filing_list: List[Dict[str, Any]],
         output_folder_path: str,
         perform_ner: bool = True,
-    ):
-        # set state to indicate we're working
-        if self.processing_state == JobState.WORKING:
-            return False
-        self._set_job_state(JobState.WORKING)
-        gevent.spawn(
-            self._process_filings, filing_list, output_folder_path, perform_ner
+        columnar_format: Optional[str] = None,
+        priority: int = 0,
+    ) -> str:
+        """
+        Queues a job processing the given filings into output_folder_path/summary.xlsx.
+        If columnar_format is "parquet" or "jsonl", the rows are also written, without
+        Excel's limits on cell length, to summary.parquet/ or summary.jsonl.gz respectively.
+        If the same job was run in output_folder_path before, e.g. until the backend was closed,
+        the filings it already finished are skipped.
+
+        Jobs with a higher priority start first; jobs writing to the same output folder
+        run one after the other. Returns the ID of the job, for get_job(), stream_job_events()
+        and cancel_job().
+        """
+        # fail now, rather than after the job has downloaded and parsed everything
+        output_format = (
+            ColumnarFormat(columnar_format) if columnar_format is not None else None
+        )
+        if output_format == ColumnarFormat.PARQUET and pq is None:
+            raise ImportError(
+                "Parquet output requires pyarrow to be installed (poetry install -E parquet)"
+            )
+        job = self._jobs.submit(
+            lambda job: self._process_filings(
+                job, filing_list, output_folder_path, perform_ner, output_format
+            ),
+            description=f"{len(filing_list)} filings into {output_folder_path}",
+            priority=priority,
+            exclusive_key=str(Path(output_folder_path).resolve()),
+        )
+        return job.job_id
+
+    def load_bulk_index(self, path: str) -> str:
+        """
+        Queues a job indexing EDGAR's bulk data at path: a submissions.zip, a full-index file
+        (form.idx, company.idx or master.idx), or a folder of them. Once indexed, search_form_info()
+        answers for the companies in them without any requests, as of the day the files were
+        published. Returns the ID of the job; its progress counts the filings indexed as written.
+        """
+        if self._filing_index is None:
+            raise ValueError("No filing index is configured")
+        index = self._filing_index
+        bulk_data = Path(path)
+        if not bulk_data.exists():
+            raise FileNotFoundError(path)
+
+        def ingest(job: Job):
+            def on_progress(filing_count: int):
+                # called from the indexing thread; only plain assignments are safe here
+                job.progress.filings_written = filing_count
+
+            sources = run_blocking(
+                index.ingest, bulk_data, APIConnection.ALLOWED_FORMS, on_progress
+            )
+            job.progress.filings_total = sum(source.filings for source in sources)
+            job.progress.filings_finished = job.progress.filings_total
+
+        # a cancelled job stops waiting, but the file being indexed is still finished
+        job = self._jobs.submit(
+            ingest,
+            description=f"Indexing {path}",
+            exclusive_key=str(index.path),
         )
-        return True
+        return job.job_id
+
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def bulk_index_status(self) -> List[IndexSource]:
+        """The bulk data files indexed so far, with the dates of the filings in each"""
+        return self._filing_index.sources() if self._filing_index is not None else []
+
+    def _analyze_filings(
+        self, filings: List[Tuple[Dict[str, Any], Optional[Path]]], perform_ner: bool
+    ) -> List[Union[AnalyzedDocument, Exception]]:
+        """
+        Parses several filings, given as (filing, local copy or None), and applies NER to them
+        together (if perform_ner is True), in the worker pool if there is one. Returns, for each
+        filing, its document map and NER results, or the exception that stopped it.
+        """
+        if self._worker_pool is None:
+            return self._analyze_documents(
+                [
+                    (
+                        DocumentSource(
+                            url=filing["documentAddress10k"], path=local_copy
+                        ),
+                        None,
+                    )
+                    for filing, local_copy in filings
+                ],
+                perform_ner,
+            )
+
+        # the workers share neither the FilingCache nor the rate limiter, so cached section maps
+        # are looked up and stored here, and documents without a local copy are downloaded here
+        outcomes: List[Union[AnalyzedDocument, Exception, None]] = []
+        documents = []
+        for filing, local_copy in filings:
+            url = filing["documentAddress10k"]
+            try:
+                cached_map = self._get_cached_section_map(url)
+                source = None
+                if cached_map is None:
+                    if local_copy is not None:
+                        source = DocumentSource(url=url, path=local_copy)
+                    else:
+                        source = DocumentSource(
+                            url=url, data=self._get_html_data(url).encode("utf-8")
+                        )
+            except Exception as err:
+                outcomes.append(err)
+                continue
+            outcomes.append(None)
+            documents.append((source, cached_map))
+        analyzed = iter(
+            self._worker_pool.apply(parse.parse_and_recognize, documents, perform_ner)
+            if documents
+            else []
+        )
+        results: List[Union[AnalyzedDocument, Exception]] = []
+        for (filing, _), outcome in zip(filings, outcomes):
+            if outcome is None:
+                outcome = next(analyzed)
+                if not isinstance(outcome, Exception):
+                    self._cache_section_map(filing["documentAddress10k"], outcome[0])
+            results.append(outcome)
+        return results
+
+    def get_startup_timings(self) -> Dict[str, float]:
+        """
+        How long each step of starting the backend took, in seconds, for tracking cold-start latency.
+        ner_warm_up only appears once the spaCy model has been loaded in the background.
+        """
+        return dict(startup_timer.steps)
+
+    def _warm_up_ner(self):
+        """
+        Loads the spaCy model ahead of the first job with NER: in each worker process if there's a
+        worker pool, and in this process otherwise. Blocks the calling greenlet, but not the event loop.
+        Returns how long it took, in seconds.
+        """
+        started_at = time.perf_counter()
+        if self._worker_pool is None:
+            run_blocking(parse.load_ner_model)
+        else:
+            futures = [
+                self._worker_pool.submit(parse.warm_up_parse_worker)
+                for _ in range(self._worker_pool.worker_count)
+            ]
+            pending = futures
+            while pending:
+                _, pending = self._worker_pool.wait_any(pending)
+            for future in futures:
+                future.result()  # raises the exception of the worker, if any
+        return time.perf_counter() - started_at
+
+    def _shutdown_workers(self):
+        if self._worker_pool is not None:
+            self._worker_pool.shutdown()
 
     def _process_filings(
         self,
+        job: Job,
         filing_list: List[Dict[str, Any]],
         output_folder_path: str = "./output",
         perform_ner: bool = True,
+        columnar_format: Optional[ColumnarFormat] = None,
     ):
+        """
+        Downloads, parses, applies NER to and writes the rows of filings as a pipeline:
+
+            download greenlets -> download_queue -> analysis greenlets -> result_queue -> this greenlet
+
+        Each 10-K moves on to the next stage as soon as it's ready, so parsing and NER overlap
+        with the (rate-limited) downloads of the other filings. The queues are bounded, so a
+        fast stage blocks instead of piling up documents in memory when a later stage falls behind.
+        Downloads pass on (filing, path of the local copy or None), and analyses pass on
+        (filing, (document map, NER results) or None, exception that stopped the filing or None).
+        An analysis greenlet takes every 10-K waiting in download_queue, up to FILINGS_PER_ANALYSIS,
+        so that NER runs over the sections of several filings at once (see _analyze_filings()).
+
+        The progress of each filing is recorded in a JobJournal in the output folder. Running
+        the same job again (e.g. after the backend was closed partway through) skips the filings
+        that are done, and adds the rows of those that were analyzed without analyzing them again.
+        Rows are only added to the output files (summary.xlsx and the columnar output, if any)
+        they weren't saved to before, and written again to output files that were deleted.
+        10-Ks saved with a different perform_ner setting are analyzed again, and their new rows added.
+        Filings that fail are recorded in the journal and skipped, and reported once the rest
+        of the job is complete; running the job again retries them.
+
+        The progress of each stage is counted in job.progress as filings move through them.
+        """
         state_message = "downloading documents"
         subject = ""
+        download_queue: Queue = Queue(BackendServer.PIPELINE_QUEUE_SIZE)
+        result_queue: Queue = Queue(BackendServer.PIPELINE_QUEUE_SIZE)
+        stage_greenlets: List[gevent.Greenlet] = []
+        summary: Optional[SummaryWriter] = None
+        columnar_output: Optional[ColumnarWriter] = None
+        journal: Optional[JobJournal] = None
+        # names of the output files of this job
+        outputs: List[str] = []
+        # filings whose rows are in the output files once they're saved
+        written_filings: List[Dict[str, Any]] = []
+        failures: List[str] = []
+        progress = job.progress
+        progress.filings_total = len(filing_list)
+
+        def is_10k(filing: Dict[str, Any]) -> bool:
+            return filing["filingType"].lower() == "10-K".lower()
+
+        def describe(filing: Dict[str, Any]) -> str:
+            return f'{filing["documentAddress10k"]} for {filing["entityName"]}'
+
+        def record_failure(filing: Dict[str, Any], action: str, err: Exception):
+            msg = ""
+            if hasattr(err, "message"):
+                msg = ":\n" + err.message  # type: ignore
+            error_desc = f"Error while {action} {describe(filing)}{msg}"
+            run_blocking(journal.record_failure, filing, action, error_desc)  # type: ignore
+            failures.append(error_desc)
+            progress.filings_failed += 1
+            progress.filings_finished += 1
+            job.publish(
+                JobEventType.FILING_FAILED, filing["documentAddress10k"], error_desc
+            )
+
+        def save_local_copy(filing: Dict[str, Any]) -> Optional[Path]:
+            """Downloads a filing, unless it was before; returns its local copy, or None if it failed"""
+            record = run_blocking(journal.get, filing)  # type: ignore
+            local_copy = None
+            if record is not None and record.local_copy is not None:
+                local_copy = Path(record.local_copy)
+            if local_copy is None or not local_copy.is_file():
+                try:
+                    local_copy = self._rate_limited_html_download(
+                        filing["documentAddress10k"],
+                        Path(output_folder_path, filing["entityName"]),
+                        f"{filing['filingType']}_{filing['filingDate']}.htm",
+                    )
+                    run_blocking(journal.record_download, filing, local_copy)  # type: ignore
+                    progress.bytes_downloaded += local_copy.stat().st_size
+                except Exception as err:
+                    local_copy = None
+                    # parsing falls back to the URL and reports the error, if the filing is parsed at all
+                    if not is_10k(filing):
+                        record_failure(filing, "downloading document", err)
+            if local_copy is not None:
+                progress.filings_downloaded += 1
+                if not is_10k(filing):
+                    progress.filings_finished += 1
+                job.publish(
+                    JobEventType.FILING_DOWNLOADED, filing["documentAddress10k"]
+                )
+            return local_copy
+
+        def download(filing: Dict[str, Any]):
+            try:
+                local_copy = save_local_copy(filing)
+            except Exception as err:
+                # e.g. the journal couldn't be read. The main loop waits for a result of every 10-K,
+                # so this one has to be reported as failed rather than dropped
+                if is_10k(filing):
+                    result_queue.put((filing, None, err))
+                else:
+                    record_failure(filing, "downloading document", err)
+                return
+            # Only 10-Ks should be parsed and added to the spreadsheet
+            if is_10k(filing):
+                download_queue.put((filing, local_copy))
+
+        def analyze():
+            for downloaded in download_queue:
+                # take the other filings waiting too, so NER batches the sections of several
+                batch = [downloaded]
+                while (
+                    len(batch) < BackendServer.FILINGS_PER_ANALYSIS
+                    and not download_queue.empty()
+                ):
+                    batch.append(download_queue.get())
+                try:
+                    outcomes = self._analyze_filings(batch, perform_ner)
+                except Exception as err:
+                    outcomes = [err] * len(batch)
+                for (filing, _), outcome in zip(batch, outcomes):
+                    if isinstance(outcome, Exception):
+                        result_queue.put((filing, None, outcome))
+                    else:
+                        result_queue.put((filing, outcome, None))
+
+        def add_rows(
+            filing: Dict[str, Any],
+            summary_row: Dict[str, Any],
+            columnar_row: Dict[str, Any],
+        ):
+            written_to = run_blocking(journal.get, filing).written_to  # type: ignore
+            if summary.excel_path.name not in written_to:  # type: ignore
+                summary.append_row(summary_row)  # type: ignore
+            if (
+                columnar_output is not None
+                and columnar_output.output_path.name not in written_to
+            ):
+                columnar_output.append_row(columnar_row)
+            written_filings.append(filing)
+
         try:
             # create the path / output folder if it doesn't exist
             Path(output_folder_path).mkdir(parents=True, exist_ok=True)
-            spreadsheet_contents = self._load_main_spreadsheet(output_folder_path)
-
-            # download html files
-            download_tasks = [
-                gevent.spawn(
-                    self._rate_limited_html_download,
-                    filing["documentAddress10k"],
-                    Path(output_folder_path, filing["entityName"]),
-                    f"{filing['filingType']}_{filing['filingDate']}.htm",
+            summary = self._open_main_spreadsheet(output_folder_path)
+            if columnar_format is not None:
+                columnar_output = self._open_columnar_output(
+                    output_folder_path, columnar_format
                 )
-                for filing in filing_list
-            ]
-            gevent.joinall(download_tasks)
 
-            # Only 10-Ks should be parsed and added to the spreadsheet
-            filing_list_10k = [
-                filing
-                for filing in filing_list
-                if filing["filingType"].lower() == "10-K".lower()
+            # the journal commits every change, so it's only used from the threadpool
+            journal = run_blocking(JobJournal, Path(output_folder_path))
+            output_paths = [summary.excel_path]
+            if columnar_output is not None:
+                output_paths.append(columnar_output.output_path)
+            outputs = [path.name for path in output_paths]
+            for path in output_paths:
+                if not path.exists():
+                    # the rows written by earlier jobs are gone, so they have to be written again
+                    run_blocking(journal.forget_written, path.name)
+            run_blocking(journal.add_filings, filing_list)
+
+            # work out what's left to do, if this job was run before
+            remaining_filings = []
+            for filing in filing_list:
+                record = run_blocking(journal.get, filing)
+                if (
+                    is_10k(filing)
+                    and record.written_to  # type: ignore
+                    and record.perform_ner != perform_ner  # type: ignore
+                ):
+                    # its rows were written with(out) NER before; it's analyzed again as asked,
+                    # and its new rows are added to the output files
+                    run_blocking(journal.forget_analysis, filing)
+                    record = run_blocking(journal.get, filing)
+                if all(output in record.written_to for output in outputs):  # type: ignore
+                    progress.filings_resumed += 1
+                    continue
+                if is_10k(filing):
+                    rows = run_blocking(journal.analyzed_rows, filing, perform_ner)
+                    if rows is not None:
+                        add_rows(filing, *rows)
+                        progress.filings_resumed += 1
+                        continue
+                elif (
+                    record.stage == FilingStage.DOWNLOADED  # type: ignore
+                    and Path(record.local_copy).is_file()  # type: ignore
+                ):
+                    progress.filings_resumed += 1
+                    continue
+                remaining_filings.append(filing)
+
+            filing_count_10k = sum(1 for filing in remaining_filings if is_10k(filing))
+            # spaCy only uses one core, so a single analysis greenlet suffices without a worker pool
+            analysis_count = (
+                self._worker_pool.worker_count if self._worker_pool is not None else 1
+            )
+            stage_greenlets = [gevent.spawn(download, f) for f in remaining_filings] + [
+                gevent.spawn(analyze) for _ in range(analysis_count)
             ]
 
-            # parse html iteratively, to maximize number of event loop yields with gevent
-            state_message = "parsing document"
-            parse_task_results: List[Dict[str, Dict[str, str]]] = []
-            for filing in filing_list_10k:
-                subject = f'{filing["documentAddress10k"]} for {filing["entityName"]}'
-                parse_task_results.append(
-                    self.parse_document(filing["documentAddress10k"])
-                )
-
-            # apply NER iteratively, to maximize number of event loop yields with gevent
-            ner_task_results = []
-            state_message = "applying NER to document"
-            for i in range(len(parse_task_results)):
-                subject = f'{filing_list_10k[i]["documentAddress10k"]} for {filing_list_10k[i]["entityName"]}'
+            # rows are added in the order filings finish, rather than the order of filing_list
+            for _ in range(filing_count_10k):
+                state_message = "parsing document"
+                filing, results, err = result_queue.get()
+                subject = describe(filing)
+                if err is not None:
+                    record_failure(filing, state_message, err)
+                    continue
+                progress.filings_parsed += 1
                 if perform_ner:
-                    ner_task_results.append(
-                        self._apply_named_entity_recognition(parse_task_results[i])
-                    )
-                else:
-                    ner_task_results.append(
-                        {}
-                    )  # if we don't run NER, behave as if no entities were recognized
-
-            state_message = "adding spreadsheet row for document"
-            # iteratively expand spreadsheet
-            for i in range(0, len(parse_task_results)):
-                subject = f'{filing_list_10k[i]["documentAddress10k"]} for {filing_list_10k[i]["entityName"]}'
-                spreadsheet_contents = self.add_dataframe_row(
-                    spreadsheet_contents,
-                    filing_list_10k[i],
-                    parse_task_results[i],
-                    ner_task_results[i],
+                    progress.filings_recognized += 1
+                state_message = "adding spreadsheet row for document"
+                summary_row = self._build_summary_row(filing, results[0], results[1])
+                columnar_row = self._build_columnar_row(filing, results[0], results[1])
+                # kept until the output files are saved, in case the job is interrupted first
+                run_blocking(
+                    journal.record_analysis,
+                    filing,
+                    perform_ner,
+                    summary_row,
+                    columnar_row,
                 )
-
-            # use openpyxl to rewrite to excel; needs tinkering
-            spreadsheet_contents.to_excel(
-                Path(output_folder_path, "summary.xlsx"), index=False
+                add_rows(filing, summary_row, columnar_row)
+                progress.filings_finished += 1
+                job.publish(JobEventType.FILING_ANALYZED, filing["documentAddress10k"])
+
+            # the remaining filings (if any) weren't 10-Ks; let their downloads finish
+            state_message = "downloading documents"
+            subject = ""
+            gevent.joinall(stage_greenlets[: len(remaining_filings)])
+
+            # each output file is recorded as soon as it's saved, so that if saving the next one
+            # fails (or the backend is closed first), running the job again only adds the rows
+            # missing from that one; the rows are kept until they're in every output file
+            state_message = "saving spreadsheet"
+            summary.save()
+            run_blocking(
+                journal.record_written,
+                written_filings,
+                [summary.excel_path.name],
+                keep_rows=columnar_output is not None,
+            )
+            if columnar_output is not None:
+                state_message = f"saving {columnar_output.output_path.name}"
+                columnar_output.save()
+                run_blocking(
+                    journal.record_written,
+                    written_filings,
+                    [columnar_output.output_path.name],
+                )
+            progress.filings_written = len(written_filings)
+            job.publish(JobEventType.FILINGS_WRITTEN)
+            job.set_state(
+                JobState.COMPLETE,
+                self._describe_failures(failures, len(filing_list))
+                if failures
+                else None,
             )
-            self._set_job_state(JobState.COMPLETE)
         except Exception as err:
             msg = ""
             if hasattr(err, "message"):
                 msg = ":\n" + err.message  # type: ignore
             error_desc = f"Error while {state_message} {subject}{msg}"
-            self._set_job_state(JobState.ERROR, error_desc)
+            job.set_state(JobState.ERROR, error_desc)
+        finally:
+            gevent.killall(stage_greenlets)
+            if summary is not None:
+                summary.close()
+            if columnar_output is not None:
+                columnar_output.close()
+            if journal is not None:
+                run_blocking(journal.close)
+            if self._filing_cache is not None:
+                self._filing_cache.flush()
+
+    def _describe_failures(self, failures: List[str], filing_count: int) -> str:
+        """The error reported for a job that completed, but skipped some filings"""
+        shown = failures[: BackendServer.MAX_REPORTED_FAILURES]
+        description = (
+            f"{len(failures)} of {filing_count} filings could not be processed, and were left out. "
+            "Run the same job again to retry them.\n\n" + "\n\n".join(shown)
+        )
+        if len(failures) > len(shown):
+            description += f"\n\n...and {len(failures) - len(shown)} more"
+        return description
 
 
 BIND_ADDRESS = "tcp://127.0.0.1:55565"
+CACHE_MAX_BYTES = 2 * 1024**3  # 2 GiB of compressed filings
+# leave a core for the server itself and the frontend
+NER_WORKER_COUNT = max(1, (os.cpu_count() or 2) - 1)
+# load the spaCy model in the background once the port is announced, so the first job
+# with NER doesn't wait for it; the model is loaded on first use regardless
+WARM_UP_NER_MODEL = True
 
 
 def kill_signal_listener(srv: zerorpc.Server):
@@ -163,9 +622,12 @@ def bind_to_unused_port(srv: zerorpc.Server, port: int = 55555):
     return port
 
 
-def exit_gracefully(srv: zerorpc.Server):
+def exit_gracefully(srv: zerorpc.Server, api_instance: BackendServer):
     while True:
         if killServer:
+            api_instance._shutdown_workers()
+            if api_instance._filing_cache is not None:
+                api_instance._filing_cache.flush()
             srv.stop()
             gevent.sleep(1)
             srv.close()
@@ -173,15 +635,62 @@ def exit_gracefully(srv: zerorpc.Server):
         gevent.sleep(1)
 
 
+def warm_up_ner(api_instance: BackendServer):
+    try:
+        seconds = api_instance._warm_up_ner()
+    except Exception as err:
+        # the first job with NER will try again, and report the error
+        print(f"Loading the NER model failed: {err!r}", file=sys.stderr, flush=True)
+        return
+    startup_timer.record("ner_warm_up", seconds)
+    print(f"NER model loaded in {seconds:.2f}s", file=sys.stderr, flush=True)
+
+
+def load_entity_index(api_instance: BackendServer):
+    started = time.perf_counter()
+    try:
+        counts = api_instance.refresh_entity_index()
+    except Exception as err:
+        # search() asks SEC EDGAR instead, until a refresh_entity_index() succeeds
+        print(f"Loading the entity index failed: {err!r}", file=sys.stderr, flush=True)
+        return
+    seconds = time.perf_counter() - started
+    startup_timer.record("entity_index", seconds)
+    print(
+        f"Entity index of {counts['entities']} entities loaded in {seconds:.2f}s",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
 def main():
-    rate_limiter = RateLimitTracker(5)
-    api_instance = BackendServer(rate_limiter)
+    startup_timer.mark("imports")
+    # one limiter for every request to EDGAR, since the SEC limits them all together
+    rate_limiter = shared_rate_limit_tracker()
+    filing_cache = FilingCache(default_cache_directory(), max_bytes=CACHE_MAX_BYTES)
+    filing_index = FilingIndex(default_cache_directory() / "bulk_index.sqlite3")
+    api_instance = BackendServer(
+        rate_limiter,
+        filing_cache,
+        NER_WORKER_COUNT,
+        filing_index=filing_index,
+        entity_index=EntityIndex(),
+        memo_cache=MemoCache(),
+    )
     server = zerorpc.Server(api_instance, heartbeat=15)
+    startup_timer.mark("server_setup")
 
     # find a port that's not being used
     selected_port = bind_to_unused_port(server, 55555)
-    # communicate the selected port to the frontend via stdout
-    print(selected_port)
+    startup_timer.mark("bind")
+    # communicate the selected port to the frontend via stdout, which carries nothing else
+    print(selected_port, flush=True)
+    startup_timer.record("total_to_port", startup_timer.elapsed())
+    print(f"Startup timings: {startup_timer.summary()}", file=sys.stderr, flush=True)
+
+    if WARM_UP_NER_MODEL:
+        gevent.spawn(warm_up_ner, api_instance)
+    gevent.spawn(load_entity_index, api_instance)
 
     # new thread - listens in on stdin()
     kill_signal_thread = threading.Thread(target=kill_signal_listener, args=[server])
@@ -189,10 +698,12 @@ def main():
     kill_signal_thread.start()
 
     # new greenlet - checks killSignal and stops the event loop (and therefore the main thread) if it's  true
-    gevent.spawn(exit_gracefully, server)
+    gevent.spawn(exit_gracefully, server, api_instance)
 
     server.run()
 
 
 if __name__ == "__main__":
+    # needed for worker processes to start in a frozen (e.g. PyInstaller) executable
+    multiprocessing.freeze_support()
     main()
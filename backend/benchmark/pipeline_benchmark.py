@@ -0,0 +1,228 @@
+"""
+Offline benchmark of the filing processing pipeline.
+
+Replays a corpus of 10-K HTML documents through each stage of BackendServer._process_filings
+(parsing, NER, adding spreadsheet rows, saving the spreadsheet), and reports the wall time,
+peak RSS and documents/second of each stage. Results can be saved as a baseline, and later
+runs compared against it to catch performance regressions between versions.
+
+Usage (from the backend folder):
+    poetry run python benchmark/pipeline_benchmark.py [--corpus DIR] [--repeat N] [--no-ner]
+        [--save results.json] [--compare baseline.json] [--tolerance 0.1]
+
+By default, the corpus is the set of documents the parser's regression tests use
+(parse/test/fixtures). Any folder of .htm files downloaded from EDGAR can be used instead.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+from misc.rate_limiting import RateLimitTracker  # noqa: E402
+from parse.parse import DocumentSource, Parse  # noqa: E402
+from writer.summary_writer import SummaryWriter  # noqa: E402
+from writer.write_to_excel import DataWriter  # noqa: E402
+
+DEFAULT_CORPUS = Path(parent_dir, "parse", "test", "fixtures")
+RESULTS_VERSION = 1
+
+# Stand-in for the metadata the frontend sends along with each filing
+FILING_INFO = {
+    "entityName": "Benchmark Corp",
+    "cikNumber": "CIK0000000000",
+    "ein": "000000000",
+    "hqAddress": {
+        "street1": "1 Benchmark Way",
+        "street2": None,
+        "city": "Dover",
+        "stateOrCountry": "DE",
+        "zipCode": "19901",
+        "stateOrCountryDescription": "DE",
+    },
+    "stateOfIncorporation": "DE",
+    "filingType": "10-K",
+    "filingDate": "2021-01-01",
+    "documentAddress10k": "",
+    "extractInfo": True,
+}
+
+
+@dataclass
+class StageResult:
+    documents: int
+    seconds: float
+    docs_per_second: float
+    # high-water mark of the whole process at the end of the stage
+    peak_rss_mb: Optional[float]
+
+
+def peak_rss_megabytes() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_stage(
+    results: Dict[str, StageResult],
+    name: str,
+    inputs: List[Any],
+    stage: Callable[[Any], Any],
+    batched: bool = False,
+) -> List[Any]:
+    """
+    Runs stage() over every input, and records its timing in results under the given name.
+    If batched, stage() is called once, with the whole list of inputs.
+    """
+    start = time.perf_counter()
+    outputs = stage(inputs) if batched else [stage(item) for item in inputs]
+    seconds = time.perf_counter() - start
+    results[name] = StageResult(
+        documents=len(inputs),
+        seconds=seconds,
+        docs_per_second=len(inputs) / seconds if seconds > 0 else float("inf"),
+        peak_rss_mb=peak_rss_megabytes(),
+    )
+    return outputs
+
+
+class BenchmarkPipeline(DataWriter, Parse):
+    def __init__(self) -> None:
+        super().__init__(RateLimitTracker())
+
+
+def load_corpus(corpus_dir: Path, repeat: int) -> List[bytes]:
+    paths = sorted(corpus_dir.glob("*.htm")) + sorted(corpus_dir.glob("*.html"))
+    if len(paths) == 0:
+        raise SystemExit(f"No .htm or .html documents found in {corpus_dir}")
+    return [path.read_bytes() for path in paths] * repeat
+
+
+def run_benchmark(corpus_dir: Path, repeat: int, perform_ner: bool) -> Dict[str, Any]:
+    documents = load_corpus(corpus_dir, repeat)
+    pipeline = BenchmarkPipeline()
+    stage_results: Dict[str, StageResult] = {}
+
+    document_maps = run_stage(
+        stage_results,
+        "parse",
+        documents,
+        lambda document: pipeline.parse_document(DocumentSource(data=document)),
+    )
+    if perform_ner:
+        ner_results = run_stage(
+            stage_results,
+            "ner",
+            document_maps,
+            pipeline._apply_named_entity_recognition_batch,
+            batched=True,
+        )
+    else:
+        ner_results = [{} for _ in document_maps]
+
+    with tempfile.TemporaryDirectory() as output_folder:
+        with pipeline._open_main_spreadsheet(output_folder) as summary:
+            run_stage(
+                stage_results,
+                "write_rows",
+                list(zip(document_maps, ner_results)),
+                lambda results: summary.append_row(
+                    pipeline._build_summary_row(FILING_INFO, results[0], results[1])
+                ),
+            )
+            run_stage(stage_results, "save_spreadsheet", [summary], SummaryWriter.save)
+
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": str(corpus_dir),
+        "documents": len(documents),
+        "corpus_bytes": sum(len(document) for document in documents),
+        "stages": {name: asdict(result) for name, result in stage_results.items()},
+    }
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    print(
+        f"{results['documents']} documents, {results['corpus_bytes'] / 1024**2:.1f} MB"
+    )
+    header = f"{'stage':<18}{'seconds':>10}{'docs/s':>10}{'peak RSS MB':>13}"
+    if baseline is not None:
+        header += f"{'baseline docs/s':>17}{'change':>9}"
+    print(header)
+    for name, stage in results["stages"].items():
+        rss = stage["peak_rss_mb"]
+        line = f"{name:<18}{stage['seconds']:>10.3f}{stage['docs_per_second']:>10.2f}{(f'{rss:.1f}' if rss is not None else 'n/a'):>13}"
+        if baseline is not None and name in baseline["stages"]:
+            baseline_rate = baseline["stages"][name]["docs_per_second"]
+            change = stage["docs_per_second"] / baseline_rate - 1
+            line += f"{baseline_rate:>17.2f}{change:>+9.1%}"
+        print(line)
+
+
+def find_regressions(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """Names of the stages whose throughput dropped by more than tolerance (a fraction) since the baseline"""
+    return [
+        name
+        for name, stage in results["stages"].items()
+        if name in baseline["stages"]
+        and stage["docs_per_second"]
+        < baseline["stages"][name]["docs_per_second"] * (1 - tolerance)
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    arg_parser.add_argument(
+        "--repeat", type=int, default=1, help="replay the corpus this many times"
+    )
+    arg_parser.add_argument("--no-ner", action="store_true", help="skip the NER stage")
+    arg_parser.add_argument("--save", type=Path, help="write the results to this file")
+    arg_parser.add_argument(
+        "--compare", type=Path, help="compare against results saved earlier"
+    )
+    arg_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="slowdown (as a fraction) beyond which a stage counts as a regression",
+    )
+    args = arg_parser.parse_args()
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    results = run_benchmark(args.corpus, args.repeat, not args.no_ner)
+    print_results(results, baseline)
+
+    if args.save is not None:
+        with open(args.save, mode="w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Micro-benchmark of turning RPC results into dicts for zerorpc.
+
+Compares the compiled serializers of remotely_callable_returns_dataclass (serializer_for())
+with converting each value by inspecting it (dictify_data(), which calls mashumaro's to_dict()
+on every dataclass), for the results of search(), search_form_info() with and without
+columnar=True, and list_jobs(). Also reports the size of each result once encoded with msgpack,
+as zerorpc sends it.
+
+Usage (from the backend folder):
+    poetry run python benchmark/serialization_benchmark.py [--filings N] [--repeat N]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+import msgpack  # type: ignore
+
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+from api import connection  # noqa: E402
+from misc.job_manager import Job, JobInfo  # noqa: E402
+from misc.serializable_dataclass import dictify_data  # noqa: E402
+from misc.serializable_dataclass import serializer_for  # noqa: E402
+
+ROUNDS = 5
+
+
+def columnar_form_data(filing_count: int) -> connection.ColumnarFormData:
+    address = connection.AddressData(
+        "ONE AMERICAN RD", "", "DEARBORN", "MI", "48126", "MICHIGAN"
+    )
+    accession_numbers = [
+        f"0000037996-{n % 30:02d}-{n:06d}" for n in range(filing_count)
+    ]
+    return connection.ColumnarFormData(
+        "CIK0000037996",
+        "FORD MOTOR CO",
+        "DE",
+        "380549190",
+        ["10-K", "10-Q"],
+        connection.BulkAddressData(address, address),
+        "https://sec.gov/Archives/edgar/data/37996",
+        connection.FilingColumns(
+            [f"{2021 - n // 4}-12-31" for n in range(filing_count)],
+            [f"{2022 - n // 4}-02-04" for n in range(filing_count)],
+            ["10-K" if n % 4 == 0 else "10-Q" for n in range(filing_count)],
+            accession_numbers,
+            [f"f-{n}.htm" for n in range(filing_count)],
+            [n % 2 for n in range(filing_count)],
+            [0] * filing_count,
+        ),
+    )
+
+
+def time_per_call(convert: Callable[[Any], Any], value: Any, repeat: int) -> float:
+    """Best time of ROUNDS rounds of calls, with garbage collection paused, like timeit"""
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            for _ in range(max(1, repeat // ROUNDS)):
+                convert(value)
+            best = min(best, (time.perf_counter() - started) / max(1, repeat // ROUNDS))
+    finally:
+        gc.enable()
+    return best
+
+
+def run_benchmark(filing_count: int, repeat: int) -> List[List[Any]]:
+    columnar = columnar_form_data(filing_count)
+    # (name, return type, result)
+    cases: List[Tuple[str, Any, Any]] = [
+        (
+            "search",
+            List[connection.SearchData],
+            [
+                connection.SearchData(f"CIK{n:010d}", f"ENTITY {n} INC")
+                for n in range(10)
+            ],
+        ),
+        (
+            f"search_form_info ({filing_count} filings)",
+            Union[connection.FormData, connection.ColumnarFormData, None],
+            columnar.with_filing_rows(),
+        ),
+        (
+            f"search_form_info columnar ({filing_count} filings)",
+            Union[connection.FormData, connection.ColumnarFormData, None],
+            columnar,
+        ),
+        (
+            "list_jobs (50 jobs)",
+            List[JobInfo],
+            [Job(lambda job: None, "job", 0, None).info() for _ in range(50)],
+        ),
+    ]
+    rows = []
+    for name, return_type, value in cases:
+        compiled = serializer_for(return_type)
+        if compiled(value) != dictify_data(value):
+            raise AssertionError(f"The compiled serializer differs for {name}")
+        inspected_seconds = time_per_call(dictify_data, value, repeat)
+        compiled_seconds = time_per_call(compiled, value, repeat)
+        rows.append(
+            [
+                name,
+                inspected_seconds * 1e6,
+                compiled_seconds * 1e6,
+                inspected_seconds / compiled_seconds,
+                len(msgpack.packb(compiled(value))),
+            ]
+        )
+    return rows
+
+
+def print_results(rows: List[List[Any]]):
+    header = f"{'result':<48}{'to_dict µs':>14}{'compiled µs':>14}{'speedup':>10}{'msgpack bytes':>16}"
+    print(header)
+    print("-" * len(header))
+    for name, inspected, compiled, speedup, size in rows:
+        print(
+            f"{name:<48}{inspected:>14.1f}{compiled:>14.1f}{speedup:>9.2f}x{size:>16,}"
+        )
+
+
+def main(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument(
+        "--filings",
+        type=int,
+        default=5000,
+        help="filings of the search_form_info results",
+    )
+    arg_parser.add_argument(
+        "--repeat", type=int, default=200, help="calls timed per result"
+    )
+    args = arg_parser.parse_args(argv)
+    print_results(run_benchmark(args.filings, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional
+from urllib.parse import urlsplit
+
+from mashumaro import DataClassDictMixin
+
+DEFAULT_MAX_BYTES = 1024**3  # 1 GiB
+# submissions JSON changes whenever a company files something, so it's only trusted for a while
+SUBMISSIONS_TTL_SECONDS = 60 * 60
+
+
+class CacheEntryMissing(Exception):
+    """The body of a cache entry was evicted (or deleted) before it could be read; fetch it again"""
+
+    def __init__(self, entry: "CacheEntry") -> None:
+        super().__init__(f"The cached body of {entry.url} is gone")
+        self.entry = entry
+
+
+def default_cache_directory() -> Path:
+    """Get a per-user folder to keep the cache in, following each platform's conventions"""
+    if sys.platform.startswith("win"):
+        base_path = Path(os.environ.get("LOCALAPPDATA", Path.home()))
+    elif sys.platform == "darwin":
+        base_path = Path.home() / "Library" / "Caches"
+    else:
+        base_path = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return base_path / "sec-10-k-scraper"
+
+
+@dataclass
+class CacheEntry(DataClassDictMixin):
+    key: str
+    url: str
+    file: str  # name of the file holding the body, relative to the cache directory
+    size: int
+    charset: str
+    content_encoding: str  # Content-Encoding of the response, e.g. "gzip"
+    compressed_by_cache: bool  # True if the response was uncompressed and we deflated it ourselves
+    stored_at: float  # when the entry was last fetched or revalidated, in seconds since the epoch
+    last_access: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class FilingCache:
+    """
+    On-disk cache of responses from SEC EDGAR, bounded to a maximum number of bytes.
+
+    Each response body is stored compressed in its own file, named after the hash of its key;
+    an index file (index.json) records the metadata of every entry. Once the total size of the
+    bodies goes over max_bytes, the least recently used entries are evicted.
+
+    Results derived from filings, like the section maps of Parse.parse_document(), are
+    stored the same way under keys starting with SECTION_MAP_PREFIX.
+
+    Documents under sec.gov/Archives/ never change once filed, so they are cached forever.
+    Anything else (e.g. data.sec.gov/submissions/CIK##########.json) is considered stale after
+    ttl_seconds, and should be revalidated with the headers from conditional_headers().
+
+    Changes to the index are saved at most every SAVE_INTERVAL_SECONDS, and by flush(); entries
+    whose bodies don't match the index when it's loaded (e.g. after a crash) are dropped.
+    """
+
+    INDEX_FILE = "index.json"
+    INDEX_VERSION = 1
+    # the index is rewritten whole, so saving it on every change would be quadratic over a job
+    SAVE_INTERVAL_SECONDS = 30
+
+    # Keys of results derived from filings (e.g. the sections found by the parser), rather than responses
+    SECTION_MAP_PREFIX = "parsed/"
+    IMMUTABLE_PREFIXES = ("sec.gov/Archives/edgar/data/", SECTION_MAP_PREFIX)
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float = SUBMISSIONS_TTL_SECONDS,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_saved = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: Dict[str, CacheEntry] = self._load_index()
+        self._total_bytes = sum(entry.size for entry in self._entries.values())
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        """
+        Normalizes a URL into a cache key. EDGAR serves the same document under
+        sec.gov and www.sec.gov, and over http and https, so those are ignored.
+        """
+        parts = urlsplit(url)
+        host = parts.netloc.lower().removeprefix("www.")
+        key = f"{host}{parts.path}"
+        if parts.query:
+            key = f"{key}?{parts.query}"
+        return key
+
+    @staticmethod
+    def is_immutable(key: str) -> bool:
+        """Filed documents are never modified, so they (and anything derived from them) never need to be revalidated"""
+        return key.startswith(FilingCache.IMMUTABLE_PREFIXES)
+
+    def _path_for(self, entry: CacheEntry) -> Path:
+        return Path(self.directory, entry.file)
+
+    def _load_index(self) -> Dict[str, CacheEntry]:
+        index_path = Path(self.directory, FilingCache.INDEX_FILE)
+        try:
+            with open(index_path, mode="r", encoding="utf-8") as file:
+                index = json.load(file)
+            if index.get("version") != FilingCache.INDEX_VERSION:
+                return {}
+            entries = [CacheEntry.from_dict(value) for value in index["entries"]]
+        except Exception:  # missing or corrupt index; start over. Orphaned bodies are overwritten as needed.
+            return {}
+        return {entry.key: entry for entry in entries if self._is_intact(entry)}
+
+    def _is_intact(self, entry: CacheEntry) -> bool:
+        try:
+            return self._path_for(entry).stat().st_size == entry.size
+        except OSError:
+            return False
+
+    def _save_index(self):
+        index_path = Path(self.directory, FilingCache.INDEX_FILE)
+        temp_path = index_path.with_suffix(".tmp")
+        index = {
+            "version": FilingCache.INDEX_VERSION,
+            "entries": [entry.to_dict() for entry in self._entries.values()],
+        }
+        with open(temp_path, mode="w", encoding="utf-8") as file:
+            json.dump(index, file)
+        # atomic, so a crash never leaves a half-written index
+        os.replace(temp_path, index_path)
+        self._dirty = False
+        self._last_saved = time.monotonic()
+
+    def _index_changed(self):
+        self._dirty = True
+        if time.monotonic() - self._last_saved >= FilingCache.SAVE_INTERVAL_SECONDS:
+            self._save_index()
+
+    def flush(self):
+        """Persists the changes to the index not saved yet, e.g. at the end of a job"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self._path_for(entry).is_file():  # deleted behind our back
+                self._remove(entry)
+                self._index_changed()
+                return None
+            entry.last_access = time.time()
+            self._dirty = True
+            return entry
+
+    def _open(self, entry: CacheEntry) -> BinaryIO:
+        try:
+            return open(self._path_for(entry), mode="rb")
+        except FileNotFoundError:
+            # evicted by another thread since get() returned it
+            with self._lock:
+                if self._entries.get(entry.key) is entry:
+                    self._remove(entry)
+                    self._index_changed()
+            raise CacheEntryMissing(entry)
+
+    def read(self, entry: CacheEntry) -> bytes:
+        """
+        Returns the body of the response, exactly as it was received from the server.
+        Raises CacheEntryMissing if it has been evicted since the entry was looked up.
+        """
+        with self._open(entry) as file:
+            body = file.read()
+        if entry.compressed_by_cache:
+            body = zlib.decompress(body)
+        return body
+
+    def iter_chunks(
+        self, entry: CacheEntry, chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """Like read(), but yields the body a chunk at a time"""
+        decompressor = zlib.decompressobj() if entry.compressed_by_cache else None
+        with self._open(entry) as file:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    break
+                yield decompressor.decompress(chunk) if decompressor else chunk
+        if decompressor is not None:
+            yield decompressor.flush()
+
+    def is_stale(self, entry: CacheEntry) -> bool:
+        if FilingCache.is_immutable(entry.key):
+            return False
+        return time.time() - entry.stored_at > self.ttl_seconds
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Request headers that let the server answer 304 Not Modified if our copy is still current"""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def refresh(self, entry: CacheEntry):
+        """Marks an entry as current, e.g. after the server answered 304 Not Modified"""
+        with self._lock:
+            entry.stored_at = time.time()
+            self._index_changed()
+
+    def put(
+        self,
+        key: str,
+        url: str,
+        body: bytes,
+        charset: str = "utf-8",
+        content_encoding: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> CacheEntry:
+        return self.put_stream(
+            key, url, [body], charset, content_encoding, etag, last_modified
+        )
+
+    def put_stream(
+        self,
+        key: str,
+        url: str,
+        chunks: Iterable[bytes],
+        charset: str = "utf-8",
+        content_encoding: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> CacheEntry:
+        """
+        Like put(), but takes the body a chunk at a time (e.g. as it's downloaded), writing
+        each one to disk as it comes. Nothing is stored if iterating over chunks raises.
+        """
+        content_encoding = (content_encoding or "identity").lower()
+        compressed_by_cache = content_encoding == "identity"
+        compressor = zlib.compressobj() if compressed_by_cache else None
+
+        # written under a name of its own, so concurrent writes of the same key don't collide
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        temp_path = Path(temp_name)
+        try:
+            with open(fd, mode="wb") as file:
+                for chunk in chunks:
+                    file.write(compressor.compress(chunk) if compressor else chunk)
+                if compressor is not None:
+                    file.write(compressor.flush())
+                size = file.tell()
+        except BaseException:
+            temp_path.unlink()
+            raise
+
+        now = time.time()
+        entry = CacheEntry(
+            key=key,
+            url=url,
+            file=hashlib.sha256(key.encode("utf-8")).hexdigest(),
+            size=size,
+            charset=charset,
+            content_encoding=content_encoding,
+            compressed_by_cache=compressed_by_cache,
+            stored_at=now,
+            last_access=now,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._total_bytes -= previous.size
+            os.replace(temp_path, self._path_for(entry))
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            self._evict(keep=key)
+            self._index_changed()
+        return entry
+
+    def _remove(self, entry: CacheEntry):
+        del self._entries[entry.key]
+        self._total_bytes -= entry.size
+        try:
+            self._path_for(entry).unlink()
+        except OSError:  # already gone, or still open for reading on Windows
+            pass
+
+    def _evict(self, keep: str):
+        """Evicts the least recently used entries but keep (the one just stored) until under max_bytes"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        for entry in sorted(self._entries.values(), key=lambda e: e.last_access):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if entry.key != keep:
+                self._remove(entry)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+class FilingCached:
+    """
+    Parent class for classes whose requests to SEC EDGAR may be answered from a FilingCache.
+    Caching is disabled unless a FilingCache is assigned to _filing_cache.
+    """
+
+    _filing_cache: Optional[FilingCache] = None
@@ -0,0 +1,378 @@
+import gzip
+import io
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.message import Message
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.error import HTTPError, URLError
+
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+from urllib3.exceptions import HTTPError as Urllib3Error  # type: ignore
+
+try:
+    import h2  # type: ignore # noqa: F401
+    import httpx  # type: ignore
+except ImportError:  # httpx (with h2) is optional, and only needed for HTTP/2: the http2 extra
+    httpx = None  # type: ignore
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # brotli is optional (the brotli extra); without it, br isn't accepted
+    brotli = None  # type: ignore
+
+# The SEC asks automated clients to identify themselves with a contact address:
+# https://www.sec.gov/os/accessing-edgar-data
+USER_AGENT = "Lafayette College yevenyos@lafayette.edu"
+# Every encoding ContentDecoder can undo
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+DEFAULT_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "*/*",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+# Size of the chunks responses are streamed in
+CHUNK_SIZE = 64 * 1024
+
+NETWORK_ERRORS: tuple = (requests.RequestException, Urllib3Error)
+if httpx is not None:
+    NETWORK_ERRORS += (httpx.TransportError,)
+
+
+class _GzipStage:
+    def __init__(self) -> None:
+        # None until the format of the data is known, in subclasses like _DeflateStage
+        self._decompressor: Optional["zlib._Decompress"] = zlib.decompressobj(
+            16 + zlib.MAX_WBITS
+        )
+        self._empty = True
+
+    def decompress(self, chunk: bytes) -> bytes:
+        self._empty = self._empty and not chunk
+        decompressor = self._decompressor
+        if decompressor is None:
+            return b""
+        output = decompressor.decompress(chunk)
+        # a gzip body may be several members in a row, e.g. the result of appending to a file
+        while decompressor.eof and decompressor.unused_data:
+            rest = decompressor.unused_data
+            decompressor = self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            output += decompressor.decompress(rest)
+        return output
+
+    def flush(self) -> bytes:
+        # e.g. the body of a 204, which isn't really compressed
+        if self._empty or self._decompressor is None:
+            return b""
+        output = self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise zlib.error("Compressed data ended before the end-of-stream marker")
+        return output
+
+
+class _DeflateStage(_GzipStage):
+    def __init__(self) -> None:
+        self._decompressor = None
+        self._header = b""
+        self._empty = True
+
+    def decompress(self, chunk: bytes) -> bytes:
+        self._empty = self._empty and not chunk
+        if self._decompressor is None:
+            # "deflate" should be zlib-wrapped, but some servers send raw deflate data instead;
+            # the two byte zlib header tells them apart
+            self._header += chunk
+            if len(self._header) < 2:
+                return b""
+            chunk = self._header
+            is_zlib = chunk[0] & 0x0F == 8 and (chunk[0] << 8 | chunk[1]) % 31 == 0
+            self._decompressor = zlib.decompressobj(
+                zlib.MAX_WBITS if is_zlib else -zlib.MAX_WBITS
+            )
+        return self._decompressor.decompress(chunk)
+
+    def flush(self) -> bytes:
+        if self._decompressor is None:
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(self._header) + super().flush()
+        return super().flush()
+
+
+class _BrotliStage:
+    def __init__(self) -> None:
+        self._decompressor = brotli.Decompressor()
+
+    def decompress(self, chunk: bytes) -> bytes:
+        return self._decompressor.process(chunk)
+
+    def flush(self) -> bytes:
+        if not self._decompressor.is_finished():
+            raise ValueError("Compressed data ended before the end-of-stream marker")
+        return b""
+
+
+class ContentDecoder:
+    """
+    Undoes the Content-Encoding of a response (gzip, deflate, br or identity, or several
+    of them in a row, e.g. "gzip, br") one chunk at a time, so that a response never
+    has to be held in memory as a whole.
+    """
+
+    def __init__(self, content_encoding: Optional[str]) -> None:
+        encodings = [
+            encoding.strip().lower() for encoding in (content_encoding or "").split(",")
+        ]
+        self._stages: List[Any] = []
+        # applied in order by the server, so they're undone in reverse
+        for encoding in reversed(encodings):
+            if encoding in ("", "identity"):
+                continue
+            elif encoding in ("gzip", "x-gzip"):
+                self._stages.append(_GzipStage())
+            elif encoding == "deflate":
+                self._stages.append(_DeflateStage())
+            elif encoding == "br" and brotli is not None:
+                self._stages.append(_BrotliStage())
+            else:
+                raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+    def decompress(self, chunk: bytes) -> bytes:
+        for stage in self._stages:
+            chunk = stage.decompress(chunk)
+        return chunk
+
+    def flush(self) -> bytes:
+        """
+        Returns whatever is left once the whole body has been passed to decompress().
+        Raises an exception if the body was cut short.
+        """
+        output = b""
+        for stage in self._stages:
+            output = (stage.decompress(output) if output else b"") + stage.flush()
+        return output
+
+
+def decode_content(data: bytes, content_encoding: Optional[str]) -> bytes:
+    """Undoes the Content-Encoding of a whole response body"""
+    if (content_encoding or "").strip().lower() in ("gzip", "x-gzip"):
+        return gzip.decompress(data)
+    decoder = ContentDecoder(content_encoding)
+    return decoder.decompress(data) + decoder.flush()
+
+
+@dataclass
+class HTTPResponse:
+    url: str
+    status: int
+    headers: Message
+    # the body as sent by the server, still compressed if it has a Content-Encoding
+    data: bytes
+
+    def charset(self, default: str = "utf-8") -> str:
+        return self.headers.get_content_charset(default)
+
+    def decoded_data(self) -> bytes:
+        """The body, with its Content-Encoding undone"""
+        return decode_content(self.data, self.headers.get("Content-Encoding"))
+
+
+@dataclass
+class HTTPStream:
+    """A response whose body hasn't been read yet; see HTTPSession.stream()"""
+
+    url: str
+    status: int
+    headers: Message
+    _chunks: Callable[[int], Iterator[bytes]]
+
+    def charset(self, default: str = "utf-8") -> str:
+        return self.headers.get_content_charset(default)
+
+    def iter_raw(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """The body, chunk by chunk, as sent by the server (still compressed)"""
+        return self._chunks(chunk_size)
+
+    def decoder(self) -> ContentDecoder:
+        return ContentDecoder(self.headers.get("Content-Encoding"))
+
+
+class HTTPSession:
+    """
+    Keeps connections to each host open between requests, so that only the first request to
+    a host pays for the TCP and TLS handshakes. Sessions are safe to share between threads,
+    which is how they're used from greenlets (see misc.threadpool.run_blocking).
+
+    Requests use HTTP/2 if httpx and h2 are installed, and HTTP/1.1 keep-alive otherwise.
+    Either way, request() behaves like urllib's urlopen(): responses other than 2xx raise
+    urllib.error.HTTPError, and failures to reach the server raise urllib.error.URLError.
+    """
+
+    # Enough for a full batch of lookups (APIConnection.BATCH_CONCURRENCY) and then some
+    MAX_CONNECTIONS_PER_HOST = 10
+    # www.sec.gov, data.sec.gov and efts.sec.gov
+    EDGAR_HOSTS = 3
+    TIMEOUT_SECONDS = 30
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        http2: Optional[bool] = None,
+    ) -> None:
+        """
+        Parameters:
+            headers: sent with every request, on top of DEFAULT_HEADERS
+            http2: whether to use HTTP/2; by default, whenever httpx is installed
+        """
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        if http2 and httpx is None:
+            raise ImportError(
+                "HTTP/2 requires httpx and h2 to be installed (poetry install -E http2)"
+            )
+        self.http2 = http2 if http2 is not None else httpx is not None
+        self._client: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                if self.http2:
+                    # httpx limits the connections to all hosts together
+                    connections = (
+                        HTTPSession.MAX_CONNECTIONS_PER_HOST * HTTPSession.EDGAR_HOSTS
+                    )
+                    self._client = httpx.Client(
+                        http2=True,
+                        headers=self.headers,
+                        timeout=HTTPSession.TIMEOUT_SECONDS,
+                        follow_redirects=True,
+                        limits=httpx.Limits(
+                            max_connections=connections,
+                            max_keepalive_connections=connections,
+                        ),
+                    )
+                else:
+                    self._client = requests.Session()
+                    self._client.headers.update(self.headers)
+                    adapter = HTTPAdapter(
+                        pool_connections=HTTPSession.MAX_CONNECTIONS_PER_HOST,
+                        pool_maxsize=HTTPSession.MAX_CONNECTIONS_PER_HOST,
+                    )
+                    self._client.mount("https://", adapter)
+                    self._client.mount("http://", adapter)
+            return self._client
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+    ) -> HTTPResponse:
+        """
+        Makes a request, blocking until the whole response has been received.
+        The headers are sent on top of those of the session.
+        """
+        with self.stream(method, url, headers, body) as res:
+            data = b"".join(res.iter_raw())
+            return HTTPResponse(res.url, res.status, res.headers, data)
+
+    @contextmanager
+    def stream(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+    ) -> Iterator[HTTPStream]:
+        """
+        Makes a request, and yields the response as soon as its headers have been received.
+        Its body is read with HTTPStream.iter_raw() within the with block; the connection is
+        returned to the pool afterwards. Errors while reading it also raise URLError.
+        """
+        client = self._get_client()
+        try:
+            if self.http2:
+                with client.stream(method, url, headers=headers, content=body) as res:
+                    yield HTTPSession._check(
+                        HTTPStream(
+                            str(res.url),
+                            res.status_code,
+                            HTTPSession._message(res.headers),
+                            res.iter_raw,
+                        ),
+                        res.reason_phrase,
+                    )
+            else:
+                with client.request(
+                    method,
+                    url,
+                    headers=headers,
+                    data=body,
+                    timeout=HTTPSession.TIMEOUT_SECONDS,
+                    stream=True,
+                ) as res:
+                    yield HTTPSession._check(
+                        HTTPStream(
+                            res.url,
+                            res.status_code,
+                            HTTPSession._message(res.headers),
+                            # read as sent; requests would otherwise decompress it
+                            lambda size: res.raw.stream(size, decode_content=False),
+                        ),
+                        res.reason,
+                    )
+        except NETWORK_ERRORS as e:
+            raise URLError(e) from e
+
+    @staticmethod
+    def _message(headers: Any) -> Message:
+        message = Message()
+        for key, value in headers.items():
+            message[key] = value
+        return message
+
+    @staticmethod
+    def _check(res: HTTPStream, reason: str) -> HTTPStream:
+        if res.status < 200 or res.status >= 300:
+            data = b"".join(res.iter_raw())
+            raise HTTPError(res.url, res.status, reason, res.headers, io.BytesIO(data))
+        return res
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+_shared_session: Optional[HTTPSession] = None
+_shared_session_lock = threading.Lock()
+
+
+def shared_http_session() -> HTTPSession:
+    """The process-wide HTTPSession, shared by every request to SEC EDGAR"""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = HTTPSession()
+        return _shared_session
+
+
+class HTTPClient:
+    """
+    Parent class for classes making requests to SEC EDGAR.
+    They use shared_http_session(), unless another HTTPSession is assigned to _http_session.
+    """
+
+    _http_session: Optional[HTTPSession] = None
+
+    @property
+    def _http(self) -> HTTPSession:
+        return (
+            self._http_session
+            if self._http_session is not None
+            else shared_http_session()
+        )
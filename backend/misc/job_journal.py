@@ -0,0 +1,285 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class FilingStage(str, Enum):
+    PENDING = "pending"
+    # the document was saved to the output folder; final for filings other than 10-Ks
+    DOWNLOADED = "downloaded"
+    # the document was parsed (and NER applied); its rows are kept in the journal
+    ANALYZED = "analyzed"
+    # its rows were saved to output files (FilingRecord.written_to)
+    WRITTEN = "written"
+    FAILED = "failed"
+
+
+@dataclass
+class FilingRecord:
+    url: str
+    entity_name: str
+    stage: FilingStage
+    # path of the downloaded document, if any
+    local_copy: Optional[str]
+    # what was being done when the filing failed, and the error, if it failed
+    failed_while: Optional[str]
+    error: Optional[str]
+    updated_at: float
+    # names of the output files (e.g. summary.xlsx) the filing's rows were saved to
+    written_to: List[str]
+    # whether NER was applied to the filing when it was analyzed, or None if it wasn't analyzed
+    perform_ner: Optional[bool] = None
+
+
+class JobJournal:
+    """
+    Records the progress of each filing of the jobs run in an output folder, in an SQLite
+    database inside that folder, so that a job that's interrupted (e.g. by the backend being
+    closed) can be resumed by running it again, skipping the work that was already done.
+
+    Filings are identified by the URL of their document. Each one moves through the stages of
+    FilingStage, and the rows of analyzed filings are kept until they've been saved to the
+    output files, so they never need to be analyzed again. The output files each filing was
+    saved to are recorded, so that a later job writing to other files (e.g. Parquet as well
+    as summary.xlsx) only adds the filings missing from each. Filings that fail are recorded
+    as such, along with the error, and retried by the next run of the job.
+
+    Journals are safe to use from any thread. Each change is committed (and synced) before its
+    method returns, so greenlets should call them with misc.threadpool.run_blocking.
+    """
+
+    FILE_NAME = ".job_journal.sqlite3"
+    SCHEMA_VERSION = 1
+
+    def __init__(self, output_folder: Path) -> None:
+        self.path = Path(output_folder, JobJournal.FILE_NAME)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        # get() is also called by methods holding the lock
+        self._lock = threading.RLock()
+        # every change is committed on its own; WAL keeps those commits cheap
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != JobJournal.SCHEMA_VERSION:
+            with self._connection:
+                self._connection.execute("DROP TABLE IF EXISTS filings")
+                self._connection.execute(
+                    f"PRAGMA user_version = {JobJournal.SCHEMA_VERSION}"
+                )
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS filings (
+                    url TEXT PRIMARY KEY,
+                    entity_name TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    local_copy TEXT,
+                    perform_ner INTEGER,
+                    summary_row TEXT,
+                    columnar_row TEXT,
+                    failed_while TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    written_to TEXT NOT NULL DEFAULT ''
+                )
+                """
+            )
+
+    def __enter__(self) -> "JobJournal":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def filing_key(filing: Dict[str, Any]) -> str:
+        return filing["documentAddress10k"]
+
+    def add_filings(self, filings: Iterable[Dict[str, Any]]):
+        """Starts recording the given filings, unless they're already being recorded"""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO filings (url, entity_name, stage, updated_at) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        JobJournal.filing_key(filing),
+                        filing["entityName"],
+                        FilingStage.PENDING.value,
+                        now,
+                    )
+                    for filing in filings
+                ],
+            )
+
+    def get(self, filing: Dict[str, Any]) -> Optional[FilingRecord]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, entity_name, stage, local_copy, failed_while, error, updated_at, written_to, perform_ner FROM filings WHERE url = ?",
+                (JobJournal.filing_key(filing),),
+            ).fetchone()
+        if row is None:
+            return None
+        return FilingRecord(
+            row[0],
+            row[1],
+            FilingStage(row[2]),
+            row[3],
+            row[4],
+            row[5],
+            row[6],
+            JobJournal._split_outputs(row[7]),
+            bool(row[8]) if row[8] is not None else None,
+        )
+
+    @staticmethod
+    def _split_outputs(written_to: str) -> List[str]:
+        return written_to.split("/") if written_to else []
+
+    def _update(self, filing: Dict[str, Any], **values: Any):
+        values["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"UPDATE filings SET {assignments} WHERE url = ?",
+                [*values.values(), JobJournal.filing_key(filing)],
+            )
+
+    def record_download(self, filing: Dict[str, Any], local_copy: Path):
+        self._update(
+            filing,
+            stage=FilingStage.DOWNLOADED.value,
+            local_copy=str(local_copy),
+            failed_while=None,
+            error=None,
+        )
+
+    def record_analysis(
+        self,
+        filing: Dict[str, Any],
+        perform_ner: bool,
+        summary_row: Dict[str, Any],
+        columnar_row: Dict[str, Any],
+    ):
+        self._update(
+            filing,
+            stage=FilingStage.ANALYZED.value,
+            perform_ner=perform_ner,
+            summary_row=json.dumps(summary_row, default=str),
+            columnar_row=json.dumps(columnar_row, default=str),
+            failed_while=None,
+            error=None,
+        )
+
+    def analyzed_rows(
+        self, filing: Dict[str, Any], perform_ner: bool
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        The summary and columnar rows recorded by record_analysis(), if the filing was analyzed
+        with the same perform_ner setting, and not yet saved to every output file.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT summary_row, columnar_row FROM filings WHERE url = ? AND stage = ? AND perform_ner = ?",
+                (
+                    JobJournal.filing_key(filing),
+                    FilingStage.ANALYZED.value,
+                    perform_ner,
+                ),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def record_written(
+        self,
+        filings: Iterable[Dict[str, Any]],
+        outputs: List[str],
+        keep_rows: bool = False,
+    ):
+        """
+        Marks filings as saved to the given output files, and drops their rows. With keep_rows,
+        e.g. while they're still to be saved to other output files, their stage and rows are
+        kept instead, so analyzed_rows() still returns the rows of those that were ANALYZED.
+        """
+        with self._lock:
+            updates = []
+            for filing in filings:
+                record = self.get(filing)
+                written_to = set(record.written_to if record else []) | set(outputs)
+                updates.append(
+                    (
+                        "/".join(sorted(written_to)),
+                        time.time(),
+                        JobJournal.filing_key(filing),
+                    )
+                )
+            if keep_rows:
+                statement = (
+                    "UPDATE filings SET written_to = ?, updated_at = ? WHERE url = ?"
+                )
+            else:
+                statement = f"UPDATE filings SET stage = '{FilingStage.WRITTEN.value}', written_to = ?, summary_row = NULL, columnar_row = NULL, updated_at = ? WHERE url = ?"
+            with self._connection:
+                self._connection.executemany(statement, updates)
+
+    def record_failure(self, filing: Dict[str, Any], failed_while: str, error: str):
+        self._update(
+            filing,
+            stage=FilingStage.FAILED.value,
+            failed_while=failed_while,
+            error=error,
+        )
+
+    def forget_analysis(self, filing: Dict[str, Any]):
+        """
+        Forgets that a filing was analyzed and saved to any output file, e.g. so that it's analyzed
+        again with other settings. Its local copy, if any, is kept.
+        """
+        with self._lock:
+            record = self.get(filing)
+            self._update(
+                filing,
+                stage=(
+                    FilingStage.DOWNLOADED.value
+                    if record is not None and record.local_copy is not None
+                    else FilingStage.PENDING.value
+                ),
+                perform_ner=None,
+                summary_row=None,
+                columnar_row=None,
+                written_to="",
+            )
+
+    def forget_written(self, output: str):
+        """
+        Forgets that filings were saved to an output file, e.g. because it was deleted, so that
+        the next job writing to it writes them again. Filings that weren't saved to any other
+        output file are pending again.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT url, stage, written_to FROM filings WHERE written_to != ''"
+            ).fetchall()
+            updates = []
+            for url, stage, written_to in rows:
+                outputs = JobJournal._split_outputs(written_to)
+                if output in outputs:
+                    outputs.remove(output)
+                    if stage == FilingStage.WRITTEN.value and not outputs:
+                        stage = FilingStage.PENDING.value
+                    updates.append((stage, "/".join(outputs), time.time(), url))
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE filings SET stage = ?, written_to = ?, updated_at = ? WHERE url = ?",
+                    updates,
+                )
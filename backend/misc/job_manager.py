@@ -0,0 +1,330 @@
+import heapq
+import itertools
+import time
+import uuid
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import gevent  # type: ignore
+from gevent.queue import Full, Queue  # type: ignore
+from mashumaro import DataClassDictMixin
+
+
+class JobState(str, Enum):
+    NO_WORK = "No Work"
+    QUEUED = "Queued"
+    WORKING = "Working"
+    COMPLETE = "Complete"
+    ERROR = "Error"
+    CANCELLED = "Cancelled"
+
+
+FINISHED_STATES = (JobState.COMPLETE, JobState.ERROR, JobState.CANCELLED)
+
+
+@dataclass
+class JobProgress(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    filings_total: int = 0
+    # filings finished by an earlier run of the same job (see misc.job_journal)
+    filings_resumed: int = 0
+    filings_downloaded: int = 0
+    filings_parsed: int = 0
+    # filings NER was applied to; stays 0 for jobs without NER
+    filings_recognized: int = 0
+    filings_written: int = 0
+    filings_failed: int = 0
+    # filings this run is done with, whether they succeeded or not
+    filings_finished: int = 0
+    bytes_downloaded: int = 0
+    elapsed_seconds: float = 0.0
+    # estimated from the rate filings have finished at so far; None until the first one has
+    eta_seconds: Optional[float] = None
+
+
+@dataclass
+class JobInfo(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    job_id: str
+    description: str
+    priority: int
+    state: JobState
+    error: Optional[str]
+    progress: JobProgress
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+
+class JobEventType(str, Enum):
+    # the job was queued, started or finished; see JobInfo.state
+    STATE = "state"
+    FILING_DOWNLOADED = "filing_downloaded"
+    # the filing was parsed, and NER was applied to it if the job performs NER
+    FILING_ANALYZED = "filing_analyzed"
+    FILING_FAILED = "filing_failed"
+    # the output files were saved, with the rows of every filing analyzed so far
+    FILINGS_WRITTEN = "filings_written"
+
+
+@dataclass
+class JobEvent(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    event: JobEventType
+    # the job as of the event, with its progress
+    job: JobInfo
+    # the documentAddress10k of the filing, for filing events
+    filing_url: Optional[str] = None
+    message: Optional[str] = None
+
+
+class EventBus:
+    """
+    Hands every published event to each subscriber's queue, without blocking the publisher.
+    A subscriber that falls behind by more than MAX_QUEUED_EVENTS loses its oldest events;
+    every JobEvent carries the whole progress of its job, so later ones make up for them.
+    """
+
+    MAX_QUEUED_EVENTS = 256
+
+    def __init__(self) -> None:
+        self._subscribers: Set[Queue] = set()
+
+    def subscribe(self) -> Queue:
+        queue = Queue(EventBus.MAX_QUEUED_EVENTS)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: Any):
+        for queue in list(self._subscribers):
+            while True:
+                try:
+                    queue.put_nowait(event)
+                    break
+                except Full:
+                    queue.get_nowait()
+
+
+class Job:
+    """
+    A unit of work run by a JobManager. The function running it updates its progress
+    and sets its final state (and error, if any) through set_state().
+    """
+
+    def __init__(
+        self,
+        run: Callable[["Job"], None],
+        description: str,
+        priority: int,
+        exclusive_key: Optional[str],
+        events: Optional[EventBus] = None,
+    ) -> None:
+        self.job_id = uuid.uuid4().hex
+        self.description = description
+        self.priority = priority
+        self.exclusive_key = exclusive_key
+        self.state = JobState.QUEUED
+        self.error: Optional[str] = None
+        self.progress = JobProgress()
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._run = run
+        self._greenlet: Optional[gevent.Greenlet] = None
+        self._events = events
+
+    def set_state(self, state: JobState, err: Optional[str] = None):
+        self.state = state
+        self.error = err
+        if state in FINISHED_STATES and self.finished_at is None:
+            self.finished_at = time.time()
+        self.publish(JobEventType.STATE, message=err)
+
+    def publish(
+        self,
+        event: JobEventType,
+        filing_url: Optional[str] = None,
+        message: Optional[str] = None,
+    ):
+        """Tells subscribers of the JobManager's events about the job; call after updating progress"""
+        if self._events is not None:
+            self._events.publish(JobEvent(event, self.info(), filing_url, message))
+
+    def info(self) -> JobInfo:
+        """A snapshot of the job, with the elapsed time and ETA worked out as of now"""
+        progress = replace(self.progress)
+        if self.started_at is not None:
+            end = self.finished_at if self.finished_at is not None else time.time()
+            progress.elapsed_seconds = end - self.started_at
+            remaining = (
+                progress.filings_total
+                - progress.filings_resumed
+                - progress.filings_finished
+            )
+            if self.state not in FINISHED_STATES and progress.filings_finished > 0:
+                progress.eta_seconds = max(
+                    0.0,
+                    progress.elapsed_seconds / progress.filings_finished * remaining,
+                )
+        return JobInfo(
+            job_id=self.job_id,
+            description=self.description,
+            priority=self.priority,
+            state=self.state,
+            error=self.error,
+            progress=progress,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+        )
+
+
+class JobManager:
+    """
+    Runs jobs in greenlets, up to max_concurrent_jobs at a time, queueing the rest.
+    Queued jobs start in order of priority (highest first), and in the order they were
+    submitted within a priority. Jobs sharing an exclusive_key (e.g. an output folder) never
+    run at the same time; a queued job waits for the one using its key, without holding up
+    the jobs behind it.
+
+    Changes to the jobs are published as JobEvents, which subscribe_events() yields as they happen.
+    """
+
+    # finished jobs kept around for get() and jobs(); older ones are forgotten
+    MAX_FINISHED_JOBS = 50
+
+    def __init__(self, max_concurrent_jobs: int = 1) -> None:
+        if max_concurrent_jobs < 1:
+            raise ValueError("max_concurrent_jobs must be at least 1")
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._jobs: Dict[str, Job] = {}
+        # (-priority, submission order, job); cancelled jobs are skipped when they come up
+        self._queue: List[Tuple[int, int, Job]] = []
+        self._order = itertools.count()
+        self._running: Dict[str, Job] = {}
+        self.events = EventBus()
+
+    def submit(
+        self,
+        run: Callable[[Job], None],
+        description: str = "",
+        priority: int = 0,
+        exclusive_key: Optional[str] = None,
+    ) -> Job:
+        """
+        Queues a job which calls run(job) in a greenlet once it starts. The job is COMPLETE
+        once run() returns, unless run() set another state; it's ERROR if run() raises.
+        """
+        job = Job(run, description, priority, exclusive_key, self.events)
+        self._jobs[job.job_id] = job
+        heapq.heappush(self._queue, (-priority, next(self._order), job))
+        job.publish(JobEventType.STATE)
+        self._start_queued_jobs()
+        return job
+
+    def subscribe_events(self, job_id: Optional[str] = None) -> Iterator[JobEvent]:
+        """
+        Yields a STATE event for each job (or only job_id), then every event published after
+        that (for job_id), as it's published. With a job_id, it stops once the job has finished,
+        and yields nothing if there's no such job; otherwise, it never stops.
+        """
+        queue = self.events.subscribe()
+        try:
+            if job_id is not None:
+                job = self._jobs.get(job_id)
+                jobs = [job] if job is not None else []
+            else:
+                jobs = self.jobs()
+            for job in jobs:
+                yield JobEvent(JobEventType.STATE, job.info())
+            if job_id is not None and (not jobs or jobs[0].state in FINISHED_STATES):
+                return
+            for event in queue:
+                if job_id is not None and event.job.job_id != job_id:
+                    continue
+                yield event
+                if (
+                    job_id is not None
+                    and event.event == JobEventType.STATE
+                    and event.job.state in FINISHED_STATES
+                ):
+                    return
+        finally:
+            self.events.unsubscribe(queue)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Every job known to the manager, oldest first"""
+        return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def set_max_concurrent_jobs(self, max_concurrent_jobs: int):
+        if max_concurrent_jobs < 1:
+            raise ValueError("max_concurrent_jobs must be at least 1")
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._start_queued_jobs()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued or running job. A running job is killed, which raises GreenletExit
+        wherever it's waiting, so its finally blocks still run. Returns False if there's
+        no such job, or it had already finished.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.state in FINISHED_STATES:
+            return False
+        if job._greenlet is None:
+            # it's skipped when it comes up in the queue
+            self._job_finished(job)
+        else:
+            job._greenlet.kill()
+        return True
+
+    def _start_queued_jobs(self):
+        held_back: List[Tuple[int, int, Job]] = []
+        busy_keys = {job.exclusive_key for job in self._running.values()}
+        while self._queue and len(self._running) < self.max_concurrent_jobs:
+            entry = heapq.heappop(self._queue)
+            job = entry[2]
+            if job.state != JobState.QUEUED:
+                continue
+            if job.exclusive_key is not None and job.exclusive_key in busy_keys:
+                held_back.append(entry)
+                continue
+            busy_keys.add(job.exclusive_key)
+            self._running[job.job_id] = job
+            job.started_at = time.time()
+            job.set_state(JobState.WORKING)
+            job._greenlet = gevent.spawn(self._run_job, job)
+            job._greenlet.link(lambda _, job=job: self._job_finished(job))
+        for entry in held_back:
+            heapq.heappush(self._queue, entry)
+
+    def _run_job(self, job: Job):
+        try:
+            job._run(job)
+            if job.state == JobState.WORKING:
+                job.set_state(JobState.COMPLETE)
+        except Exception as err:
+            job.set_state(JobState.ERROR, f"{type(err).__name__}: {err}")
+
+    def _job_finished(self, job: Job):
+        # a job killed by cancel() is left WORKING, or never started at all
+        if job.state not in FINISHED_STATES:
+            job.set_state(JobState.CANCELLED)
+        self._running.pop(job.job_id, None)
+        self._forget_finished_jobs()
+        self._start_queued_jobs()
+
+    def _forget_finished_jobs(self):
+        finished = [job for job in self.jobs() if job.state in FINISHED_STATES]
+        for job in finished[: max(0, len(finished) - JobManager.MAX_FINISHED_JOBS)]:
+            del self._jobs[job.job_id]
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Tuple, TypeVar
+
+from mashumaro import DataClassDictMixin
+
+T = TypeVar("T")
+
+DEFAULT_MAX_ENTRIES = 512
+# long enough for a user going back and forth between a few companies, short enough
+# that filings made since are soon picked up
+DEFAULT_TTL_SECONDS = 10 * 60
+
+
+@dataclass
+class MemoCacheStats(
+    DataClassDictMixin
+):  # extends DataClassDictMixIn to be serializable over zeroRPC
+    hits: int
+    misses: int
+    # entries dropped to stay under max_entries
+    evictions: int
+    # entries found, but too old to be used
+    expirations: int
+    entries: int
+    max_entries: int
+    ttl_seconds: float
+
+
+class MemoCache:
+    """
+    A bounded in-memory cache of results, e.g. of searches, by the normalized arguments they
+    were computed from. Entries expire ttl_seconds after they were stored; once there are more than
+    max_entries, the least recently used ones are evicted.
+
+    Keys are tuples whose first element names the kind of result (e.g. "search"), so that every
+    result of a kind can be invalidated at once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (when it was stored, value), least recently used first
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = (
+            OrderedDict()
+        )
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Tuple[bool, Any]:
+        """Returns (True, value) if a current value is cached under key, and (False, None) if not"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return True, entry[1]
+
+    def put(self, key: Tuple[Hashable, ...], value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_compute(self, key: Tuple[Hashable, ...], compute: Callable[[], T]) -> T:
+        """
+        The value cached under key, or else the value compute() returns, which is cached.
+        Exceptions raised by compute() aren't cached, so the next call tries again.
+        """
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def invalidate(
+        self, predicate: Optional[Callable[[Tuple[Hashable, ...]], bool]] = None
+    ) -> int:
+        """Drops every entry, or those whose key predicate() is true for; returns how many were dropped"""
+        with self._lock:
+            if predicate is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> MemoCacheStats:
+        with self._lock:
+            return MemoCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl_seconds,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Memoized:
+    """
+    Parent class for classes whose results may be answered from a MemoCache.
+    Memoization is disabled unless a MemoCache is assigned to _memo_cache.
+    """
+
+    _memo_cache: Optional[MemoCache] = None
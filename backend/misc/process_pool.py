@@ -0,0 +1,133 @@
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+from collections.abc import Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gevent  # type: ignore
+from gevent.event import Event  # type: ignore
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from misc.threadpool import run_blocking  # noqa: E402
+
+
+class ProcessPool:
+    """
+    A pool of worker processes for CPU-bound work, usable from gevent greenlets.
+
+    Waiting on the workers happens in gevent's native threadpool, so the event loop
+    (and with it, zerorpc heartbeats and other requests) keeps running meanwhile. A single
+    greenlet waits there for every pending call, however many greenlets are waiting on them,
+    so the pool never takes more than one of the few threads the threadpool has.
+    Worker processes are only started once work is first submitted, since each one
+    may take a while to start up (e.g. loading a spaCy model in the initializer).
+    """
+
+    def __init__(
+        self,
+        worker_count: int,
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple = (),
+    ) -> None:
+        """
+        Parameters:
+            worker_count: number of worker processes
+            initializer: called once in each worker process when it starts
+            initargs: arguments passed to initializer
+        """
+        self.worker_count = worker_count
+        self._initializer = initializer
+        self._initargs = initargs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # submitted calls still running -> set once they're done
+        self._pending: Dict[Future, Event] = {}
+        # completed to wake the waiter up when calls are submitted while it waits
+        self._wake_up: Future = Future()
+        self._waiter: Optional[gevent.Greenlet] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.worker_count,
+                # "spawn" is the default on Windows and macOS; use it everywhere so workers
+                # behave the same on every platform, and never inherit the gevent hub of a fork
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._initializer,
+                initargs=self._initargs,
+            )
+        return self._executor
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        future = self._get_executor().submit(func, *args)
+        self._pending[future] = Event()
+        if self._waiter is None or self._waiter.dead:
+            self._waiter = gevent.spawn(self._wait_for_pending)
+        elif not self._wake_up.done():
+            self._wake_up.set_result(None)
+        return future
+
+    def _wait_for_pending(self):
+        """Runs in the waiter greenlet; sets the Event of each call as it finishes"""
+        while self._pending:
+            self._wake_up = Future()
+            done, _ = run_blocking(
+                concurrent.futures.wait,
+                [*self._pending, self._wake_up],
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                event = self._pending.pop(future, None)
+                if event is not None:
+                    event.set()
+
+    def wait_any(self, futures: Sequence[Future]) -> Tuple[List[Future], List[Future]]:
+        """
+        Blocks the calling greenlet (but not the event loop) until at least one of the
+        futures (returned by submit()) is done. Returns the futures that are done, and
+        those that are still pending.
+        """
+        events = [self._pending[f] for f in futures if f in self._pending]
+        if futures and len(events) == len(futures):  # none of them is done yet
+            gevent.wait(events, count=1)
+        done = [future for future in futures if future not in self._pending]
+        pending = [future for future in futures if future in self._pending]
+        return done, pending
+
+    def apply(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Calls func(*args) in a worker process, blocking the calling greenlet (but not the
+        event loop) until it returns. Raises the exception of the call, if any.
+        """
+        future = self.submit(func, *args)
+        while not future.done():
+            self.wait_any([future])
+        return future.result()
+
+    def imap_unordered(
+        self, func: Callable[..., Any], argument_list: Sequence[Tuple]
+    ) -> Iterator[Tuple[int, Future]]:
+        """
+        Calls func(*arguments) in the worker processes for each element of argument_list.
+        Yields (index in argument_list, Future) pairs as soon as each call finishes;
+        future.result() returns the value of the call, or raises its exception.
+        """
+        futures = {
+            self.submit(func, *arguments): index
+            for index, arguments in enumerate(argument_list)
+        }
+        pending = list(futures.keys())
+        while len(pending) > 0:
+            done, pending = self.wait_any(pending)
+            for future in done:
+                yield futures[future], future
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,50 +1,303 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
 from math import ceil
+from typing import Any, Callable, Iterator, Mapping, Optional, TypeVar
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
 
-from gevent import spawn  # type: ignore
-from gevent.lock import BoundedSemaphore  # type: ignore
-from gevent.time import sleep  # type: ignore
+import gevent  # type: ignore
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from misc.threadpool import run_blocking  # noqa: E402
+
+T = TypeVar("T")
+
+# SEC EDGAR's fair access policy allows 10 requests per second from each user, across all of its hosts.
+# We stay well below that by default, since the frontend may be making requests of its own.
+DEFAULT_MAX_REQUESTS_PER_SECOND = 5
+# Budgets of the individual hosts, within the overall limit. Full-text search (efts) is the slowest
+# to answer and the quickest to throttle, and mustn't starve downloads of the submissions API's share.
+DEFAULT_HOST_REQUESTS_PER_SECOND = {
+    "efts.sec.gov": 2,
+    "data.sec.gov": 5,
+    "sec.gov": 5,
+}
+
+
+@dataclass
+class RateLimitStats:
+    acquisitions: int
+    # tokens acquired, which differs from acquisitions with weighted acquire() calls
+    tokens_acquired: float
+    # acquisitions which had to wait for the rate limit or a backoff
+    delayed_acquisitions: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+    tokens_available: float
+    throttled_responses: int
+    backoff_remaining_seconds: float
 
 
 class RateLimitTracker:
-    def __init__(self, max_requests_per_second=10) -> None:
+    # Backoff after a 429 / 503 response without a usable Retry-After header;
+    # doubled for every consecutive one, up to the maximum
+    INITIAL_BACKOFF_SECONDS = 1.0
+    MAX_BACKOFF_SECONDS = 60.0
+
+    def __init__(
+        self,
+        max_requests_per_second=10,
+        host_requests_per_second: Optional[Mapping[str, float]] = None,
+        burst: Optional[float] = None,
+        sleep: Callable[[float], Any] = gevent.sleep,
+    ) -> None:
+        """
+        A token bucket limiting requests to max_requests_per_second on average. The bucket holds
+        up to burst tokens (by default, half a second's worth), so that many requests can be made at
+        once after a quiet period. Nothing runs in the background: the tokens available are worked
+        out from the time since the last acquisition, and each caller sleeps for as long as it has to.
+
+        Requests to the hosts in host_requests_per_second (e.g. {"data.sec.gov": 5}) are also
+        limited to the given rate, on top of the overall limit. "www." is ignored in host names.
+
+        acquire() sleeps with gevent.sleep() by default; pass time.sleep to use the tracker from
+        threads outside of gevent. From asyncio, use acquire_async() instead.
         """
-        Abuses semaphores to act as a rate limiter on greenlets making api requests.
-        We don't care about a 'critical section' being accessed exclusively
-        by one greenlet; we just want an atomically incremented/decremented counter
-        that we can block requests on.
+        self.rate = float(max_requests_per_second)
+        self.burst = float(
+            burst if burst is not None else ceil(max_requests_per_second / 2)
+        )
+        self._sleep = sleep
+        self._host_trackers = {
+            host: RateLimitTracker(rate, sleep=sleep)
+            for host, rate in (host_requests_per_second or {}).items()
+        }
+        # Guards the bucket, so the tracker can be shared by greenlets of different threads
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        # time.monotonic() before which no request may be made, after a server asked us to slow down
+        self._backoff_until = 0.0
+        self._consecutive_throttles = 0
+        self._acquisitions = 0
+        self._tokens_acquired = 0.0
+        self._delayed_acquisitions = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._throttled_responses = 0
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlsplit(url).netloc.lower().removeprefix("www.")
+
+    def acquire(self, url: Optional[str] = None, weight: float = 1) -> float:
         """
-        self._release_interval_seconds = 1 / max_requests_per_second
-        self._semaphore = BoundedSemaphore(ceil(max_requests_per_second / 2))
-        spawn(self.periodic_release)
+        Blocks until a request may be made without exceeding the rate limit, or the limit of
+        the url's host. Also waits out any backoff requested by report_throttled().
+        Requests that count for more than one (e.g. a batch) can acquire more tokens with weight.
+        Returns the time spent waiting, in seconds.
+        """
+        waited = 0.0
+        for delay in self._delays(url, weight):
+            self._sleep(delay)
+            waited += delay
+        self._record_wait(waited)
+        return waited
 
-    def acquire(self):
-        return self._semaphore.acquire()
+    async def acquire_async(
+        self, url: Optional[str] = None, weight: float = 1
+    ) -> float:
+        """Like acquire(), but awaits asyncio.sleep() instead of blocking"""
+        waited = 0.0
+        for delay in self._delays(url, weight):
+            await asyncio.sleep(delay)
+            waited += delay
+        self._record_wait(waited)
+        return waited
 
-    def periodic_release(self):
+    def _delays(self, url: Optional[str], weight: float) -> Iterator[float]:
         """
-        Automatically release the internal semaphore at most every (1 / max_requests)
-        seconds, to a maximum value of max_requests.
+        Takes weight tokens from the buckets of the url's host and of the tracker, yielding
+        the times to sleep for in between. Tokens are taken in the order callers arrive, even
+        when the bucket is empty: the bucket goes into debt, and the next caller waits it out too.
         """
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        yield from self._backoff_delays()
+        if url is not None:
+            host_tracker = self._host_trackers.get(RateLimitTracker.host_of(url))
+            if host_tracker is not None:
+                delay = host_tracker._reserve(weight)
+                if delay > 0:
+                    yield delay
+        delay = self._reserve(weight)
+        if delay > 0:
+            yield delay
+        # in case a server asked us to slow down in the meantime
+        yield from self._backoff_delays()
+
+    def _backoff_delays(self) -> Iterator[float]:
         while True:
+            delay = self._backoff_until - time.monotonic()
+            if delay <= 0:
+                return
+            yield delay
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, weight: float) -> float:
+        """Takes weight tokens from the bucket, and returns how long to wait until they're there"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= weight
+            self._acquisitions += 1
+            self._tokens_acquired += weight
+            return max(0.0, -self._tokens / self.rate)
+
+    def _record_wait(self, waited: float):
+        if waited > 0:
+            with self._lock:
+                self._delayed_acquisitions += 1
+                self._total_wait_seconds += waited
+                self._max_wait_seconds = max(self._max_wait_seconds, waited)
+
+    @property
+    def tokens_available(self) -> float:
+        """Tokens in the bucket right now; negative while callers are waiting for tokens"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def stats(self, url: Optional[str] = None) -> RateLimitStats:
+        """Statistics of the tracker, or of the budget of the url's host if it has one"""
+        if url is not None:
+            host_tracker = self._host_trackers.get(RateLimitTracker.host_of(url))
+            if host_tracker is not None:
+                return host_tracker.stats()
+        tokens_available = self.tokens_available
+        with self._lock:
+            return RateLimitStats(
+                acquisitions=self._acquisitions,
+                tokens_acquired=self._tokens_acquired,
+                delayed_acquisitions=self._delayed_acquisitions,
+                total_wait_seconds=self._total_wait_seconds,
+                max_wait_seconds=self._max_wait_seconds,
+                tokens_available=tokens_available,
+                throttled_responses=self._throttled_responses,
+                backoff_remaining_seconds=max(
+                    0.0, self._backoff_until - time.monotonic()
+                ),
+            )
+
+    def report_throttled(self, retry_after: Optional[str] = None) -> float:
+        """
+        Records that a server answered 429 Too Many Requests or 503 Service Unavailable, and
+        pauses every request made through this tracker for the time it asked for in its
+        Retry-After header (in seconds, or as an HTTP date). Without one, the pause doubles
+        for every consecutive throttled response. Returns the length of the pause.
+        """
+        with self._lock:
+            self._throttled_responses += 1
+            self._consecutive_throttles += 1
+            delay = RateLimitTracker._parse_retry_after(retry_after)
+            if delay is None:
+                delay = min(
+                    RateLimitTracker.INITIAL_BACKOFF_SECONDS
+                    * 2 ** (self._consecutive_throttles - 1),
+                    RateLimitTracker.MAX_BACKOFF_SECONDS,
+                )
+            self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+            return delay
+
+    def report_success(self):
+        """Records that a request went through, resetting the backoff of report_throttled()"""
+        self._consecutive_throttles = 0
+
+    @staticmethod
+    def _parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+        if not retry_after:
+            return None
+        try:
+            seconds = float(retry_after)
+        except ValueError:
             try:
-                sleep(self._release_interval_seconds)
-                self._semaphore.release()
-            except ValueError:  # Thrown when release() is called on a full semaphore
-                # It's fine if we release() while the semaphore is "full".
-                # Just means we're not making requests at the moment.
-                pass
+                seconds = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0.0), RateLimitTracker.MAX_BACKOFF_SECONDS)
+
+
+_shared_tracker: Optional[RateLimitTracker] = None
+_shared_tracker_lock = threading.Lock()
+
+
+def shared_rate_limit_tracker() -> RateLimitTracker:
+    """
+    The process-wide RateLimitTracker for requests to SEC EDGAR, with the default limits.
+    Every request should go through it (or one tracker passed around explicitly), since
+    the SEC's limit applies to all of them together.
+    """
+    global _shared_tracker
+    with _shared_tracker_lock:
+        if _shared_tracker is None:
+            _shared_tracker = RateLimitTracker(
+                DEFAULT_MAX_REQUESTS_PER_SECOND, DEFAULT_HOST_REQUESTS_PER_SECOND
+            )
+        return _shared_tracker
 
 
 class RateLimited:
     """
     Parent class for any classes performing rate-limited operations. Accepts a RateLimitTracker
     in the constructor, which will be referenced by any rate-limited methods of the child classes.
+    Without one, the process-wide shared_rate_limit_tracker() is used.
     """
 
-    def __init__(self, limit_counter: RateLimitTracker) -> None:
-        self._rate_flag = limit_counter
+    # Times a request answered with 429 / 503 is retried, after backing off, before giving up
+    MAX_THROTTLED_RETRIES = 3
+
+    def __init__(self, limit_counter: Optional[RateLimitTracker] = None) -> None:
+        self._rate_flag = (
+            limit_counter if limit_counter is not None else shared_rate_limit_tracker()
+        )
 
     pass
 
-    def _block_on_rate_limit(self):
-        return self._rate_flag.acquire()
+    def _block_on_rate_limit(self, url: Optional[str] = None):
+        return self._rate_flag.acquire(url)
+
+    def _rate_limited_request(self, url: str, fetch: Callable[[], T]) -> T:
+        """
+        Calls fetch(), which should make a single blocking request to url (e.g. with HTTPSession.request()),
+        once the rate limit allows it. It runs in gevent's threadpool, so other greenlets keep
+        running meanwhile. If the server answers 429 or 503, the request is retried after the
+        backoff it asked for (see RateLimitTracker.report_throttled()), up to MAX_THROTTLED_RETRIES
+        times. Returns the result of fetch(), or raises its exception.
+        """
+        attempt = 0
+        while True:
+            self._block_on_rate_limit(url)
+            try:
+                result = run_blocking(fetch)
+            except HTTPError as e:
+                if e.code not in (429, 503):
+                    raise
+                retry_after = e.headers.get("Retry-After") if e.headers else None
+                self._rate_flag.report_throttled(retry_after)
+                if attempt >= RateLimited.MAX_THROTTLED_RETRIES:
+                    raise
+                attempt += 1
+                continue
+            self._rate_flag.report_success()
+            return result
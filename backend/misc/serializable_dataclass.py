@@ -1,9 +1,21 @@
-from typing import Callable, Dict, List, TypeVar, Union
+import dataclasses
+import typing
+from enum import Enum
+from typing import Any, Callable, Dict, List, TypeVar, Union
 
 from mashumaro import DataClassDictMixin
 
 DictableDataClass = TypeVar("DictableDataClass", bound=DataClassDictMixin)
 
+Serializer = Callable[[Any], Any]
+
+_NoneType = type(None)
+# types msgpack encodes as they are
+_PLAIN_TYPES = (str, int, float, bool, _NoneType, Any)
+
+# return type -> its compiled serializer
+_serializers: Dict[Any, Serializer] = {}
+
 
 def remotely_callable_returns_dataclass(
     func: Callable[..., Union[DictableDataClass, List[DictableDataClass], None]]
@@ -13,25 +25,183 @@ def remotely_callable_returns_dataclass(
     which return (lists of) dataclasses that inherit from mashumaro's
     DictableDataClass. Makes the function compatible with zerorpc by turning
     its return value into a properly serializable dict.
+
+    The conversion is compiled from the return annotation of the function on its
+    first call (see serializer_for()), rather than worked out again for each value.
     """
+    serializer = None
 
     def dataclass_func(*args, **kwargs):
-        def dictify_data(val: Union[DictableDataClass, List[DictableDataClass], Dict]):
-            if isinstance(val, list):
-                return [dictify_data(element) for element in val]
-            if isinstance(val, DataClassDictMixin):
-                return val.to_dict()
-            if isinstance(val, dict):  # check for an empty dict
-                if not val:
-                    return val
-            if val is None:
-                return None
-            # runtime error, just in case
-            raise Exception(
-                "Attempted to dictify an object that was neither a DictableDataClass, a List[DictableDataClass], nor empty"
-            )
-
+        nonlocal serializer
         dataclass_result = func(*args, **kwargs)
-        return dictify_data(dataclass_result)
+        if serializer is None:
+            try:
+                return_type = typing.get_type_hints(func).get("return", Any)
+            except NameError:  # an annotation that can't be resolved
+                return_type = Any
+            serializer = serializer_for(return_type)
+        return serializer(dataclass_result)
 
     return dataclass_func
+
+
+def dictify_data(val: Union[DictableDataClass, List[DictableDataClass], Dict]):
+    """Turns a (list of) DictableDataClass into dicts, working out how from the value itself"""
+    if isinstance(val, list):
+        return [dictify_data(element) for element in val]
+    if isinstance(val, DataClassDictMixin):
+        return val.to_dict()
+    if isinstance(val, dict):  # check for an empty dict
+        if not val:
+            return val
+    if val is None:
+        return None
+    # runtime error, just in case
+    raise Exception(
+        "Attempted to dictify an object that was neither a DictableDataClass, a List[DictableDataClass], nor empty"
+    )
+
+
+def serializer_for(return_type: Any) -> Serializer:
+    """
+    A function turning values of return_type into the same dicts (and lists) as dictify_data(),
+    in a single pass with no checks of the type of each value. For dataclasses, it's generated
+    code reading each field and converting only the fields that need it, e.g. nested dataclasses
+    and enums; anything it doesn't know how to convert is left to mashumaro's to_dict().
+
+    Lists and dicts holding nothing to convert (e.g. the columns of FilingColumns) are passed on
+    as they are, rather than copied, since zerorpc only reads them to encode them.
+
+    Values that turn out not to be of return_type at all are handed to dictify_data().
+    """
+    if return_type not in _serializers:
+        _serializers[return_type] = _top_level_serializer(return_type)
+    return _serializers[return_type]
+
+
+def _top_level_serializer(return_type: Any) -> Serializer:
+    origin = typing.get_origin(return_type)
+    if origin is list:
+        (element_type,) = typing.get_args(return_type) or (Any,)
+        if _is_dataclass(element_type):
+            convert = _compile_serializer(List[element_type])  # type: ignore
+
+            def serialize_list(val):
+                if isinstance(val, list) and all(
+                    type(element) is element_type for element in val
+                ):
+                    return convert(val)
+                return dictify_data(val)
+
+            return serialize_list
+    elif origin is Union:
+        converters = {
+            option: _compile_serializer(option)
+            for option in typing.get_args(return_type)
+            if _is_dataclass(option)
+        }
+
+        def serialize_union(val):
+            convert = converters.get(type(val))
+            return convert(val) if convert is not None else dictify_data(val)
+
+        return serialize_union
+    elif _is_dataclass(return_type):
+        convert = _compile_serializer(return_type)
+
+        def serialize_dataclass(val):
+            return convert(val) if type(val) is return_type else dictify_data(val)
+
+        return serialize_dataclass
+    return dictify_data
+
+
+def _is_dataclass(value_type: Any) -> bool:
+    return isinstance(value_type, type) and dataclasses.is_dataclass(value_type)
+
+
+class _SerializerSource:
+    """
+    Source code of a serializer, built as a single expression with nested dataclasses and
+    lists written out in place, so that converting a value makes no function calls but for
+    the types it doesn't know (which are left to mashumaro).
+    """
+
+    # dataclasses nested deeper than this (e.g. ones holding themselves) are converted by to_dict()
+    MAX_DEPTH = 8
+
+    def __init__(self) -> None:
+        self.namespace: Dict[str, Any] = {}
+        self._names = 0
+
+    def _new_name(self, prefix: str) -> str:
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+    def _call(self, convert: Callable[[Any], Any], expression: str) -> str:
+        name = self._new_name("convert")
+        self.namespace[name] = convert
+        return f"{name}({expression})"
+
+    def expression(self, value_type: Any, expression: str, depth: int = 0) -> str:
+        """Source of an expression converting the value of expression, which is of value_type"""
+        if value_type in _PLAIN_TYPES:
+            return expression
+        if isinstance(value_type, type) and issubclass(value_type, Enum):
+            return f"{expression}.value"
+        if _is_dataclass(value_type):
+            return self._dataclass(value_type, expression, depth)
+
+        origin = typing.get_origin(value_type)
+        args = typing.get_args(value_type)
+        if origin is Union:
+            options = [option for option in args if option is not _NoneType]
+            if len(options) == 1:
+                converted = self.expression(options[0], expression, depth)
+                if converted == expression:
+                    return expression
+                return f"(None if {expression} is None else {converted})"
+        elif origin is list:
+            element = self._new_name("element")
+            converted = self.expression(args[0] if args else Any, element, depth)
+            if converted == element:
+                return expression
+            return f"[{converted} for {element} in {expression}]"
+        elif origin is dict and (not args or args[0] is str):
+            key, element = self._new_name("key"), self._new_name("element")
+            converted = self.expression(args[1] if args else Any, element, depth)
+            if converted == element:
+                return expression
+            return (
+                f"{{{key}: {converted} for {key}, {element} in {expression}.items()}}"
+            )
+        raise TypeError(f"No compiled serializer for {value_type}")
+
+    def _dataclass(self, cls: type, expression: str, depth: int) -> str:
+        if depth >= _SerializerSource.MAX_DEPTH:
+            return self._call(cls.to_dict, expression)  # type: ignore
+        try:
+            hints = typing.get_type_hints(cls)
+            items = [
+                f"{field.name!r}: "
+                + self.expression(
+                    hints[field.name], f"{expression}.{field.name}", depth + 1
+                )
+                for field in dataclasses.fields(cls)
+            ]
+        except (NameError, TypeError):  # annotations it can't resolve or convert
+            return self._call(cls.to_dict, expression)  # type: ignore
+        return f"{{{', '.join(items)}}}"
+
+
+def _compile_serializer(value_type: Any) -> Serializer:
+    """
+    Generates a function converting values of value_type, e.g. for List[SearchData]
+        def serialize(val):
+            return [{'cik': element1.cik, 'entity': element1.entity} for element1 in val]
+    """
+    source = _SerializerSource()
+    body = source.expression(value_type, "val")
+    code = f"def serialize(val):\n    return {body}\n"
+    exec(compile(code, f"<serializer of {value_type}>", "exec"), source.namespace)
+    return source.namespace["serialize"]
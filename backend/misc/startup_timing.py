@@ -0,0 +1,39 @@
+import time
+from typing import Dict
+
+
+class StartupTimer:
+    """
+    Records how long each step of starting the backend takes, for tracking its cold-start latency.
+    The clock starts when this module is first imported, so it should be imported before anything else.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        self._last_mark = self.started_at
+        # step name -> seconds, in the order the steps were recorded
+        self.steps: Dict[str, float] = {}
+
+    def mark(self, step: str) -> float:
+        """Records that a step just ended, and started when the previous one ended; returns its duration"""
+        now = time.perf_counter()
+        self.steps[step] = now - self._last_mark
+        self._last_mark = now
+        return self.steps[step]
+
+    def record(self, step: str, seconds: float):
+        """Records a step timed separately, e.g. one run in the background after startup"""
+        self.steps[step] = seconds
+
+    def elapsed(self) -> float:
+        """Seconds since the clock started"""
+        return time.perf_counter() - self.started_at
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{step} {seconds:.2f}s" for step, seconds in self.steps.items()
+        )
+
+
+# The timer of this process
+startup_timer = StartupTimer()
@@ -0,0 +1,158 @@
+import gzip
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from filing_cache import CacheEntryMissing  # type: ignore # noqa: E402
+from filing_cache import FilingCache  # type: ignore # noqa: E402
+
+
+class TestFilingCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temp_dir.name)
+        self.archive_url = "https://www.sec.gov/Archives/edgar/data/37996/000003799621000012/f-20201231.htm"
+        self.submissions_url = "https://data.sec.gov/submissions/CIK0000037996.json"
+        self.body = gzip.compress(b"<html>" + b"x" * 1000 + b"</html>")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_url_key(self):
+        self.assertEqual(
+            FilingCache.url_key(self.archive_url),
+            FilingCache.url_key(self.archive_url.replace("https://www.", "http://")),
+        )
+        self.assertTrue(FilingCache.is_immutable(FilingCache.url_key(self.archive_url)))
+        self.assertFalse(
+            FilingCache.is_immutable(FilingCache.url_key(self.submissions_url))
+        )
+
+    def test_round_trip_and_persistence(self):
+        cache = FilingCache(self.cache_dir)
+        key = FilingCache.url_key(self.archive_url)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, self.archive_url, self.body, content_encoding="gzip")
+        entry = cache.get(key)
+        self.assertEqual(self.body, cache.read(entry))
+
+        uncompressed_key = FilingCache.url_key(self.submissions_url)
+        cache.put(uncompressed_key, self.submissions_url, b'{"cik": "37996"}')
+        cache.flush()
+
+        reopened = FilingCache(self.cache_dir)
+        self.assertEqual(2, len(reopened))
+        self.assertEqual(self.body, reopened.read(reopened.get(key)))
+        self.assertEqual(
+            b'{"cik": "37996"}', reopened.read(reopened.get(uncompressed_key))
+        )
+
+    def test_least_recently_used_eviction(self):
+        cache = FilingCache(self.cache_dir, max_bytes=len(self.body) * 2)
+        keys = [f"sec.gov/Archives/edgar/data/1/{i}/doc.htm" for i in range(3)]
+        cache.put(keys[0], keys[0], self.body, content_encoding="gzip")
+        time.sleep(0.01)
+        cache.put(keys[1], keys[1], self.body, content_encoding="gzip")
+        time.sleep(0.01)
+        cache.get(keys[0])  # keys[1] is now the least recently used
+        time.sleep(0.01)
+        cache.put(keys[2], keys[2], self.body, content_encoding="gzip")
+
+        self.assertIn(keys[0], cache)
+        self.assertNotIn(keys[1], cache)
+        self.assertIn(keys[2], cache)
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+        self.assertEqual(2, len(list(self.cache_dir.glob("[0-9a-f]" * 64))))
+
+    def test_eviction_keeps_the_entry_just_stored(self):
+        cache = FilingCache(self.cache_dir, max_bytes=len(self.body) // 2)
+        key = FilingCache.url_key(self.archive_url)
+        entry = cache.put(key, self.archive_url, self.body, content_encoding="gzip")
+        self.assertEqual(self.body, cache.read(entry))
+
+        other_key = "sec.gov/Archives/edgar/data/1/2/doc.htm"
+        cache.put(other_key, other_key, self.body, content_encoding="gzip")
+        self.assertNotIn(key, cache)
+        self.assertIn(other_key, cache)
+
+    def test_read_after_eviction(self):
+        cache = FilingCache(self.cache_dir, max_bytes=len(self.body) * 2)
+        keys = [f"sec.gov/Archives/edgar/data/1/{i}/doc.htm" for i in range(3)]
+        entry = cache.put(keys[0], keys[0], self.body, content_encoding="gzip")
+        # e.g. another thread's put() evicting the entry between our get() and read()
+        Path(self.cache_dir, entry.file).unlink()
+        with self.assertRaises(CacheEntryMissing):
+            cache.read(entry)
+        with self.assertRaises(CacheEntryMissing):
+            list(cache.iter_chunks(entry))
+        self.assertNotIn(keys[0], cache)
+        self.assertEqual(0, cache.total_bytes)
+
+    def test_index_saved_periodically(self):
+        cache = FilingCache(self.cache_dir)
+        index_path = Path(self.cache_dir, FilingCache.INDEX_FILE)
+        keys = [f"sec.gov/Archives/edgar/data/1/{i}/doc.htm" for i in range(50)]
+        for key in keys:
+            cache.put(key, key, self.body, content_encoding="gzip")
+        # not rewritten on every put
+        self.assertFalse(index_path.exists())
+        cache.flush()
+        self.assertEqual(50, len(FilingCache(self.cache_dir)))
+
+        cache._last_saved -= FilingCache.SAVE_INTERVAL_SECONDS
+        cache.put(keys[0], keys[0], b"<html></html>", content_encoding="gzip")
+        self.assertEqual(
+            13, FilingCache(self.cache_dir).get(keys[0]).size  # type: ignore
+        )
+
+    def test_index_out_of_date(self):
+        cache = FilingCache(self.cache_dir)
+        key = FilingCache.url_key(self.archive_url)
+        cache.put(key, self.archive_url, self.body, content_encoding="gzip")
+        cache.flush()
+        # stored again, but the process dies before the index is saved
+        cache.put(key, self.archive_url, b"<html></html>", content_encoding="gzip")
+        self.assertEqual(0, len(FilingCache(self.cache_dir)))
+
+    def test_staleness_and_revalidation(self):
+        cache = FilingCache(self.cache_dir, ttl_seconds=60)
+        archive_entry = cache.put(
+            FilingCache.url_key(self.archive_url), self.archive_url, self.body
+        )
+        submissions_entry = cache.put(
+            FilingCache.url_key(self.submissions_url),
+            self.submissions_url,
+            self.body,
+            etag='"abc"',
+            last_modified="Wed, 21 Oct 2015 07:28:00 GMT",
+        )
+        archive_entry.stored_at -= 3600
+        submissions_entry.stored_at -= 3600
+        self.assertFalse(cache.is_stale(archive_entry))
+        self.assertTrue(cache.is_stale(submissions_entry))
+        self.assertDictEqual(
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+            },
+            cache.conditional_headers(submissions_entry),
+        )
+        cache.refresh(submissions_entry)
+        self.assertFalse(cache.is_stale(submissions_entry))
+
+    def test_corrupt_index(self):
+        Path(self.cache_dir, FilingCache.INDEX_FILE).write_text("{not json")
+        cache = FilingCache(self.cache_dir)
+        self.assertEqual(0, len(cache))
+
+
+if __name__ == "__main__":
+    unittest.main()
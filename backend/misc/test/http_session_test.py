@@ -0,0 +1,131 @@
+import gzip
+import os
+import sys
+import threading
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+import http_session  # type: ignore # noqa: E402
+
+BODY = gzip.compress(b'{"name": "FORD MOTOR CO"}')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = set()  # type: ignore
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.send_header("X-User-Agent", self.headers["User-Agent"])
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPSession(unittest.TestCase):
+    def setUp(self):
+        Handler.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def check_session(self, session: http_session.HTTPSession):
+        try:
+            for i in range(3):
+                res = session.request("GET", f"{self.url}/submissions.json")
+                self.assertEqual(200, res.status)
+                # the body is left compressed, as sent
+                self.assertEqual(BODY, res.data)
+                self.assertEqual("utf-8", res.charset())
+                self.assertEqual(http_session.USER_AGENT, res.headers["X-User-Agent"])
+            with session.stream("GET", f"{self.url}/submissions.json") as res:
+                decoder = res.decoder()
+                data = b"".join(decoder.decompress(c) for c in res.iter_raw(10))
+                self.assertEqual(gzip.decompress(BODY), data + decoder.flush())
+            # every request went over the same connection
+            self.assertEqual(1, len(Handler.connections))
+
+            with self.assertRaises(HTTPError) as cm:
+                session.request("GET", f"{self.url}/missing")
+            self.assertEqual(404, cm.exception.code)
+        finally:
+            session.close()
+
+    def test_connection_error(self):
+        # nothing is listening on the port of a closed server
+        self.tearDown()
+        for http2 in [False, True] if http_session.httpx is not None else [False]:
+            with self.assertRaises(URLError) as cm:
+                http_session.HTTPSession(http2=http2).request(
+                    "GET", f"{self.url}/submissions.json"
+                )
+            self.assertNotIsInstance(cm.exception, HTTPError)
+        self.setUp()
+
+    def test_http1(self):
+        self.check_session(http_session.HTTPSession(http2=False))
+
+    def test_http2_client(self):
+        if http_session.httpx is None:
+            self.skipTest("httpx isn't installed")
+        # plain HTTP is still HTTP/1.1 with httpx; this checks the responses are the same
+        self.check_session(http_session.HTTPSession(http2=True))
+
+
+class TestContentDecoder(unittest.TestCase):
+    def decode(self, body: bytes, content_encoding: str, chunk_size: int) -> bytes:
+        decoder = http_session.ContentDecoder(content_encoding)
+        chunks = [body[i:][:chunk_size] for i in range(0, len(body), chunk_size)]
+        return b"".join(decoder.decompress(c) for c in chunks) + decoder.flush()
+
+    def test_encodings(self):
+        data = b"<html>" + b"Item 1A. Risk Factors " * 10000 + b"</html>"
+        raw_deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        bodies = {
+            "identity": data,
+            "gzip": gzip.compress(data),
+            "deflate": zlib.compress(data),
+            # some servers send raw deflate data instead
+            "Deflate": raw_deflate.compress(data) + raw_deflate.flush(),
+        }
+        # appended gzip members are read as one
+        bodies["x-gzip"] = gzip.compress(data[:1000]) + gzip.compress(data[1000:])
+        if http_session.brotli is not None:
+            bodies["br"] = http_session.brotli.compress(data)
+            bodies["gzip, br"] = http_session.brotli.compress(gzip.compress(data))
+        for content_encoding, body in bodies.items():
+            for chunk_size in [1, 1000, len(body)]:
+                self.assertEqual(data, self.decode(body, content_encoding, chunk_size))
+
+    def test_truncated_body(self):
+        body = gzip.compress(b"Item 7. Management's Discussion and Analysis")
+        with self.assertRaises(zlib.error):
+            self.decode(body[:-4], "gzip", 10)
+        with self.assertRaises(ValueError):
+            http_session.ContentDecoder("compress")
+
+
+if __name__ == "__main__":
+    unittest.main()
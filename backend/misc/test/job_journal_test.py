@@ -0,0 +1,150 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from job_journal import FilingStage, JobJournal  # type: ignore # noqa: E402
+
+
+def filing(number: int):
+    return {
+        "entityName": f"Company {number}",
+        "filingType": "10-K",
+        "documentAddress10k": f"https://www.sec.gov/Archives/edgar/data/{number}/f.htm",
+    }
+
+
+class TestJobJournal(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_folder = Path(self.temp_dir.name)
+        self.journal = JobJournal(self.output_folder)
+        self.journal.add_filings([filing(1), filing(2)])
+
+    def tearDown(self):
+        self.journal.close()
+        self.temp_dir.cleanup()
+
+    def reopen(self):
+        self.journal.close()
+        self.journal = JobJournal(self.output_folder)
+
+    def test_stages_persist(self):
+        local_copy = Path(self.output_folder, "Company 1", "10-K_2021-02-04.htm")
+        self.journal.record_download(filing(1), local_copy)
+        self.journal.record_failure(filing(2), "parsing document", "Error while ...")
+        self.reopen()
+        # adding the filings of a job again keeps their progress
+        self.journal.add_filings([filing(1), filing(2), filing(3)])
+
+        record = self.journal.get(filing(1))
+        self.assertEqual(FilingStage.DOWNLOADED, record.stage)
+        self.assertEqual(str(local_copy), record.local_copy)
+        record = self.journal.get(filing(2))
+        self.assertEqual(FilingStage.FAILED, record.stage)
+        self.assertEqual("parsing document", record.failed_while)
+        self.assertEqual("Error while ...", record.error)
+        self.assertEqual(FilingStage.PENDING, self.journal.get(filing(3)).stage)
+        self.assertIsNone(self.journal.get(filing(4)))
+
+    def test_analyzed_rows(self):
+        summary_row = {"Company Name": "Company 1", "Risk Factors_ner": ["Ford"]}
+        columnar_row = {"entityName": "Company 1", "item1a": "Cars are risky."}
+        self.journal.record_analysis(filing(1), True, summary_row, columnar_row)
+        self.reopen()
+        self.assertEqual(
+            (summary_row, columnar_row), self.journal.analyzed_rows(filing(1), True)
+        )
+        # analyzed with different settings; it has to be analyzed again
+        self.assertIsNone(self.journal.analyzed_rows(filing(1), False))
+        self.assertIsNone(self.journal.analyzed_rows(filing(2), True))
+
+        self.journal.record_written([filing(1)], ["summary.xlsx"])
+        self.assertEqual(FilingStage.WRITTEN, self.journal.get(filing(1)).stage)
+        self.assertIsNone(self.journal.analyzed_rows(filing(1), True))
+        self.assertTrue(self.journal.get(filing(1)).perform_ner)
+        self.assertIsNone(self.journal.get(filing(2)).perform_ner)
+
+    def test_written_to_some_outputs(self):
+        rows = ({"Company Name": "Company 1"}, {"entityName": "Company 1"})
+        self.journal.record_analysis(filing(1), False, *rows)
+        # e.g. saving summary.parquet failed after summary.xlsx was saved
+        self.journal.record_written([filing(1)], ["summary.xlsx"], keep_rows=True)
+        self.reopen()
+        record = self.journal.get(filing(1))
+        self.assertEqual(FilingStage.ANALYZED, record.stage)
+        self.assertEqual(["summary.xlsx"], record.written_to)
+        self.assertEqual(rows, self.journal.analyzed_rows(filing(1), False))
+
+        self.journal.record_written([filing(1)], ["summary.parquet"])
+        record = self.journal.get(filing(1))
+        self.assertEqual(FilingStage.WRITTEN, record.stage)
+        self.assertEqual(["summary.parquet", "summary.xlsx"], record.written_to)
+        self.assertIsNone(self.journal.analyzed_rows(filing(1), False))
+
+    def test_forget_analysis(self):
+        local_copy = Path(self.output_folder, "Company 1", "10-K_2021-02-04.htm")
+        self.journal.add_filings([filing(1), filing(2)])
+        for number in (1, 2):
+            if number == 1:
+                self.journal.record_download(filing(number), local_copy)
+            self.journal.record_analysis(filing(number), False, {}, {})
+            self.journal.record_written([filing(number)], ["summary.xlsx"])
+            # e.g. the job is run again with NER
+            self.journal.forget_analysis(filing(number))
+        record = self.journal.get(filing(1))
+        self.assertEqual(FilingStage.DOWNLOADED, record.stage)
+        self.assertEqual(str(local_copy), record.local_copy)
+        self.assertEqual([], record.written_to)
+        self.assertIsNone(record.perform_ner)
+        self.assertEqual(FilingStage.PENDING, self.journal.get(filing(2)).stage)
+
+    def test_written_to(self):
+        self.journal.record_written([filing(1)], ["summary.xlsx"])
+        self.journal.record_written([filing(1), filing(2)], ["summary.parquet"])
+        self.reopen()
+        self.assertEqual(
+            ["summary.parquet", "summary.xlsx"], self.journal.get(filing(1)).written_to
+        )
+        self.assertEqual(["summary.parquet"], self.journal.get(filing(2)).written_to)
+
+        # e.g. summary.parquet was deleted
+        self.journal.forget_written("summary.parquet")
+        self.assertEqual(["summary.xlsx"], self.journal.get(filing(1)).written_to)
+        self.assertEqual(FilingStage.WRITTEN, self.journal.get(filing(1)).stage)
+        self.assertEqual([], self.journal.get(filing(2)).written_to)
+        self.assertEqual(FilingStage.PENDING, self.journal.get(filing(2)).stage)
+
+    def test_threads(self):
+        # e.g. the threadpool greenlets call the journal with run_blocking()
+        filings = [filing(number) for number in range(40)]
+        self.journal.add_filings(filings)
+
+        def analyze(filings):
+            for f in filings:
+                self.journal.record_analysis(f, False, {}, {})
+                self.journal.record_written([f], ["summary.xlsx"])
+
+        threads = [
+            threading.Thread(target=analyze, args=(filings[start::4],))
+            for start in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for f in filings:
+            record = self.journal.get(f)
+            self.assertEqual(FilingStage.WRITTEN, record.stage)
+            self.assertEqual(["summary.xlsx"], record.written_to)
+
+
+if __name__ == "__main__":
+    unittest.main()
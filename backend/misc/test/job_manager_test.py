@@ -0,0 +1,189 @@
+import os
+import sys
+import unittest
+
+import gevent  # type: ignore
+from gevent.event import Event  # type: ignore
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+import job_manager  # type: ignore # noqa: E402
+
+JobManager = job_manager.JobManager
+JobState = job_manager.JobState
+
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = JobManager(max_concurrent_jobs=1)
+        self.started = []
+        self.release = Event()
+
+    def blocking_job(self, name):
+        def run(job):
+            self.started.append(name)
+            self.release.wait()
+
+        return run
+
+    def wait_until_finished(self, *jobs):
+        with gevent.Timeout(5):
+            while any(job.state not in job_manager.FINISHED_STATES for job in jobs):
+                gevent.sleep(0.01)
+
+    def test_jobs_run_in_order_of_priority(self):
+        first = self.manager.submit(self.blocking_job("first"))
+        low = self.manager.submit(self.blocking_job("low"), priority=0)
+        high = self.manager.submit(self.blocking_job("high"), priority=5)
+        low_too = self.manager.submit(self.blocking_job("low too"), priority=0)
+        gevent.sleep(0)
+        self.assertEqual(JobState.WORKING, first.state)
+        self.assertEqual(JobState.QUEUED, low.state)
+
+        self.release.set()
+        self.wait_until_finished(first, low, high, low_too)
+        self.assertEqual(["first", "high", "low", "low too"], self.started)
+        self.assertEqual(JobState.COMPLETE, low_too.state)
+
+    def test_concurrency(self):
+        self.manager.set_max_concurrent_jobs(2)
+        jobs = [self.manager.submit(self.blocking_job(n)) for n in range(3)]
+        gevent.sleep(0)
+        self.assertEqual(
+            [JobState.WORKING, JobState.WORKING, JobState.QUEUED],
+            [job.state for job in jobs],
+        )
+        self.release.set()
+        self.wait_until_finished(*jobs)
+
+    def test_exclusive_key(self):
+        self.manager.set_max_concurrent_jobs(2)
+        first = self.manager.submit(self.blocking_job(1), exclusive_key="./output")
+        same_folder = self.manager.submit(
+            self.blocking_job(2), exclusive_key="./output"
+        )
+        other_folder = self.manager.submit(
+            self.blocking_job(3), exclusive_key="./other"
+        )
+        gevent.sleep(0)
+        self.assertEqual(JobState.QUEUED, same_folder.state)
+        self.assertEqual(JobState.WORKING, other_folder.state)
+        self.release.set()
+        self.wait_until_finished(first, same_folder, other_folder)
+        self.assertEqual([1, 3, 2], self.started)
+
+    def test_cancel(self):
+        running = self.manager.submit(self.blocking_job("running"))
+        queued = self.manager.submit(self.blocking_job("queued"))
+        gevent.sleep(0)
+
+        self.assertTrue(self.manager.cancel(queued.job_id))
+        self.assertEqual(JobState.CANCELLED, queued.state)
+        self.assertTrue(self.manager.cancel(running.job_id))
+        self.wait_until_finished(running)
+        self.assertEqual(JobState.CANCELLED, running.state)
+        self.assertFalse(self.manager.cancel(running.job_id))
+        self.assertFalse(self.manager.cancel("no such job"))
+        self.assertEqual(["running"], self.started)
+
+        # the manager moves on to the next job
+        after = self.manager.submit(lambda job: None)
+        self.wait_until_finished(after)
+        self.assertEqual(JobState.COMPLETE, after.state)
+
+    def test_cancelled_jobs_are_forgotten(self):
+        running = self.manager.submit(self.blocking_job("running"))
+        queued = [
+            self.manager.submit(self.blocking_job(n))
+            for n in range(JobManager.MAX_FINISHED_JOBS + 1)
+        ]
+        gevent.sleep(0)
+        for job in queued:
+            self.assertTrue(self.manager.cancel(job.job_id))
+        # only the newest finished jobs are kept, even if they never started
+        self.assertIsNone(self.manager.get(queued[0].job_id))
+        self.assertEqual([running] + queued[1:], self.manager.jobs())
+        self.release.set()
+        self.wait_until_finished(running)
+        self.assertEqual(queued[1:], self.manager.jobs())
+
+    def test_errors_and_progress(self):
+        def run(job):
+            job.progress.filings_total = 4
+            job.progress.filings_finished = 1
+            self.release.wait()
+            raise ValueError("bad filing")
+
+        job = self.manager.submit(run, description="4 filings")
+        gevent.sleep(0.05)
+        info = job.info()
+        self.assertEqual(JobState.WORKING, info.state)
+        self.assertIsNotNone(info.progress.eta_seconds)
+        self.assertAlmostEqual(
+            info.progress.elapsed_seconds * 3, info.progress.eta_seconds
+        )
+        # serializable over zerorpc
+        self.assertEqual("Working", info.to_dict()["state"])
+        self.assertEqual(4, info.to_dict()["progress"]["filings_total"])
+
+        self.release.set()
+        self.wait_until_finished(job)
+        self.assertEqual(JobState.ERROR, job.state)
+        self.assertEqual("ValueError: bad filing", job.error)
+        self.assertIsNone(job.info().progress.eta_seconds)
+
+    def test_subscribe_events(self):
+        def run(job):
+            self.release.wait()
+            job.progress.filings_downloaded += 1
+            job.publish(
+                job_manager.JobEventType.FILING_DOWNLOADED, "https://www.sec.gov/1.htm"
+            )
+
+        other = self.manager.submit(self.blocking_job("other"), priority=1)
+        job = self.manager.submit(run)
+        events = []
+
+        def listen():
+            for event in self.manager.subscribe_events(job.job_id):
+                events.append(event)
+
+        listener = gevent.spawn(listen)
+        gevent.sleep(0)
+        self.release.set()
+        listener.join(timeout=5)
+        self.assertTrue(listener.dead)
+        self.assertEqual(
+            [
+                (job_manager.JobEventType.STATE, JobState.QUEUED),
+                (job_manager.JobEventType.STATE, JobState.WORKING),
+                (job_manager.JobEventType.FILING_DOWNLOADED, JobState.WORKING),
+                (job_manager.JobEventType.STATE, JobState.COMPLETE),
+            ],
+            [(event.event, event.job.state) for event in events],
+        )
+        self.assertEqual("https://www.sec.gov/1.htm", events[2].filing_url)
+        self.assertEqual(1, events[2].job.progress.filings_downloaded)
+        self.assertEqual(JobState.COMPLETE, other.state)
+        self.assertEqual(0, len(self.manager.events._subscribers))
+
+        # the stream of a finished job ends straight away
+        self.assertEqual(
+            [JobState.COMPLETE],
+            [e.job.state for e in self.manager.subscribe_events(job.job_id)],
+        )
+
+    def test_slow_subscribers_lose_their_oldest_events(self):
+        bus = job_manager.EventBus()
+        queue = bus.subscribe()
+        for n in range(job_manager.EventBus.MAX_QUEUED_EVENTS + 10):
+            bus.publish(n)
+        self.assertEqual(job_manager.EventBus.MAX_QUEUED_EVENTS, queue.qsize())
+        self.assertEqual(10, queue.get_nowait())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from memo_cache import MemoCache  # type: ignore # noqa: E402
+
+
+class TestMemoCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = MemoCache(max_entries=2, ttl_seconds=60)
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_hits_and_misses(self):
+        self.assertEqual(1, self.cache.get_or_compute(("search", "ford"), self.compute))
+        self.assertEqual(1, self.cache.get_or_compute(("search", "ford"), self.compute))
+        self.assertEqual((False, None), self.cache.get(("search", "apple")))
+        stats = self.cache.stats()
+        self.assertEqual((1, 2, 1), (stats.hits, stats.misses, stats.entries))
+        self.assertEqual(2, stats.to_dict()["misses"])
+
+    def test_lru_eviction(self):
+        self.cache.put(("a",), 1)
+        self.cache.put(("b",), 2)
+        self.cache.get(("a",))
+        self.cache.put(("c",), 3)
+        self.assertFalse(self.cache.get(("b",))[0])
+        self.assertTrue(self.cache.get(("a",))[0])
+        self.assertEqual(1, self.cache.stats().evictions)
+
+    def test_expiry(self):
+        self.cache.put(("a",), 1)
+        self.cache.ttl_seconds = -1
+        self.assertEqual((False, None), self.cache.get(("a",)))
+        self.assertEqual(1, self.cache.stats().expirations)
+        self.assertEqual(0, len(self.cache))
+
+    def test_exceptions_are_not_cached(self):
+        def fail():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            self.cache.get_or_compute(("a",), fail)
+        self.assertEqual(1, self.cache.get_or_compute(("a",), self.compute))
+
+    def test_invalidate(self):
+        self.cache.put(("form_info", "CIK0000037996"), 1)
+        self.cache.put(("search", "ford"), 2)
+        self.assertEqual(1, self.cache.invalidate(lambda key: key[0] == "search"))
+        self.assertTrue(self.cache.get(("form_info", "CIK0000037996"))[0])
+        self.assertEqual(1, self.cache.invalidate())
+        self.assertEqual(0, len(self.cache))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import unittest
+
+import gevent  # type: ignore
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from process_pool import ProcessPool  # type: ignore # noqa: E402
+from threadpool import run_blocking  # type: ignore # noqa: E402
+
+
+class TestProcessPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = ProcessPool(2)
+
+    def tearDown(self):
+        # calls left running would keep the waiter greenlet's thread busy in the next test
+        while self.pool._pending:
+            self.pool.wait_any(list(self.pool._pending))
+        self.pool.shutdown()
+
+    def test_workers_start_lazily(self):
+        self.assertIsNone(self.pool._executor)
+        self.assertEqual((3, 1), self.pool.submit(divmod, 7, 2).result())
+        self.assertIsNotNone(self.pool._executor)
+
+    def test_imap_unordered(self):
+        argument_list = [(n, 3) for n in range(10)]
+        results = {}
+        for index, future in self.pool.imap_unordered(divmod, argument_list):
+            results[index] = future.result()
+        self.assertDictEqual({n: divmod(n, 3) for n in range(10)}, results)
+
+    def test_errors_are_raised_by_result(self):
+        outcomes = dict(self.pool.imap_unordered(int, [("1",), ("one",)]))
+        self.assertEqual(1, outcomes[0].result())
+        self.assertRaises(ValueError, outcomes[1].result)
+
+    def test_event_loop_keeps_running(self):
+        ticks = []
+
+        def tick():
+            while True:
+                ticks.append(1)
+                gevent.sleep(0.01)
+
+        ticker = gevent.spawn(tick)
+        # starting the workers alone takes long enough for the ticker to run
+        list(self.pool.imap_unordered(divmod, [(1, 1), (2, 1)]))
+        ticker.kill()
+        self.assertGreater(len(ticks), 1)
+
+    def test_waiting_takes_one_thread(self):
+        self.pool.apply(divmod, 7, 2)  # the workers take a while to start
+        threadpool = gevent.get_hub().threadpool
+        maxsize = threadpool.maxsize
+        threadpool.maxsize = 2
+        try:
+            callers = [gevent.spawn(self.pool.apply, time.sleep, 0.5) for _ in range(4)]
+            gevent.sleep(0.1)
+            # every caller waits on the one call of the waiter greenlet (threading.active_count()
+            # doesn't see the threads of the threadpool, but its length counts their calls)
+            self.assertEqual(1, len(threadpool))
+            # so other blocking calls still get a thread
+            run_blocking(time.sleep, 0)
+            gevent.joinall(callers, raise_error=True)
+            self.assertDictEqual({}, self.pool._pending)
+        finally:
+            threadpool.maxsize = maxsize
+
+    def test_wait_any(self):
+        slow = self.pool.submit(time.sleep, 0.5)
+        fast = self.pool.submit(divmod, 7, 2)
+        done, pending = self.pool.wait_any([slow, fast])
+        self.assertListEqual([fast], done)
+        self.assertListEqual([slow], pending)
+        self.assertEqual((3, 1), fast.result())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,13 @@
+import asyncio
+import gc
 import os
 import sys
+import threading
+import time
 import unittest
 from datetime import datetime, timedelta
+from email.message import Message
+from urllib.error import HTTPError
 
 import gevent  # type: ignore
 
@@ -10,6 +16,8 @@ folder_dir = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.dirname(folder_dir)
 sys.path.append(parent_dir)
 
+import rate_limiting  # type: ignore # noqa: E402 # isort: skip
+from rate_limiting import RateLimited  # type: ignore # noqa: E402
 from rate_limiting import RateLimitTracker  # type: ignore # noqa: E402
 
 
@@ -33,6 +41,145 @@ class TestAPIConnection(unittest.TestCase):
         time_difference = times[24] - times[0]  # a timedelta object
         self.assertTrue(timedelta(seconds=1.4) < time_difference)
 
+    def test_host_budget(self):
+        rate_limiter = RateLimitTracker(20, {"efts.sec.gov": 4})
+
+        def acquisition_time(url):
+            rate_limiter.acquire(url)
+            return time.monotonic()
+
+        tasks = [
+            gevent.spawn(acquisition_time, "https://efts.sec.gov/LATEST/search-index")
+            for i in range(6)
+        ]
+        gevent.joinall(tasks, timeout=5)
+        times = sorted(task.value for task in tasks)
+        # 2 requests at once, then 1 every 0.25 seconds
+        self.assertTrue(0.8 < times[5] - times[0])
+        # other hosts only share the overall limit
+        start = time.monotonic()
+        for i in range(6):
+            rate_limiter.acquire("https://www.sec.gov/Archives/edgar/data/")
+        self.assertTrue(time.monotonic() - start < 0.5)
+
+    def test_burst_and_weight(self):
+        rate_limiter = RateLimitTracker(10, burst=3)
+        start = time.monotonic()
+        for i in range(3):
+            self.assertEqual(rate_limiter.acquire(), 0.0)
+        # the bucket is empty, so 2 tokens take 0.2 seconds to come in
+        self.assertAlmostEqual(rate_limiter.acquire(weight=2), 0.2, delta=0.02)
+        self.assertTrue(0.18 < time.monotonic() - start < 0.4)
+        stats = rate_limiter.stats()
+        self.assertEqual(stats.acquisitions, 4)
+        self.assertEqual(stats.tokens_acquired, 5)
+        self.assertEqual(stats.delayed_acquisitions, 1)
+        self.assertTrue(stats.tokens_available < 1)
+        with self.assertRaises(ValueError):
+            rate_limiter.acquire(weight=0)
+
+    def test_no_background_greenlets(self):
+        def greenlet_count():
+            return sum(isinstance(obj, gevent.Greenlet) for obj in gc.get_objects())
+
+        before = greenlet_count()
+        rate_limiter = RateLimitTracker(1000, {"data.sec.gov": 500})
+        rate_limiter.acquire("https://data.sec.gov/submissions/")
+        self.assertEqual(greenlet_count(), before)
+
+    def test_threads_and_asyncio(self):
+        rate_limiter = RateLimitTracker(20, burst=1, sleep=time.sleep)
+        threads = [
+            threading.Thread(
+                target=rate_limiter.acquire, args=("https://www.sec.gov/",)
+            )
+            for i in range(5)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 1 at once, then 1 every 0.05 seconds
+        self.assertTrue(0.18 < time.monotonic() - start)
+
+        async def acquire_all():
+            return await asyncio.gather(
+                *[rate_limiter.acquire_async() for i in range(5)]
+            )
+
+        start = time.monotonic()
+        asyncio.run(acquire_all())
+        self.assertTrue(0.18 < time.monotonic() - start)
+        self.assertEqual(rate_limiter.stats().acquisitions, 10)
+
+    def test_retry_after(self):
+        self.assertEqual(RateLimitTracker._parse_retry_after("2"), 2.0)
+        self.assertEqual(RateLimitTracker._parse_retry_after("-1"), 0.0)
+        self.assertEqual(RateLimitTracker._parse_retry_after("soon"), None)
+        self.assertEqual(RateLimitTracker._parse_retry_after(None), None)
+        date = "Wed, 21 Oct 2015 07:28:00 GMT"  # in the past
+        self.assertEqual(RateLimitTracker._parse_retry_after(date), 0.0)
+
+        self.rate_limiter.report_throttled("0.5")
+        start = time.monotonic()
+        self.rate_limiter.acquire()
+        self.assertTrue(0.4 < time.monotonic() - start)
+
+    def test_exponential_backoff(self):
+        self.assertEqual(self.rate_limiter.report_throttled(), 1.0)
+        self.assertEqual(self.rate_limiter.report_throttled(), 2.0)
+        self.assertEqual(self.rate_limiter.report_throttled(), 4.0)
+        self.rate_limiter.report_success()
+        self.assertEqual(self.rate_limiter.report_throttled(), 1.0)
+
+    def test_rate_limited_request_retries(self):
+        limited = RateLimited(self.rate_limiter)
+        responses = [429, 503, None]
+
+        def fetch():
+            code = responses.pop(0)
+            if code is not None:
+                headers = Message()
+                headers["Retry-After"] = "0"
+                raise HTTPError(
+                    "https://www.sec.gov/", code, "Throttled", headers, None
+                )
+            return "data"
+
+        self.assertEqual(
+            limited._rate_limited_request("https://www.sec.gov/", fetch), "data"
+        )
+        self.assertEqual(responses, [])
+
+        def not_found():
+            raise HTTPError("https://www.sec.gov/", 404, "Not Found", Message(), None)
+
+        with self.assertRaises(HTTPError):
+            limited._rate_limited_request("https://www.sec.gov/", not_found)
+
+    def test_one_shared_tracker_across_threads(self):
+        original = rate_limiting._shared_tracker
+        rate_limiting._shared_tracker = None
+        try:
+            trackers = []
+            threads = [
+                threading.Thread(
+                    target=lambda: trackers.append(
+                        rate_limiting.shared_rate_limit_tracker()
+                    )
+                )
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(8, len(trackers))
+            self.assertTrue(all(tracker is trackers[0] for tracker in trackers))
+        finally:
+            rate_limiting._shared_tracker = original
+
 
 if __name__ == "__main__":
     unittest.main()
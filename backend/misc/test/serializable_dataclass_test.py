@@ -0,0 +1,110 @@
+import os
+import sys
+import unittest
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional, Tuple, Union
+
+from mashumaro import DataClassDictMixin
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+import serializable_dataclass  # type: ignore # noqa: E402
+
+
+class State(str, Enum):
+    WORKING = "Working"
+    COMPLETE = "Complete"
+
+
+@dataclass
+class Filing(DataClassDictMixin):
+    form: str
+    filing_date: str
+    is_xbrl: int
+
+
+@dataclass
+class Period(DataClassDictMixin):
+    # not something the compiled serializers convert themselves
+    date_range: Tuple[str, str]
+
+
+@dataclass
+class Entity(DataClassDictMixin):
+    cik: str
+    state: State
+    previous_state: Optional[State]
+    forms: List[str]
+    filings: List[Filing]
+    latest: Optional[Filing]
+    by_form: Dict[str, Filing]
+    period: Period
+
+
+@dataclass
+class Other(DataClassDictMixin):
+    name: str
+
+
+class Server:
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def entity(self, entity: Entity) -> Union[Entity, Other, None]:
+        return entity
+
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def others(self, count: int) -> List[Other]:
+        return [Other(str(n)) for n in range(count)]
+
+    @serializable_dataclass.remotely_callable_returns_dataclass
+    def wrongly_annotated(self) -> Other:
+        return [Other("a")]  # type: ignore
+
+
+class TestSerializableDataclass(unittest.TestCase):
+    def setUp(self):
+        filing = Filing("10-K", "2021-02-04", 1)
+        self.entity = Entity(
+            "CIK0000037996",
+            State.WORKING,
+            None,
+            ["10-K"],
+            [filing, Filing("10-Q", "2020-11-01", 0)],
+            filing,
+            {"10-K": filing},
+            Period(("1994-01-01", "2021-12-31")),
+        )
+        self.server = Server()
+
+    def test_same_as_to_dict(self):
+        result = self.server.entity(self.entity)
+        self.assertDictEqual(self.entity.to_dict(), result)
+        self.assertIs(str, type(result["state"]))
+        # lists of plain values go to msgpack as they are
+        self.assertIs(self.entity.forms, result["forms"])
+        self.assertListEqual(
+            ["1994-01-01", "2021-12-31"], result["period"]["date_range"]
+        )
+
+        self.entity.previous_state = State.COMPLETE
+        self.entity.latest = None
+        self.assertDictEqual(self.entity.to_dict(), self.server.entity(self.entity))
+
+    def test_return_types(self):
+        self.assertListEqual([{"name": "0"}, {"name": "1"}], self.server.others(2))
+        self.assertListEqual([], self.server.others(0))
+        self.assertIsNone(self.server.entity(None))
+        self.assertDictEqual({"name": "x"}, self.server.entity(Other("x")))
+        # the value decides, not the annotation
+        self.assertListEqual([{"name": "a"}], self.server.wrongly_annotated())
+
+    def test_serializers_are_compiled_once(self):
+        first = serializable_dataclass.serializer_for(List[Other])
+        self.assertIs(first, serializable_dataclass.serializer_for(List[Other]))
+
+
+if __name__ == "__main__":
+    unittest.main()
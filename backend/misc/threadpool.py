@@ -0,0 +1,26 @@
+from typing import Any, Callable
+
+import gevent  # type: ignore
+
+
+def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Calls a blocking function in gevent's native threadpool, and returns its result (or raises
+    its exception). Only the calling greenlet waits; the event loop and other greenlets keep running.
+
+    Without monkey-patching, gevent can't switch greenlets during blocking I/O like urlopen(),
+    so it stalls every other greenlet (and zerorpc's heartbeats) unless it's run this way.
+    """
+
+    def call():
+        # Exceptions are handed back rather than raised in the thread, where gevent would
+        # print them to stderr; 304 and 404 responses to urlopen() are routine, not errors
+        try:
+            return True, func(*args, **kwargs)
+        except Exception as e:
+            return False, e
+
+    succeeded, result = gevent.get_hub().threadpool.apply(call)
+    if not succeeded:
+        raise result
+    return result
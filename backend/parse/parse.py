@@ -1,23 +1,34 @@
 # Reason for escaping mypy type check: https://bugs.launchpad.net/beautifulsoup/+bug/1843791
 # Can create a 'stublist' but wanted to get this commit first
-import gzip
+import codecs
+import json
 import os
 import re
 import sys
-from typing import Any, Dict, List, Set
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
 
 import gevent  # type: ignore
-import pandas as pd  # type: ignore
-import spacy  # type: ignore # The smallest spacy model has virtually equivalent NER performance to the largest models, while running much faster
 from bs4 import BeautifulSoup  # type: ignore
 
 folder_dir = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.dirname(folder_dir)
 sys.path.append(parent_dir)
+from misc import filing_cache  # noqa: E402
+from misc.filing_cache import FilingCached  # noqa: E402
+from misc.filing_cache import CacheEntry, FilingCache  # noqa: E402
+from misc.http_session import ContentDecoder  # noqa: E402
+from misc.http_session import HTTPClient, decode_content  # noqa: E402
 from misc.rate_limiting import RateLimited  # noqa: E402
 from misc.rate_limiting import RateLimitTracker  # noqa: E402
+from misc.threadpool import run_blocking  # noqa: E402
 
 
 def ner_model_directory():
@@ -31,7 +42,64 @@ def ner_model_directory():
     return os.path.join(base_path, os.path.normpath("resources/en_core_web_sm-3.2.0"))
 
 
-nlp = spacy.load(ner_model_directory())
+# Only doc.ents is ever read, so every other component of the pipeline is left out.
+# In en_core_web_sm, "ner" has its own internal tok2vec layer, so the shared "tok2vec" isn't needed either.
+NER_EXCLUDED_COMPONENTS = [
+    "tok2vec",
+    "tagger",
+    "parser",
+    "senter",
+    "attribute_ruler",
+    "lemmatizer",
+]
+
+# The spaCy pipeline, once load_ner_model() has loaded it. Importing spaCy and loading the model
+# takes seconds, which would otherwise hold up the backend's startup, even for jobs without NER.
+_nlp: Optional[Any] = None
+_nlp_lock = threading.Lock()
+# how long loading the model took in this process, once it's loaded
+_nlp_load_seconds: Optional[float] = None
+
+
+def load_ner_model() -> Any:
+    """
+    Returns the spaCy pipeline used for NER, loading it first if this process hasn't yet.
+    Safe to call from several threads at once; the model is only loaded once.
+    This blocks for seconds on the first call, so call it with run_blocking() from greenlets.
+    """
+    global _nlp, _nlp_load_seconds
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                started_at = time.perf_counter()
+                import spacy  # type: ignore # The smallest spacy model has virtually equivalent NER performance to the largest models, while running much faster
+
+                _nlp = spacy.load(
+                    ner_model_directory(), exclude=NER_EXCLUDED_COMPONENTS
+                )
+                _nlp_load_seconds = time.perf_counter() - started_at
+    return _nlp
+
+
+def ner_model_load_seconds() -> Optional[float]:
+    """How long load_ner_model() took to load the model in this process; None if it hasn't"""
+    return _nlp_load_seconds
+
+
+def _save_as_utf8(
+    chunks: Iterable[bytes], content_encoding: Optional[str], charset: str, path: Path
+) -> Iterator[bytes]:
+    """
+    Undoes the Content-Encoding of a response body, decodes it from charset and writes it
+    to path as UTF-8, a chunk at a time. Yields each chunk as received, once it's written.
+    """
+    decoder = ContentDecoder(content_encoding)
+    text_decoder = codecs.getincrementaldecoder(charset)()
+    with open(path, mode="w", encoding="utf-8") as file:
+        for chunk in chunks:
+            file.write(text_decoder.decode(decoder.decompress(chunk)))
+            yield chunk
+        file.write(text_decoder.decode(decoder.flush(), final=True))
 
 
 class ParseError(Exception):
@@ -48,7 +116,49 @@ class ParseError(Exception):
         super().__init__(self.message)
 
 
-class Parse(RateLimited):
+@dataclass
+class DocumentSource:
+    """
+    Describes where Parse.parse_document() should read a filing's HTML from.
+    Any combination of the fields may be set; they are tried in the order
+    data -> path -> url, so a copy we already have is preferred over a network request.
+
+        url:        address of the document on SEC EDGAR
+        path:       local copy of the document, e.g. one downloaded by the backend
+        data:       raw bytes of the document
+        encoding:   character set of path/data
+    """
+
+    url: Optional[str] = None
+    path: Optional[Path] = None
+    data: Optional[bytes] = None
+    encoding: str = "utf-8"
+
+    @staticmethod
+    def from_any(document: "DocumentInput") -> "DocumentSource":
+        """
+        Wraps the different kinds of input accepted by Parse.parse_document().
+        Strings starting with http:// or https:// are treated as URLs,
+        any other string as a local path.
+        """
+        if isinstance(document, DocumentSource):
+            return document
+        if isinstance(document, (bytes, bytearray)):
+            return DocumentSource(data=bytes(document))
+        if isinstance(document, Path):
+            return DocumentSource(path=document)
+        if re.match(r"^https?://", document, re.IGNORECASE):
+            return DocumentSource(url=document)
+        return DocumentSource(path=Path(document))
+
+
+DocumentInput = Union[str, bytes, Path, DocumentSource]
+
+# the document map of a filing and the results of NER on it
+AnalyzedDocument = Tuple[Dict[str, Dict[str, str]], Dict[str, Set[str]]]
+
+
+class Parse(RateLimited, FilingCached, HTTPClient):
     HTML5LIB = 0
     HTML_PARSER = 1
     LXML = 2
@@ -70,6 +180,39 @@ class Parse(RateLimited):
     COMPLETE_REGEX = (
         rf"({COMPLETE_SINGLE_FIELD_REGEX })|({COMPLETE_COMBINED_FIELD_REGEX})"
     )
+    _COMPILED_REGEX = re.compile(COMPLETE_REGEX)
+    _CONTINUED_REGEX = re.compile(r"\((C|c)ontinued\)")
+
+    # Applied in order to a match of COMPLETE_REGEX, to spell every item label either "Item..." or "ITEM..."
+    _ITEM_LABEL_REPLACEMENTS = [
+        (re.compile(pattern), replacement)
+        for pattern, replacement in [
+            ("&#160;", " "),
+            ("&nbsp;", " "),
+            ("\\s", ""),
+            ("\\.", ""),
+            (">", ""),
+            ("ITEM", "TEM"),
+            ("TEM", "EM"),
+            ("EM", "M"),
+            ("Item", "tem"),
+            ("tem", "em"),
+            ("em", "m"),
+            ("m", "Item"),
+            ("M", "ITEM"),
+            ("ITEMS", "ITEM"),
+            ("Items", "Item"),
+        ]
+    ]
+
+    # Matches EDGAR document URLs: /Archives/edgar/data/<cik>/<accession number>/<document>
+    _ACCESSION_REGEX = r"/Archives/edgar/data/\d+/(?P<accession>\d{10}-?\d{2}-?\d{6})/(?P<document>[^/?#]+)"
+
+    # Increment whenever a change to the parser changes its output, to invalidate cached results
+    PARSER_VERSION = 1
+
+    # Number of sections spaCy processes together in _apply_named_entity_recognition_batch()
+    NER_BATCH_SIZE = 16
 
     EXTRACTED_FIELDS = [
         "item1",
@@ -118,205 +261,412 @@ class Parse(RateLimited):
         """
         super().__init__(limit_counter)
 
+    def _is_supported_document(self, document_name: str) -> bool:
+        return document_name.endswith(".htm") or document_name.endswith(".html")
+
     def _get_html_data(self, document_url: str):
-        if not (document_url.endswith(".htm") or document_url.endswith(".html")):
+        if not self._is_supported_document(document_url):
             raise ParseError(ParseError.DOCUMENT_NOT_SUPPORTED, document_url)
 
-        hdrs = {
-            "Host": "www.sec.gov",
-            "User-Agent": "Lafayette College yevenyos@lafayette.edu",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Accept": "*/*",
-        }
-        req = Request(document_url, headers=hdrs, method="GET")
+        cache = self._filing_cache
+        cache_entry = (
+            cache.get(cache.url_key(document_url)) if cache is not None else None
+        )
+        response = None
+        if (
+            cache is not None
+            and cache_entry is not None
+            and not cache.is_stale(cache_entry)
+        ):
+            response = self._read_cached_response(cache_entry)
+        if response is None:
+            response = self._fetch_html_data(document_url, cache_entry)
+        data, encoding, content_encoding = response
+
+        # Decompressing received data
+        try:
+            html = decode_content(data, content_encoding).decode(encoding)
+        except Exception as e:
+            raise ParseError(ParseError.UNEXPECTED_ERROR, originalError=e)
+
+        return html
+
+    def _read_cached_response(
+        self, cache_entry: CacheEntry
+    ) -> Optional[Tuple[bytes, str, Optional[str]]]:
+        """The body, charset and Content-Encoding of a cached response, or None if it was evicted"""
+        try:
+            data = self._filing_cache.read(cache_entry)  # type: ignore
+        except filing_cache.CacheEntryMissing:
+            return None
+        return data, cache_entry.charset, cache_entry.content_encoding
+
+    def _fetch_html_data(
+        self, document_url: str, cache_entry: Optional[CacheEntry]
+    ) -> Tuple[bytes, str, Optional[str]]:
+        """
+        Requests a document, revalidating cache_entry (a stale cached copy) if there is one.
+        Returns its body, as received, its charset and its Content-Encoding.
+        """
+        cache = self._filing_cache
+        hdrs = cache.conditional_headers(cache_entry) if cache is not None else {}
+
+        def fetch():
+            return self._http.request("GET", document_url, headers=hdrs)
+
+        try:
+            # Blocks until we can make a request without hitting the rate limit
+            res = self._rate_limited_request(document_url, fetch)
+        except (HTTPError, URLError) as e:
+            if not self._is_not_modified(e, cache_entry):
+                raise self._request_error(document_url, e)
+            cache.refresh(cache_entry)  # type: ignore
+            response = self._read_cached_response(cache_entry)  # type: ignore
+            # evicted since; ask for the whole document this time
+            return response or self._fetch_html_data(document_url, None)
+
+        encoding = res.charset()
+        content_encoding = res.headers.get("Content-Encoding")
+        if cache is not None:
+            cache.put(
+                cache.url_key(document_url),
+                document_url,
+                res.data,
+                charset=encoding,
+                content_encoding=content_encoding,
+                etag=res.headers.get("ETag"),
+                last_modified=res.headers.get("Last-Modified"),
+            )
+        return res.data, encoding, content_encoding
+
+    def _download_html(self, document_url: str, dest_path: Path) -> Path:
+        """
+        Saves a document to dest_path as UTF-8, like _get_html_data() but without ever holding
+        the whole document in memory: it's decompressed and decoded a chunk at a time as it's
+        downloaded (or read from the FilingCache), and stored in the cache along the way.
+        Nothing is left at dest_path unless the whole document could be saved.
+        """
+        if not self._is_supported_document(document_url):
+            raise ParseError(ParseError.DOCUMENT_NOT_SUPPORTED, document_url)
+
+        cache = self._filing_cache
+        cache_key = cache.url_key(document_url) if cache is not None else ""
+        cache_entry = cache.get(cache_key) if cache is not None else None
+        temp_path = dest_path.with_name(f".{dest_path.name}.part")
+
+        def save_cached_copy(entry: CacheEntry):
+            for chunk in _save_as_utf8(
+                cache.iter_chunks(entry),  # type: ignore
+                entry.content_encoding,
+                entry.charset,
+                temp_path,
+            ):
+                pass
+
+        def fetch(cache_entry: Optional[CacheEntry]):
+            hdrs = cache.conditional_headers(cache_entry) if cache is not None else {}
+            with self._http.stream("GET", document_url, headers=hdrs) as res:
+                chunks = _save_as_utf8(
+                    res.iter_raw(),
+                    res.headers.get("Content-Encoding"),
+                    res.charset(),
+                    temp_path,
+                )
+                if cache is None:
+                    for chunk in chunks:
+                        pass
+                    return
+                cache.put_stream(
+                    cache_key,
+                    document_url,
+                    chunks,
+                    charset=res.charset(),
+                    content_encoding=res.headers.get("Content-Encoding"),
+                    etag=res.headers.get("ETag"),
+                    last_modified=res.headers.get("Last-Modified"),
+                )
+
+        def download(cache_entry: Optional[CacheEntry]):
+            try:
+                # Blocks until we can make a request without hitting the rate limit
+                self._rate_limited_request(document_url, lambda: fetch(cache_entry))
+            except (HTTPError, URLError) as e:
+                if not self._is_not_modified(e, cache_entry):
+                    raise self._request_error(document_url, e)
+                cache.refresh(cache_entry)  # type: ignore
+                try:
+                    run_blocking(save_cached_copy, cache_entry)
+                except filing_cache.CacheEntryMissing:  # evicted since; ask for the whole document
+                    download(None)
 
-        # Block until we can make a request without hitting the rate limit
-        self._block_on_rate_limit()
         try:
-            with urlopen(req) as res:
-                data = res.read()
-                encoding = res.info().get_content_charset("utf-8")
-                # Decompressing received data
+            if (
+                cache is not None
+                and cache_entry is not None
+                and not cache.is_stale(cache_entry)
+            ):
                 try:
-                    data = gzip.decompress(data)
-                    data = data.decode(encoding)
-                except Exception as e:
-                    raise ParseError(ParseError.UNEXPECTED_ERROR, originalError=e)
+                    run_blocking(save_cached_copy, cache_entry)
+                except filing_cache.CacheEntryMissing:
+                    download(None)
+            else:
+                download(cache_entry)
+            os.replace(temp_path, dest_path)
+        except Exception as e:
+            temp_path.unlink(missing_ok=True)
+            if isinstance(e, ParseError):
+                raise
+            # Decompressing or decoding the data, or writing it out
+            raise ParseError(ParseError.UNEXPECTED_ERROR, originalError=e)
+        return dest_path
+
+    def _is_not_modified(
+        self, e: Union[HTTPError, URLError], cache_entry: Optional[CacheEntry]
+    ) -> bool:
+        """Whether the server answered 304, meaning the cached copy is still current"""
+        return (
+            isinstance(e, HTTPError)
+            and e.code == 304
+            and self._filing_cache is not None
+            and cache_entry is not None
+        )
+
+    def _request_error(
+        self, document_url: str, e: Union[HTTPError, URLError]
+    ) -> ParseError:
         # HTTPError has to come before URLError. HTTPError is a subset of URLError
-        except HTTPError as e:
+        if isinstance(e, HTTPError):
             if e.code == 404:
-                raise ParseError(
-                    ParseError.NO_FILE_EXISTS_ERROR,
-                    document_url,
-                    originalError=e,
+                return ParseError(
+                    ParseError.NO_FILE_EXISTS_ERROR, document_url, originalError=e
                 )
-            else:
-                raise ParseError(ParseError.SERVER_ERROR, originalError=e)
-        except URLError as f:
-            raise ParseError(ParseError.CONNECTION_ERROR, originalError=f)
+            return ParseError(ParseError.SERVER_ERROR, originalError=e)
+        return ParseError(ParseError.CONNECTION_ERROR, originalError=e)
+
+    def _read_document(self, source: DocumentSource) -> str:
+        """
+        Returns the HTML of a document as a string, reading it from the first
+        available field of the DocumentSource (data, then path, then url).
+        """
+        if source.data is not None:
+            try:
+                return source.data.decode(source.encoding)
+            except Exception as e:
+                raise ParseError(ParseError.UNEXPECTED_ERROR, originalError=e)
+
+        if source.path is not None:
+            if not self._is_supported_document(source.path.name):
+                raise ParseError(ParseError.DOCUMENT_NOT_SUPPORTED, str(source.path))
+            if source.path.is_file():
+                try:
+                    with open(source.path, mode="r", encoding=source.encoding) as file:
+                        return file.read()
+                except Exception as e:
+                    raise ParseError(ParseError.UNEXPECTED_ERROR, originalError=e)
 
-        return data
+        if source.url is not None:
+            return self._get_html_data(source.url)
 
-    def parse_document(self, document_url: str) -> Dict[str, Dict[str, str]]:
+        # Only a path was given, and nothing exists there
+        raise ParseError(ParseError.NO_FILE_EXISTS_ERROR, str(source.path))
 
-        # This logic is influenced by this GitHub gist: https://gist.github.com/anshoomehra/ead8925ea291e233a5aa2dcaa2dc61b2
-        parser = "lxml"
+    def parse_document(self, document: DocumentInput) -> Dict[str, Dict[str, str]]:
+        """
+        Splits a 10-K document into its sections.
 
-        data = self._get_html_data(document_url)
-        raw_10k = data
-        regex = re.compile(Parse.COMPLETE_REGEX)
-
-        matches = regex.finditer(raw_10k)
-        matched_list = [(x.group(), x.start(), x.end()) for x in matches]
-        if len(matched_list) == 0:
-            return {}
-        df = pd.DataFrame(matched_list)
-
-        df.columns = ["item", "start", "end"]
-
-        df.replace("&#160;", " ", regex=True, inplace=True)
-        df.replace("&nbsp;", " ", regex=True, inplace=True)
-        df.replace("\\s", "", regex=True, inplace=True)
-        df.replace("\\.", "", regex=True, inplace=True)
-        df.replace(">", "", regex=True, inplace=True)
-        df.replace("ITEM", "TEM", regex=True, inplace=True)
-        df.replace("TEM", "EM", regex=True, inplace=True)
-        df.replace("EM", "M", regex=True, inplace=True)
-        df.replace("Item", "tem", regex=True, inplace=True)
-        df.replace("tem", "em", regex=True, inplace=True)
-        df.replace("em", "m", regex=True, inplace=True)
-        df.replace("m", "Item", regex=True, inplace=True)
-        df.replace("M", "ITEM", regex=True, inplace=True)
-        df.replace("ITEMS", "ITEM", regex=True, inplace=True)
-        df.replace("Items", "Item", regex=True, inplace=True)
-
-        remove_rows = []
-        for _, row in df.iterrows():
-            item_key = str(row["item"])
-            if item_key.isupper():
-                characters_after = raw_10k[row["start"] : row["start"] + 256]
-                if re.search(r"\((C|c)ontinued\)", characters_after) is not None:
-                    remove_rows.append(_)
-                else:
-                    for key, value in df.iterrows():
-                        row_key = str(value["item"])
-                        if (
-                            row_key.lower() == item_key.lower()
-                            and not row_key.isupper()
-                        ):
-                            remove_rows.append(key)
-        df.drop(remove_rows, inplace=True)
-        df["item"] = df.item.str.lower()
-
-        pos_df = df.sort_values("start", ascending=True).drop_duplicates(
-            subset=["item"], keep="last"
+            Parameters:
+                document: where to read the document from. Either a URL, a local path,
+                the raw bytes of the document, or a DocumentSource combining these
+                (e.g. the URL of a filing along with the copy we already downloaded).
+
+        Returns a Dict mapping section names (elements of EXTRACTED_FIELDS) to the
+        "html" and "text" contents of that section.
+
+        If the document has a URL on EDGAR and a FilingCache is available, the result is
+        cached, and later calls for the same filing return it without parsing again.
+        """
+        source = DocumentSource.from_any(document)
+        document_map = self._get_cached_section_map(source.url)
+        if document_map is None:
+            document_map = self._split_sections(self._read_document(source))
+            self._cache_section_map(source.url, document_map)
+        return document_map
+
+    def _section_map_cache_key(self, document_url: Optional[str]) -> Optional[str]:
+        """
+        Section maps are cached per filing (accession number + document name) and per
+        PARSER_VERSION, so changes to the parser never return stale results.
+        """
+        if document_url is None:
+            return None
+        match = re.search(Parse._ACCESSION_REGEX, document_url)
+        if match is None:
+            return None
+        accession_number = match.group("accession").replace("-", "")
+        return f"{FilingCache.SECTION_MAP_PREFIX}v{Parse.PARSER_VERSION}/{accession_number}/{match.group('document')}"
+
+    def _get_cached_section_map(
+        self, document_url: Optional[str]
+    ) -> Optional[Dict[str, Dict[str, str]]]:
+        cache = self._filing_cache
+        cache_key = self._section_map_cache_key(document_url)
+        if cache is None or cache_key is None:
+            return None
+        cache_entry = cache.get(cache_key)
+        if cache_entry is None:
+            return None
+        try:
+            return json.loads(cache.read(cache_entry).decode(cache_entry.charset))
+        except Exception:  # unreadable entries are simply parsed again, and overwritten
+            return None
+
+    def _cache_section_map(
+        self, document_url: Optional[str], document_map: Dict[str, Dict[str, str]]
+    ):
+        cache = self._filing_cache
+        cache_key = self._section_map_cache_key(document_url)
+        if cache is None or cache_key is None:
+            return
+        cache.put(
+            cache_key,
+            document_url,  # type: ignore # can't be None if cache_key isn't
+            json.dumps(document_map).encode("utf-8"),
         )
 
-        pos_df = (
-            pos_df.assign(
-                sort_value=lambda x: [Parse.DICT_FIELDS[value] for value in x["item"]]
-            )
-            .sort_values("sort_value")
-            .drop(labels=["sort_value"], axis=1)
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _normalize_item_label(label: str) -> str:
+        """
+        Turns a match of COMPLETE_REGEX (e.g. ">Item&#160;1A.", ">ITEMS 7") into the label of the
+        item it refers to ("Item1A", "ITEM7"). The case of the label is kept, since uppercase
+        headings are treated differently when locating sections.
+
+        A 10-K only spells its item labels in a handful of ways, so each spelling is
+        normalized once and remembered.
+        """
+        for pattern, replacement in Parse._ITEM_LABEL_REPLACEMENTS:
+            label = pattern.sub(replacement, label)
+        return label
+
+    def _locate_sections(self, raw_10k: str) -> List[Tuple[str, int]]:
+        """
+        Finds where each section of a 10-K document starts.
+
+        Returns a list of (section name, position in raw_10k) pairs, sorted by position.
+        Section names are keys of DICT_FIELDS (e.g. "item1a").
+        """
+        labels = [
+            (Parse._normalize_item_label(match.group()), match.start())
+            for match in Parse._COMPILED_REGEX.finditer(raw_10k)
+        ]
+
+        # An uppercase label ("ITEM 7.") is taken to be the heading of its section, so any other
+        # spelling of the same item is only a reference to it. That doesn't apply to
+        # headings repeated at the top of a page, followed by "(continued)"; those are dropped.
+        continued_headings: Set[int] = set()
+        uppercase_items: Set[str] = set()
+        for index, (label, start) in enumerate(labels):
+            if label.isupper():
+                characters_after = raw_10k[start : start + 256]
+                if Parse._CONTINUED_REGEX.search(characters_after) is not None:
+                    continued_headings.add(index)
+                else:
+                    uppercase_items.add(label.lower())
+        mentions = [
+            (label.lower(), start)
+            for index, (label, start) in enumerate(labels)
+            if index not in continued_headings
+            and (label.isupper() or label.lower() not in uppercase_items)
+        ]
+
+        # Otherwise, the last mention of each item is assumed to be its heading,
+        # since the table of contents and cross-references tend to come first
+        mention_starts: Dict[str, List[int]] = {}
+        for item, start in mentions:
+            mention_starts.setdefault(item, []).append(start)
+        sections = sorted(
+            ((item, starts[-1]) for item, starts in mention_starts.items()),
+            key=lambda section: Parse.DICT_FIELDS[section[0]],
         )
-        pos_df.reset_index(drop=True, inplace=True)
-        df.reset_index(drop=True, inplace=True)
-        remove_rows = []
-        continue_loop = True
-        while continue_loop:
-            gevent.sleep(0)  # yield execution to e.g. allow heartbeat signals
-            continue_loop = False
-            if pos_df["start"].size > 1:
-                for row in pos_df.itertuples():  # type: ignore
-                    if row[0] == 0 and row[2] > pos_df["start"].loc[row[0] + 1]:
-                        remove_rows.append(row[1])
-                        pos_df = pos_df.drop([row[0]]).reset_index(drop=True)
-                        continue_loop = True
-                        break
-                    elif (
-                        row[0] == pos_df["start"].size - 1
-                        and row[2] < pos_df["start"].loc[row[0] - 1]
-                    ):
-                        remove_rows.append(row[1])
-                        pos_df = pos_df.drop([row[0]]).reset_index(drop=True)
-                        continue_loop = True
-                        break
-                    elif (
-                        row[0] > 0
-                        and row[0] < pos_df["start"].size - 1
-                        and row[2] < pos_df["start"].loc[row[0] - 1]
-                    ):
-                        remove_rows.append(row[1])
-                        pos_df = pos_df.drop([row[0]]).reset_index(drop=True)
-                        continue_loop = True
-                        break
-
-        pos_df.set_index("item", inplace=True)
-        df_list = []
-        for item in remove_rows:
+
+        # Sections must appear in the same order as in DICT_FIELDS. Drop the first section that's
+        # out of order with the one before it (or, for the first section, with the one after it),
+        # and repeat until none are. Everything before the dropped section was already in order,
+        # so the scan resumes just before it rather than from the start.
+        misplaced_items: List[str] = []
+        index = 0
+        while len(sections) > 1 and index < len(sections):
+            if index == 0:
+                out_of_order = sections[0][1] > sections[1][1]
+            else:
+                out_of_order = sections[index][1] < sections[index - 1][1]
+            if out_of_order:
+                misplaced_items.append(sections.pop(index)[0])
+                index = max(0, index - 1)
+            else:
+                index += 1
+
+        # A misplaced section may still be found at an earlier mention, lying between the sections
+        # around it. Use the last such mention, if any.
+        section_starts = dict(sections)
+        fields = list(Parse.DICT_FIELDS.keys())
+        for item in misplaced_items:
             gevent.sleep(0)  # yield execution
-            max_value_index = None
-            max_value = -1
-            for row in df.itertuples():  # type: ignore
-                if row[1] == item and max_value < row[2]:
-                    location_start = None
-                    location_end = None
-                    index = Parse.DICT_FIELDS[item]
-                    fields = list(Parse.DICT_FIELDS.keys())
-                    for i in range(len(fields[:index]) - 1, -1, -1):
-                        if fields[i] in pos_df.index:
-                            location_start = fields[i]
-                            break
-
-                    for i in range(len(fields[index:])):
-                        if fields[i] in pos_df.index:
-                            location_end = fields[i]
-                            break
-
-                    if location_start is None and location_end is None:
-                        pass
-                    elif location_start is None:
-                        if pos_df["start"].loc[location_end] > row[2]:
-                            max_value_index = row[0]
-                            max_value = row[2]
-                    elif location_end is None:
-                        if pos_df["start"].loc[location_start] < row[2]:
-                            max_value_index = row[0]
-                            max_value = row[2]
-                    else:
-                        if (
-                            pos_df["start"].loc[location_start] < row[2]
-                            and pos_df["start"].loc[location_end] > row[2]
-                        ):
-                            max_value_index = row[0]
-                            max_value = row[2]
-            if max_value_index is not None:
-                df_list.append(
-                    pd.DataFrame(
-                        {
-                            "start": [df["start"].loc[max_value_index]],
-                            "end": [df["end"].loc[max_value_index]],
-                            "item": [df["item"].loc[max_value_index]],
-                        }
-                    ).set_index("item")
-                )
-        if len(df_list) != 0:
-            df_list.append(pos_df)
-            pos_df = pd.concat(df_list).sort_values("start", ascending=True)
+            field_index = Parse.DICT_FIELDS[item]
+            previous_item = next(
+                (
+                    field
+                    for field in reversed(fields[:field_index])
+                    if field in section_starts
+                ),
+                None,
+            )
+            # NB: this looks for the following section starting from the *first* field, rather than
+            # from field_index. Kept as-is, since changing it changes which sections are found.
+            next_item = next(
+                (
+                    field
+                    for field in fields[: len(fields) - field_index]
+                    if field in section_starts
+                ),
+                None,
+            )
+            if previous_item is None and next_item is None:
+                continue
+            starts = mention_starts[item]
+            # mentions are in document order, so bisect for the last one before the next section
+            candidate = (
+                bisect_left(starts, section_starts[next_item])
+                if next_item is not None
+                else len(starts)
+            ) - 1
+            if candidate >= 0 and (
+                previous_item is None
+                or section_starts[previous_item] < starts[candidate]
+            ):
+                sections.append((item, starts[candidate]))
+
+        return sorted(sections, key=lambda section: section[1])
+
+    def _split_sections(self, raw_10k: str) -> Dict[str, Dict[str, str]]:
+        """
+        Locates the sections of a 10-K document in its HTML, and extracts
+        their contents with BeautifulSoup.
+        """
+
+        # This logic is influenced by this GitHub gist: https://gist.github.com/anshoomehra/ead8925ea291e233a5aa2dcaa2dc61b2
+        parser = "lxml"
+
+        section_starts = self._locate_sections(raw_10k)
 
         document_map = {}
-        index_length = len(pos_df.index)
-        for index, item in enumerate(pos_df.index):
+        for index, (item, start) in enumerate(section_starts):
             gevent.sleep(0)  # yield execution
             if item in Parse.EXTRACTED_FIELDS:
-                if index < index_length - 1:
-                    text = raw_10k[
-                        pos_df["start"]
-                        .loc[item] : pos_df["start"]
-                        .loc[pos_df.index[index + 1]]
-                    ]
+                if index < len(section_starts) - 1:
+                    text = raw_10k[start : section_starts[index + 1][1]]
                 else:
-                    text = raw_10k[pos_df["start"].loc[item] :]
+                    text = raw_10k[start:]
                 soup = BeautifulSoup(text, parser)
                 gevent.sleep(0)  # yield execution
                 soup_html = soup.prettify()
@@ -374,29 +724,130 @@ class Parse(RateLimited):
         The function _get_section_ner_labels() is used to determine which types of entity are
         included in the set for each field.
 
+        To process several documents, prefer _apply_named_entity_recognition_batch().
         """
+        return self._apply_named_entity_recognition_batch([doc_map])[0]
 
-        def extract_specific_labels(
-            string: str, labels_to_gather: List[str]
-        ) -> Set[str]:
+    def _apply_named_entity_recognition_batch(
+        self, doc_maps: List[Dict[str, Any]], batch_size: Optional[int] = None
+    ) -> List[Dict[str, Set[str]]]:
+        """
+        Applies NER to the output of the parser for several 10-K forms at once.
+        Returns one Dict per element of doc_maps, as described in _apply_named_entity_recognition().
 
-            processed_doc = nlp(string)
-            count = 0  # yield the event loop every 100 tokens processed
+        The sections of all the documents are streamed through spaCy's nlp.pipe() in batches of
+        batch_size (default: NER_BATCH_SIZE) sections, which is much faster than processing them
+        one at a time. Sections without any NER labels to gather are skipped entirely.
+        """
+        results: List[Dict[str, Set[str]]] = [
+            {section: set() for section in doc_map.keys()} for doc_map in doc_maps
+        ]
+        sections_to_process = []
+        for index, doc_map in enumerate(doc_maps):
+            for section in doc_map.keys():
+                labels_to_gather = self._get_section_ner_labels(section)
+                if len(labels_to_gather) > 0:
+                    sections_to_process.append((index, section, labels_to_gather))
+        texts = (
+            doc_maps[index][section]["text"]
+            for index, section, _ in sections_to_process
+        )
+        # the model is loaded on first use, in the threadpool so the event loop keeps running
+        nlp = _nlp if _nlp is not None else run_blocking(load_ner_model)
+        processed_docs = nlp.pipe(
+            texts,
+            batch_size=batch_size if batch_size is not None else Parse.NER_BATCH_SIZE,
+        )
+        for (index, section, labels_to_gather), processed_doc in zip(
+            sections_to_process, processed_docs
+        ):
+            gevent.sleep(0)  # yield execution between sections
             # Compile all the tokens matching the labels into a single set
-            tokens_matching_labels = set()
-            count = (count + 1) % 100
-            if count == 0:
-                gevent.sleep(0)
             for entity in processed_doc.ents:
                 if entity.label_ in labels_to_gather:
-                    tokens_matching_labels.add(entity.text)
+                    results[index][section].add(entity.text)
 
-            return tokens_matching_labels
+        return results
 
-        section_texts = {
-            section: extract_specific_labels(
-                doc_map[section]["text"], self._get_section_ner_labels(section)
-            )
-            for section in doc_map.keys()
-        }
-        return section_texts
+    def _analyze_documents(
+        self,
+        documents: List[
+            Tuple[Optional[DocumentSource], Optional[Dict[str, Dict[str, str]]]]
+        ],
+        perform_ner: bool,
+    ) -> List[Union[AnalyzedDocument, Exception]]:
+        """
+        Parses each (source, document map) of documents, unless its document map is already known,
+        then applies NER to all of them together if perform_ner is True, so that the sections of
+        every document share the batches of _apply_named_entity_recognition_batch().
+
+        Returns, for each document, its document map and NER results, or the exception that
+        stopped it from being parsed; one document failing doesn't stop the others.
+        """
+        outcomes: List[Union[Dict[str, Dict[str, str]], Exception]] = []
+        for source, document_map in documents:
+            try:
+                outcomes.append(
+                    document_map
+                    if document_map is not None
+                    else self.parse_document(source)  # type: ignore # one of the two is given
+                )
+            except Exception as err:
+                outcomes.append(err)
+        document_maps = [
+            outcome for outcome in outcomes if not isinstance(outcome, Exception)
+        ]
+        ner_results = iter(
+            self._apply_named_entity_recognition_batch(document_maps)
+            if perform_ner and document_maps
+            else [{} for _ in document_maps]
+        )
+        return [
+            outcome if isinstance(outcome, Exception) else (outcome, next(ner_results))
+            for outcome in outcomes
+        ]
+
+
+# The Parse instance of each worker process started by initialize_parse_worker()
+_worker_parser: Optional[Parse] = None
+
+
+def initialize_parse_worker():
+    """
+    Initializer for worker processes that parse documents and apply NER (see parse_and_recognize()).
+    The spaCy model is loaded by each worker on its first NER, or by warm_up_parse_worker().
+    """
+    global _worker_parser
+    _worker_parser = Parse(RateLimitTracker())
+
+
+def parse_and_recognize(
+    documents: List[
+        Tuple[Optional[DocumentSource], Optional[Dict[str, Dict[str, str]]]]
+    ],
+    perform_ner: bool,
+) -> List[Union[AnalyzedDocument, Exception]]:
+    """
+    Runs in a worker process. Parses several documents and applies NER to them together;
+    see Parse._analyze_documents().
+
+    The sources should point to local copies of the documents; workers don't share the
+    rate limiter or the FilingCache of the main process.
+    """
+    if _worker_parser is None:
+        initialize_parse_worker()
+    parser: Parse = _worker_parser  # type: ignore # set by initialize_parse_worker()
+    return parser._analyze_documents(documents, perform_ner)
+
+
+def warm_up_parse_worker() -> float:
+    """
+    Runs in a worker process. Loads the spaCy model ahead of the worker's first NER, and returns
+    how long that took in seconds (0 if the worker had already loaded it).
+    """
+    if _worker_parser is None:
+        initialize_parse_worker()
+    if _nlp is not None:
+        return 0.0
+    load_ner_model()
+    return ner_model_load_seconds()  # type: ignore # just loaded
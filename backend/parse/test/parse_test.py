@@ -1,7 +1,15 @@
+import gzip
+import io
 import os
 import sys
+import tempfile
+import threading
+import time
 import unittest
 import warnings
+from contextlib import nullcontext
+from email.message import Message
+from pathlib import Path
 from unittest.mock import patch
 from urllib.error import HTTPError, URLError
 from urllib.request import urlopen
@@ -12,8 +20,13 @@ parent_dir = os.path.dirname(folder_dir)
 grandparent_dir = os.path.dirname(parent_dir)
 sys.path.append(parent_dir)
 sys.path.append(grandparent_dir)
+from misc.filing_cache import FilingCache  # type: ignore # noqa: E402
+from misc.http_session import HTTPResponse  # type: ignore # noqa: E402
+from misc.http_session import HTTPStream  # type: ignore # noqa: E402
 from misc.rate_limiting import RateLimitTracker  # type: ignore # noqa: E402
-from parse import Parse, ParseError  # type: ignore # noqa: E40
+from parse import DocumentSource, Parse, ParseError  # type: ignore # noqa: E40
+
+import parse  # type: ignore # noqa: E402 # isort: skip
 
 
 class TestParseError(unittest.TestCase):
@@ -59,10 +72,17 @@ class TestParse(unittest.TestCase):
         self.parser = Parse(self.rate_limiter)
         self.document_url = "https://www.sec.gov/Archives/edgar/data/0000037996/000003799621000012/f-20201231.htm"  # 2020 10-K document for Ford
         self.wrong_document_url = "wrong_document.txt"
+        self.local_document = (
+            "<html><body>"
+            "<p>Item 1. Business</p><p>We make cars.</p>"
+            "<p>Item 1A. Risk Factors</p><p>Cars are risky.</p>"
+            "<p>Item 2. Properties</p><p>Dearborn, Michigan.</p>"
+            "</body></html>"
+        )
 
-    @patch("parse.urlopen")
-    def test_no_internet_connection(self, mock_urlopen):
-        mock_urlopen.side_effect = URLError(reason=None)
+    @patch.object(Parse, "_http_session")
+    def test_no_internet_connection(self, mock_session):
+        mock_session.request.side_effect = URLError(reason=None)
         with self.assertRaises(ParseError) as cm:
             self.parser.parse_document(self.document_url)
         exception = cm.exception
@@ -87,9 +107,9 @@ class TestParse(unittest.TestCase):
         self.assertEqual(ParseError.UNEXPECTED_ERROR, exception.message)
         self.assertTupleEqual((), exception.values)
 
-    @patch("parse.urlopen")
-    def test_no_file_exists(self, mock_urlopen):
-        mock_urlopen.side_effect = HTTPError(
+    @patch.object(Parse, "_http_session")
+    def test_no_file_exists(self, mock_session):
+        mock_session.request.side_effect = HTTPError(
             url=None, code=404, hdrs=None, msg=None, fp=None
         )
         with self.assertRaises(ParseError) as cm:
@@ -105,6 +125,203 @@ class TestParse(unittest.TestCase):
         self.assertEqual(ParseError.DOCUMENT_NOT_SUPPORTED, exception.message)
         self.assertTupleEqual((self.wrong_document_url,), exception.values)
 
+    @patch.object(Parse, "_http_session")
+    def test_local_document_sources(self, mock_session):
+        mock_session.request.side_effect = URLError(reason=None)
+        from_bytes = self.parser.parse_document(self.local_document.encode("utf-8"))
+        self.assertListEqual(["item1", "item1a", "item2"], list(from_bytes))
+        self.assertIn("Cars are risky.", from_bytes["item1a"]["text"])
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder, "10-K_2021-02-04.htm")
+            path.write_text(self.local_document, encoding="utf-8")
+            self.assertDictEqual(from_bytes, self.parser.parse_document(path))
+            # the local copy should be preferred over the URL
+            self.assertDictEqual(
+                from_bytes,
+                self.parser.parse_document(
+                    DocumentSource(url=self.document_url, path=path)
+                ),
+            )
+        mock_session.request.assert_not_called()
+
+    @patch.object(Parse, "_http_session")
+    def test_missing_local_document_falls_back_to_url(self, mock_session):
+        mock_session.request.side_effect = URLError(reason=None)
+        missing_path = Path(tempfile.gettempdir(), "does_not_exist.htm")
+        with self.assertRaises(ParseError) as cm:
+            self.parser.parse_document(
+                DocumentSource(url=self.document_url, path=missing_path)
+            )
+        self.assertEqual(ParseError.CONNECTION_ERROR, cm.exception.message)
+
+        with self.assertRaises(ParseError) as cm:
+            self.parser.parse_document(missing_path)
+        self.assertEqual(ParseError.NO_FILE_EXISTS_ERROR, cm.exception.message)
+
+    @patch.object(Parse, "_http_session")
+    def test_section_map_cache(self, mock_session):
+        mock_session.request.side_effect = URLError(reason=None)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.parser._filing_cache = FilingCache(Path(cache_dir))
+            parsed = self.parser.parse_document(
+                DocumentSource(
+                    url=self.document_url, data=self.local_document.encode("utf-8")
+                )
+            )
+            # no local copy this time; the cached sections are used without downloading
+            self.assertDictEqual(parsed, self.parser.parse_document(self.document_url))
+            mock_session.request.assert_not_called()
+
+            with patch.object(Parse, "PARSER_VERSION", Parse.PARSER_VERSION + 1):
+                with self.assertRaises(ParseError) as cm:
+                    self.parser.parse_document(self.document_url)
+                self.assertEqual(ParseError.CONNECTION_ERROR, cm.exception.message)
+
+    @patch.object(Parse, "_http_session")
+    def test_cached_copy_evicted(self, mock_session):
+        headers = Message()
+        headers["Content-Type"] = "text/html; charset=utf-8"
+        body = self.local_document.encode("utf-8")
+        response = HTTPResponse(self.document_url, 200, headers, body)
+        not_modified = HTTPError(url=None, code=304, hdrs=None, msg=None, fp=None)
+        with tempfile.TemporaryDirectory() as folder:
+            cache = FilingCache(Path(folder, "cache"))
+            self.parser._filing_cache = cache
+            key = FilingCache.url_key(self.document_url)
+            entry = cache.put(key, self.document_url, body, etag='"abc"')
+            entry.stored_at -= 10 * 365 * 24 * 60 * 60  # stale, so it's revalidated
+            # evicted (e.g. by another job) after it was looked up
+            with patch.object(cache, "get", return_value=entry):
+                Path(folder, "cache", entry.file).unlink()
+                mock_session.request.side_effect = [not_modified, response]
+                self.assertEqual(
+                    self.local_document, self.parser._get_html_data(self.document_url)
+                )
+            # the second request asked for the whole document
+            self.assertNotIn(
+                "If-None-Match", mock_session.request.call_args.kwargs["headers"]
+            )
+            self.assertIn(key, cache)
+
+            Path(folder, "cache", cache.get(key).file).unlink()  # type: ignore
+            stream = HTTPStream(self.document_url, 200, headers, lambda size: [body])
+            mock_session.stream.side_effect = lambda *args, **kwargs: nullcontext(
+                stream
+            )
+            dest_path = Path(folder, "10-K_2021-02-04.htm")
+            self.parser._download_html(self.document_url, dest_path)
+            self.assertEqual(self.local_document, dest_path.read_text(encoding="utf-8"))
+
+    @patch.object(Parse, "_http_session")
+    def test_streaming_download(self, mock_session):
+        document = self.local_document.replace("cars", "voitures \u00e9lectriques")
+        body = gzip.compress(document.encode("cp1252"))
+        headers = Message()
+        headers["Content-Type"] = "text/html; charset=windows-1252"
+        headers["Content-Encoding"] = "gzip"
+
+        def respond(chunks):
+            # the body arrives in many small chunks
+            response = HTTPStream(
+                self.document_url, 200, headers, lambda size: iter(chunks)
+            )
+            mock_session.stream.side_effect = lambda *args, **kwargs: nullcontext(
+                response
+            )
+
+        with tempfile.TemporaryDirectory() as folder:
+            self.parser._filing_cache = FilingCache(Path(folder, "cache"))
+            dest_path = Path(folder, "10-K_2021-02-04.htm")
+
+            body_stream = io.BytesIO(body)
+            respond(list(iter(lambda: body_stream.read(7), b"")))
+            self.parser._download_html(self.document_url, dest_path)
+            self.assertEqual(document, dest_path.read_text(encoding="utf-8"))
+            # saved to the cache on the way
+            self.assertEqual(document, self.parser._get_html_data(self.document_url))
+
+            # the cached copy is used without downloading again
+            mock_session.stream.side_effect = URLError(reason=None)
+            dest_path.unlink()
+            self.parser._download_html(self.document_url, dest_path)
+            self.assertEqual(document, dest_path.read_text(encoding="utf-8"))
+            self.assertEqual(1, mock_session.stream.call_count)
+
+            # cut short; nothing is saved
+            self.parser._filing_cache = None
+            respond([body[:-10]])
+            with self.assertRaises(ParseError) as cm:
+                self.parser._download_html(self.document_url, Path(folder, "cut.htm"))
+            self.assertEqual(ParseError.UNEXPECTED_ERROR, cm.exception.message)
+            self.assertListEqual(
+                sorted(["cache", dest_path.name]), sorted(os.listdir(folder))
+            )
+
+            mock_session.stream.side_effect = HTTPError(
+                url=None, code=404, hdrs=None, msg=None, fp=None
+            )
+            with self.assertRaises(ParseError) as cm:
+                self.parser._download_html(self.document_url, dest_path)
+            self.assertEqual(ParseError.NO_FILE_EXISTS_ERROR, cm.exception.message)
+
+    def test_batched_named_entity_recognition(self):
+        doc_map = self.parser.parse_document(self.local_document.encode("utf-8"))
+        single = self.parser._apply_named_entity_recognition(doc_map)
+        self.assertListEqual(list(doc_map), list(single))
+        self.assertListEqual(
+            [single, single, {}],
+            self.parser._apply_named_entity_recognition_batch(
+                [doc_map, doc_map, {}], batch_size=2
+            ),
+        )
+
+    def test_analyze_documents_together(self):
+        doc_map = self.parser.parse_document(self.local_document.encode("utf-8"))
+        documents = [
+            (DocumentSource(data=self.local_document.encode("utf-8")), None),
+            (DocumentSource(path=Path("missing", "10-K.htm")), None),
+            (None, doc_map),
+        ]
+        with patch.object(
+            Parse,
+            "_apply_named_entity_recognition_batch",
+            side_effect=lambda doc_maps: [{"item1a": {"Ford"}} for _ in doc_maps],
+        ) as mock_ner:
+            outcomes = self.parser._analyze_documents(documents, True)
+        # one NER call for every document parsed, leaving out the one that failed
+        mock_ner.assert_called_once_with([doc_map, doc_map])
+        self.assertEqual((doc_map, {"item1a": {"Ford"}}), outcomes[0])
+        self.assertIsInstance(outcomes[1], ParseError)
+        self.assertEqual((doc_map, {"item1a": {"Ford"}}), outcomes[2])
+        self.assertListEqual(
+            [(doc_map, {})], self.parser._analyze_documents([(None, doc_map)], False)
+        )
+
+    def test_ner_model_is_loaded_once(self):
+        import spacy  # type: ignore
+
+        def slow_load(*args, **kwargs):
+            time.sleep(0.1)
+            return spacy.blank("en")
+
+        with patch.object(parse, "_nlp", None), patch(
+            "spacy.load", side_effect=slow_load
+        ) as mock_load:
+            loaded = []
+            threads = [
+                threading.Thread(target=lambda: loaded.append(parse.load_ner_model()))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(1, mock_load.call_count)
+            self.assertEqual(4, len(loaded))
+            self.assertTrue(all(nlp is loaded[0] for nlp in loaded))
+            self.assertGreaterEqual(parse.ner_model_load_seconds(), 0.1)
+
     def test_legit_call(self):
         # We expect all fields to be present in this extraction
         output = self.parser.parse_document(self.document_url)
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import unittest
+
+from bs4 import BeautifulSoup  # type: ignore
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+grandparent_dir = os.path.dirname(parent_dir)
+sys.path.append(parent_dir)
+sys.path.append(grandparent_dir)
+from misc.rate_limiting import RateLimitTracker  # type: ignore # noqa: E402
+from parse import Parse  # type: ignore # noqa: E40
+
+FIXTURES_DIR = os.path.join(folder_dir, "fixtures")
+
+
+class TestSectionLocator(unittest.TestCase):
+    """
+    Regression tests for the location of sections in 10-K documents.
+
+    fixtures/expected_sections.json holds, for each document in fixtures/, the [start, end)
+    range of every section extracted by Parse.parse_document(), as located by the
+    original pandas-based implementation of the parser.
+    """
+
+    def setUp(self):
+        self.parser = Parse(RateLimitTracker())
+        with open(
+            os.path.join(FIXTURES_DIR, "expected_sections.json"), encoding="utf-8"
+        ) as file:
+            self.expected_sections = json.load(file)
+
+    def read_fixture(self, name: str) -> str:
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+            return file.read()
+
+    def test_corpus_is_complete(self):
+        fixtures = [name for name in os.listdir(FIXTURES_DIR) if name.endswith(".htm")]
+        self.assertCountEqual(fixtures, list(self.expected_sections))
+
+    def test_section_ranges(self):
+        for name, expected in self.expected_sections.items():
+            with self.subTest(fixture=name):
+                raw_10k = self.read_fixture(name)
+                section_starts = self.parser._locate_sections(raw_10k)
+                section_ranges = {}
+                for index, (item, start) in enumerate(section_starts):
+                    if item in Parse.EXTRACTED_FIELDS:
+                        end = (
+                            section_starts[index + 1][1]
+                            if index < len(section_starts) - 1
+                            else len(raw_10k)
+                        )
+                        section_ranges[item] = [start, end]
+                # dicts preserve order, and the order of sections matters too
+                self.assertListEqual(
+                    list(expected.items()), list(section_ranges.items())
+                )
+
+    def test_document_map(self):
+        name = "uppercase_headings.htm"
+        raw_10k = self.read_fixture(name)
+        document_map = self.parser._split_sections(raw_10k)
+        self.assertListEqual(list(self.expected_sections[name]), list(document_map))
+        for item, (start, end) in self.expected_sections[name].items():
+            soup = BeautifulSoup(raw_10k[start:end], "lxml")
+            self.assertEqual(soup.prettify(), document_map[item]["html"])
+            self.assertEqual(soup.get_text("\n"), document_map[item]["text"])
+
+    def test_document_without_items(self):
+        self.assertDictEqual(
+            {}, self.parser._split_sections("<html><body>Exhibit 21</body></html>")
+        )
+
+    def test_normalize_item_label(self):
+        expected_labels = {
+            ">Item 1A.": "Item1A",
+            ">Item&#160;7": "Item7",
+            ">ITEM&nbsp;9B.": "ITEM9B",
+            "ITEM 10": "ITEM10",
+            ">Items 1": "Item1",
+            "ITEMS 7A": "ITEM7A",
+            ">tem 2.": "Item2",
+            ">m 3": "Item3",
+            ">TEM 14": "ITEM14",
+        }
+        for label, normalized in expected_labels.items():
+            self.assertEqual(normalized, Parse._normalize_item_label(label))
+
+
+if __name__ == "__main__":
+    unittest.main()
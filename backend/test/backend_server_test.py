@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from openpyxl import load_workbook  # type: ignore
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from backend_server import BackendServer  # noqa: E402
+from misc.job_manager import Job, JobState  # noqa: E402
+from misc.rate_limiting import RateLimitTracker  # noqa: E402
+from writer.columnar_writer import ColumnarFormat  # noqa: E402
+from writer.columnar_writer import JsonLinesWriter  # noqa: E402
+
+DOCUMENT = Path(parent_dir, "parse", "test", "fixtures", "long_filing.htm")
+FILINGS = [
+    {
+        "entityName": f"COMPANY {n}",
+        "cikNumber": f"CIK000000000{n}",
+        "filingType": "10-K",
+        "filingDate": f"2021-02-0{n + 1}",
+        "documentAddress10k": f"https://www.sec.gov/Archives/edgar/data/{n}/00000000002100000{n}/d{n}.htm",
+        "extractInfo": True,
+        "stateOfIncorporation": "DE",
+        "ein": "380549190",
+        "hqAddress": {
+            "street1": "ONE AMERICAN ROAD",
+            "street2": None,
+            "city": "DEARBORN",
+            "stateOrCountry": "MI",
+            "zipCode": "48126",
+            "stateOrCountryDescription": "MI",
+        },
+    }
+    for n in range(2)
+]
+
+
+def copy_document(server, url, dest_folder, filename):
+    """Stands in for BackendServer._rate_limited_html_download()"""
+    dest_folder.mkdir(parents=True, exist_ok=True)
+    return Path(shutil.copy(DOCUMENT, Path(dest_folder, filename)))
+
+
+class TestProcessFilings(unittest.TestCase):
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+        self.server = BackendServer(RateLimitTracker(), None, 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def run_job(self) -> Job:
+        job = Job(lambda job: None, "process filings", 0, None)
+        with patch.object(BackendServer, "_rate_limited_html_download", copy_document):
+            self.server._process_filings(
+                job, FILINGS, self.output_folder, False, ColumnarFormat.JSON_LINES
+            )
+        return job
+
+    def summary_companies(self):
+        sheet = load_workbook(Path(self.output_folder, "summary.xlsx")).active
+        return [row[0] for row in sheet.iter_rows(min_row=2, values_only=True)]
+
+    def columnar_companies(self):
+        path = Path(self.output_folder, JsonLinesWriter.FILE_NAME)
+        with gzip.open(path, mode="rt", encoding="utf-8") as file:
+            return [json.loads(line)["entityName"] for line in file]
+
+    def test_resume_after_failed_columnar_save(self):
+        with patch.object(JsonLinesWriter, "save", side_effect=OSError("disk full")):
+            job = self.run_job()
+        self.assertEqual(job.state, JobState.ERROR)
+        companies = sorted(filing["entityName"] for filing in FILINGS)
+        self.assertEqual(sorted(self.summary_companies()), companies)
+        self.assertFalse(Path(self.output_folder, JsonLinesWriter.FILE_NAME).exists())
+
+        # the rows are only added to the output that's missing them, without parsing again
+        job = self.run_job()
+        self.assertEqual(job.state, JobState.COMPLETE)
+        self.assertEqual(job.progress.filings_resumed, len(FILINGS))
+        self.assertEqual(job.progress.filings_parsed, 0)
+        self.assertEqual(sorted(self.summary_companies()), companies)
+        self.assertEqual(sorted(self.columnar_companies()), companies)
+
+        # both outputs are complete now
+        job = self.run_job()
+        self.assertEqual(job.state, JobState.COMPLETE)
+        self.assertEqual(job.progress.filings_written, 0)
+        self.assertEqual(sorted(self.summary_companies()), companies)
+        self.assertEqual(sorted(self.columnar_companies()), companies)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:  # pyarrow is optional, and only needed for Parquet output: the parquet extra
+    pa = None
+    pq = None
+
+
+class ColumnarFormat(str, Enum):
+    PARQUET = "parquet"
+    JSON_LINES = "jsonl"
+
+
+class ColumnarWriter:
+    """
+    Parent class for writers of the machine-readable counterpart of summary.xlsx.
+    Unlike the spreadsheet, cells aren't limited in length, and lists are kept as lists.
+
+    Rows are dicts mapping column names to values; the type of each column (str, list of str, or
+    a dataclass whose fields are all str, given as a dict of its fields) is given by the columns
+    passed to the constructor. Missing values are written as nulls.
+    Rows are written out as they're appended, but only become part of the output on save();
+    rows appended after the last save() are discarded by close().
+    """
+
+    def __init__(self, output_folder: Path, columns: Dict[str, type]) -> None:
+        self.output_folder = Path(output_folder)
+        self.columns = columns
+        self._pending_row_count = 0
+
+    @staticmethod
+    def for_format(
+        output_format: ColumnarFormat, output_folder: Path, columns: Dict[str, type]
+    ) -> "ColumnarWriter":
+        if output_format == ColumnarFormat.PARQUET:
+            return ParquetWriter(output_folder, columns)
+        return JsonLinesWriter(output_folder, columns)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def output_path(self) -> Path:
+        """The file or folder the rows are saved to"""
+        raise NotImplementedError()
+
+    @property
+    def pending_row_count(self) -> int:
+        """Number of rows appended since the last save()"""
+        return self._pending_row_count
+
+    def append_row(self, row: Dict[str, Any]):
+        self._pending_row_count += 1
+
+    def save(self):
+        self._pending_row_count = 0
+
+    def close(self):
+        pass
+
+
+class JsonLinesWriter(ColumnarWriter):
+    """
+    Appends rows to summary.jsonl.gz, one JSON object per line.
+
+    Every save() adds a gzip member to the end of the file; concatenated members are read back
+    as a single stream by gzip.open(), pandas.read_json(..., lines=True) and zcat alike.
+    """
+
+    FILE_NAME = "summary.jsonl.gz"
+
+    def __init__(self, output_folder: Path, columns: Dict[str, type]) -> None:
+        super().__init__(output_folder, columns)
+        self._pending_file: Optional[IO[bytes]] = None
+        self._pending_stream: Optional[IO[str]] = None
+
+    @property
+    def output_path(self) -> Path:
+        return Path(self.output_folder, JsonLinesWriter.FILE_NAME)
+
+    def append_row(self, row: Dict[str, Any]):
+        if self._pending_stream is None:
+            self._pending_file = tempfile.TemporaryFile()
+            self._pending_stream = gzip.open(  # type: ignore
+                self._pending_file, mode="wt", encoding="utf-8"
+            )
+        record = {column: row.get(column) for column in self.columns}
+        self._pending_stream.write(json.dumps(record) + "\n")  # type: ignore
+        super().append_row(row)
+
+    def save(self):
+        if self._pending_stream is not None:
+            self._pending_stream.close()
+            self._pending_file.seek(0)  # type: ignore
+            with open(self.output_path, mode="ab") as file:
+                shutil.copyfileobj(self._pending_file, file)  # type: ignore
+            self.close()
+        super().save()
+
+    def close(self):
+        if self._pending_stream is not None:
+            self._pending_stream.close()
+            self._pending_file.close()  # type: ignore
+            self._pending_stream = None
+            self._pending_file = None
+
+
+class ParquetWriter(ColumnarWriter):
+    """
+    Writes rows to a new Parquet file in the summary.parquet folder, ROW_GROUP_SIZE rows at a time.
+
+    Each save() completes a file, so the folder holds one file per job; pyarrow, pandas and most
+    query engines read the folder as a single dataset. Files are hidden (their names start with ".")
+    until they're complete, which those readers skip.
+    """
+
+    FOLDER_NAME = "summary.parquet"
+    # 10-Ks are long; this keeps a few dozen MB of section text in memory at most
+    ROW_GROUP_SIZE = 64
+
+    def __init__(self, output_folder: Path, columns: Dict[str, type]) -> None:
+        if pa is None:
+            raise ImportError(
+                "Parquet output requires pyarrow to be installed (poetry install -E parquet)"
+            )
+        super().__init__(output_folder, columns)
+        self.schema = pa.schema(
+            [(name, ParquetWriter._arrow_type(kind)) for name, kind in columns.items()]
+        )
+        self._rows: List[Dict[str, Any]] = []
+        self._writer: Optional[Any] = None
+        self._path: Optional[Path] = None
+
+    @staticmethod
+    def _arrow_type(kind: type) -> Any:
+        if kind is list:
+            return pa.list_(pa.string())
+        if is_dataclass(kind):
+            return pa.struct([(field.name, pa.string()) for field in fields(kind)])
+        return pa.string()
+
+    @property
+    def output_path(self) -> Path:
+        return Path(self.output_folder, ParquetWriter.FOLDER_NAME)
+
+    def _temp_path(self) -> Path:
+        return self._path.with_name(f".{self._path.name}.tmp")  # type: ignore
+
+    def append_row(self, row: Dict[str, Any]):
+        self._rows.append(row)
+        super().append_row(row)
+        if len(self._rows) >= ParquetWriter.ROW_GROUP_SIZE:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        if self._writer is None:
+            folder = self.output_path
+            folder.mkdir(parents=True, exist_ok=True)
+            # named after the time, so the files of a folder sort in the order of the jobs
+            self._path = Path(
+                folder,
+                f"part-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet",
+            )
+            self._writer = pq.ParquetWriter(self._temp_path(), self.schema)
+        table = pa.Table.from_pydict(
+            {name: [row.get(name) for row in self._rows] for name in self.columns},
+            schema=self.schema,
+        )
+        self._writer.write_table(table)
+        self._rows = []
+
+    def save(self):
+        if self._rows:
+            self._write_row_group()
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._temp_path(), self._path)  # type: ignore
+            self._writer = None
+        super().save()
+
+    def close(self):
+        self._rows = []
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._temp_path().unlink()
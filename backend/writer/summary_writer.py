@@ -0,0 +1,356 @@
+import json
+import math
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from openpyxl import Workbook, load_workbook  # type: ignore
+from openpyxl.cell import WriteOnlyCell  # type: ignore
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE  # type: ignore
+from openpyxl.styles import Font  # type: ignore
+from openpyxl.utils import get_column_letter, range_boundaries  # type: ignore
+
+_RELATIONSHIPS_NAMESPACE = (
+    "{http://schemas.openxmlformats.org/package/2006/relationships}"
+)
+_SPREADSHEET_NAMESPACE = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_OFFICE_RELATIONSHIP_ID = (
+    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+)
+
+_ROW_TAG_REGEX = re.compile(rb"<row\b([^>]*)>")
+_ROW_NUMBER_REGEX = re.compile(rb'\br="(\d+)"')
+_DIMENSION_REGEX = re.compile(rb'<dimension\b[^>]*?\bref="([^"]*)"[^>]*/>')
+_SHEET_DATA_REGEX = re.compile(rb"<sheetData\s*/>|</sheetData>|</row>")
+
+
+class SummaryWriter:
+    """
+    Appends rows to a summary spreadsheet (e.g. summary.xlsx), without loading or
+    rewriting the rows already in it.
+
+    Rows passed to append_row() are kept in a temporary file until save(), so memory use
+    doesn't grow with the number of rows. save() creates the workbook if needed, then copies
+    the XML of its first worksheet byte for byte, splicing the new rows in before the end of
+    the sheet's data; the other parts of the workbook are copied unchanged. The old rows are
+    never parsed or re-serialized, so saving costs about as much as copying the file.
+
+    Rows are dicts mapping column titles to values. Columns are matched against the titles
+    in the first row of the sheet; titles that aren't there yet are added to the end of it.
+    Lists are written as their string representation, like pandas does.
+    """
+
+    CHUNK_SIZE = 1024**2
+
+    def __init__(self, excel_path: Path, columns: List[str]) -> None:
+        """
+        Parameters:
+            excel_path: the workbook to append to; created on save() if it doesn't exist
+            columns: titles of the columns of a newly created workbook, in order
+        """
+        self.excel_path = Path(excel_path)
+        self._columns: Dict[str, None] = dict.fromkeys(columns)
+        self._pending_rows: IO[str] = tempfile.TemporaryFile(
+            mode="w+", encoding="utf-8"
+        )
+        self._pending_row_count = 0
+
+    def __enter__(self) -> "SummaryWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def pending_row_count(self) -> int:
+        """Number of rows appended since the last save()"""
+        return self._pending_row_count
+
+    def append_row(self, row: Dict[str, Any]):
+        for column in row:
+            self._columns.setdefault(column)
+        self._pending_rows.write(json.dumps(row, default=str))
+        self._pending_rows.write("\n")
+        self._pending_row_count += 1
+
+    def save(self):
+        if not self.excel_path.exists():
+            self._create_workbook()
+        if self._pending_row_count == 0:
+            return
+
+        header = self._read_header()
+        new_columns = [column for column in self._columns if column not in header]
+        columns = header + new_columns
+
+        temp_path = self.excel_path.with_name(f".{self.excel_path.name}.tmp")
+        with zipfile.ZipFile(self.excel_path) as source, zipfile.ZipFile(
+            temp_path, mode="w", compression=zipfile.ZIP_DEFLATED
+        ) as destination:
+            sheet_path = self._first_sheet_path(source)
+            for info in source.infolist():
+                if info.filename == sheet_path:
+                    self._append_to_sheet(
+                        source, destination, info, columns, len(header)
+                    )
+                else:
+                    with source.open(info) as src, destination.open(info, "w") as dst:
+                        shutil.copyfileobj(src, dst, SummaryWriter.CHUNK_SIZE)
+        # atomic, so a crash never leaves a half-written summary behind
+        os.replace(temp_path, self.excel_path)
+
+        self._pending_rows.seek(0)
+        self._pending_rows.truncate()
+        self._pending_row_count = 0
+
+    def close(self):
+        """Discards rows that weren't saved"""
+        self._pending_rows.close()
+
+    def _create_workbook(self):
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        header = []
+        for column in self._columns:
+            cell = WriteOnlyCell(sheet, value=column)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        sheet.append(header)
+        workbook.save(self.excel_path)
+
+    def _read_header(self) -> List[str]:
+        # read-only workbooks are parsed lazily, so only the first row is read here
+        workbook = load_workbook(self.excel_path, read_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            for row in sheet.iter_rows(max_row=1, values_only=True):
+                return [str(value) if value is not None else "" for value in row]
+            return []
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _first_sheet_path(source: zipfile.ZipFile) -> str:
+        """Finds the path of the workbook's first worksheet, following its relationships"""
+
+        def targets(rels_path: str) -> Dict[str, Tuple[str, str]]:
+            root = ET.fromstring(source.read(rels_path))
+            base = posixpath.dirname(posixpath.dirname(rels_path))
+            return {
+                rel.get("Id", ""): (
+                    rel.get("Type", ""),
+                    rel.get("Target", "").lstrip("/")
+                    if rel.get("Target", "").startswith("/")
+                    else posixpath.normpath(
+                        posixpath.join(base, rel.get("Target", ""))
+                    ),
+                )
+                for rel in root.iter(f"{_RELATIONSHIPS_NAMESPACE}Relationship")
+            }
+
+        workbook_path = next(
+            target
+            for rel_type, target in targets("_rels/.rels").values()
+            if rel_type.endswith("/officeDocument")
+        )
+        workbook_rels = targets(
+            posixpath.join(
+                posixpath.dirname(workbook_path),
+                "_rels",
+                f"{posixpath.basename(workbook_path)}.rels",
+            )
+        )
+        first_sheet = next(
+            ET.fromstring(source.read(workbook_path)).iter(
+                f"{_SPREADSHEET_NAMESPACE}sheet"
+            )
+        )
+        return workbook_rels[first_sheet.get(_OFFICE_RELATIONSHIP_ID, "")][1]
+
+    def _scan_sheet(self, source: zipfile.ZipFile, info: zipfile.ZipInfo):
+        """
+        Finds, without parsing the sheet, the number of its last row and the offsets where
+        its XML needs to change: the dimension element, the end of the first row, and the
+        end of the sheet's data.
+        """
+        last_row = 0
+        dimension: Optional[re.Match] = None
+        dimension_offset = 0
+        first_row_end: Optional[int] = None
+        data_end: Optional[re.Match] = None
+        data_end_offset = 0
+        offset = 0
+        carry = b""
+        with source.open(info) as sheet:
+            while True:
+                chunk = sheet.read(SummaryWriter.CHUNK_SIZE)
+                buffer = carry + chunk
+                # so that no tag is split between two searches, anything from the last "<" on
+                # is left for the next one
+                split = buffer.rfind(b"<") if chunk else -1
+                if split == -1:
+                    split = len(buffer)
+                searched, carry = buffer[:split], buffer[split:]
+
+                for match in _ROW_TAG_REGEX.finditer(searched):
+                    number = _ROW_NUMBER_REGEX.search(match.group(1))
+                    last_row = int(number.group(1)) if number else last_row + 1
+                if dimension is None:
+                    dimension = _DIMENSION_REGEX.search(searched)
+                    dimension_offset = offset
+                for match in _SHEET_DATA_REGEX.finditer(searched):
+                    if match.group() != b"</row>":
+                        data_end, data_end_offset = match, offset
+                    elif first_row_end is None:
+                        first_row_end = offset + match.start()
+
+                offset += len(searched)
+                if not chunk:
+                    break
+        if data_end is None:
+            raise ValueError(f"{self.excel_path} has no sheet data to append to")
+        return (
+            last_row,
+            dimension,
+            dimension_offset,
+            first_row_end,
+            data_end,
+            data_end_offset,
+        )
+
+    def _append_to_sheet(
+        self,
+        source: zipfile.ZipFile,
+        destination: zipfile.ZipFile,
+        info: zipfile.ZipInfo,
+        columns: List[str],
+        header_length: int,
+    ):
+        (
+            last_row,
+            dimension,
+            dimension_offset,
+            first_row_end,
+            data_end,
+            data_end_offset,
+        ) = self._scan_sheet(source, info)
+        # the sheet's XML is copied as is, except for these edits:
+        # (offset in the original, number of original bytes to replace, replacement)
+        edits: List[Tuple[int, int, Callable[[IO[bytes]], Any]]] = []
+
+        new_rows_start = last_row + 1
+        header_row = b""
+        if header_length == 0:
+            # the sheet is empty, or at least its first row is; start with a header
+            header_row = _row_xml(new_rows_start, dict(enumerate(columns)))
+            new_rows_start += 1
+        elif len(columns) > header_length and first_row_end is not None:
+            new_titles = dict(enumerate(columns))
+            for index in range(header_length):
+                del new_titles[index]
+            header_cells = _cells_xml(1, new_titles)
+            edits.append((first_row_end, 0, lambda dst: dst.write(header_cells)))
+        last_new_row = new_rows_start + self._pending_row_count - 1
+
+        if dimension is not None:
+            _, _, max_column, _ = range_boundaries(dimension.group(1).decode("utf-8"))
+            new_dimension = f'<dimension ref="A1:{get_column_letter(max(len(columns), max_column or 1))}{last_new_row}"/>'
+            edits.append(
+                (
+                    dimension_offset + dimension.start(),
+                    dimension.end() - dimension.start(),
+                    lambda dst: dst.write(new_dimension.encode("utf-8")),
+                )
+            )
+
+        column_indices = {column: index for index, column in enumerate(columns)}
+        data_is_empty = data_end.group() != b"</sheetData>"
+
+        def write_new_rows(dst: IO[bytes]):
+            if data_is_empty:
+                dst.write(b"<sheetData>")
+            dst.write(header_row)
+            self._write_pending_rows(dst, new_rows_start, column_indices)
+            if data_is_empty:
+                dst.write(b"</sheetData>")
+
+        edits.append(
+            (
+                data_end_offset + data_end.start(),
+                data_end.end() - data_end.start() if data_is_empty else 0,
+                write_new_rows,
+            )
+        )
+        edits.sort(key=lambda edit: edit[0])
+
+        sheet_info = zipfile.ZipInfo(info.filename, date_time=time.localtime()[:6])
+        sheet_info.compress_type = zipfile.ZIP_DEFLATED
+        with source.open(info) as src, destination.open(
+            sheet_info, "w", force_zip64=True
+        ) as dst:
+            position = 0
+            for offset, replaced_length, write_replacement in edits:
+                _copy_bytes(src, dst, offset - position)
+                write_replacement(dst)
+                src.read(replaced_length)
+                position = offset + replaced_length
+            shutil.copyfileobj(src, dst, SummaryWriter.CHUNK_SIZE)
+
+    def _write_pending_rows(
+        self, destination: IO[bytes], first_row: int, column_indices: Dict[str, int]
+    ):
+        self._pending_rows.seek(0)
+        for row_number, line in enumerate(self._pending_rows, start=first_row):
+            row = json.loads(line)
+            destination.write(
+                _row_xml(
+                    row_number,
+                    {column_indices[column]: value for column, value in row.items()},
+                )
+            )
+        self._pending_rows.seek(0, os.SEEK_END)
+
+
+def _copy_bytes(source: IO[bytes], destination: IO[bytes], count: int):
+    while count > 0:
+        chunk = source.read(min(count, SummaryWriter.CHUNK_SIZE))
+        if not chunk:
+            break
+        destination.write(chunk)
+        count -= len(chunk)
+
+
+def _cell_xml(reference: str, value: Any) -> bytes:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return b""
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'.encode("utf-8")
+    if isinstance(value, (int, float)):
+        return f'<c r="{reference}"><v>{value}</v></c>'.encode("utf-8")
+    text = ILLEGAL_CHARACTERS_RE.sub("", str(value))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'.encode(
+        "utf-8"
+    )
+
+
+def _cells_xml(row_number: int, values: Dict[int, Any]) -> bytes:
+    return b"".join(
+        _cell_xml(f"{get_column_letter(index + 1)}{row_number}", values[index])
+        for index in sorted(values)
+    )
+
+
+def _row_xml(row_number: int, values: Dict[int, Any]) -> bytes:
+    return (
+        f'<row r="{row_number}">'.encode("utf-8")
+        + _cells_xml(row_number, values)
+        + b"</row>"
+    )
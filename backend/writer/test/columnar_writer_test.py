@@ -0,0 +1,130 @@
+import gzip
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+import columnar_writer  # type: ignore # noqa: E402
+from columnar_writer import ColumnarFormat  # type: ignore # noqa: E402
+from columnar_writer import ColumnarWriter  # type: ignore # noqa: E402
+from write_to_excel import DataWriter  # type: ignore # noqa: E402
+
+COLUMNS = {"entityName": str, "item1": str, "item1_ner": list}
+LONG_SECTION = "Business. " * 10000  # too long for an Excel cell
+
+# a Filing of the frontend, as it's sent to process_filing_set
+UI_FILING = {
+    "entityName": "FORD MOTOR CO",
+    "cikNumber": "CIK0000037996",
+    "filingType": "10-K",
+    "filingDate": "2021-02-04",
+    "documentAddress10k": "https://sec.gov/Archives/edgar/data/37996/000003799621000012/f-20201231.htm",
+    "extractInfo": True,
+    "stateOfIncorporation": "DE",
+    "ein": "380549190",
+    "hqAddress": {
+        "street1": "ONE AMERICAN ROAD",
+        "street2": None,
+        "city": "DEARBORN",
+        "stateOrCountry": "MI",
+        "zipCode": "48126",
+        "stateOrCountryDescription": "MI",
+    },
+    "status": "In Progress",
+}
+
+
+class TestColumnarWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_folder = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_jobs(self, output_format: ColumnarFormat):
+        with ColumnarWriter.for_format(
+            output_format, self.output_folder, COLUMNS
+        ) as writer:
+            writer.append_row(
+                {"entityName": "Ford", "item1": LONG_SECTION, "item1_ner": ["Ford"]}
+            )
+            writer.save()
+        with ColumnarWriter.for_format(
+            output_format, self.output_folder, COLUMNS
+        ) as writer:
+            writer.append_row({"entityName": "Tesla"})
+            writer.save()
+            writer.append_row({"entityName": "never saved"})
+
+    def test_json_lines(self):
+        self.write_jobs(ColumnarFormat.JSON_LINES)
+        with gzip.open(
+            Path(self.output_folder, columnar_writer.JsonLinesWriter.FILE_NAME),
+            mode="rt",
+        ) as file:
+            rows = [json.loads(line) for line in file]
+        self.assertListEqual(
+            [
+                {"entityName": "Ford", "item1": LONG_SECTION, "item1_ner": ["Ford"]},
+                {"entityName": "Tesla", "item1": None, "item1_ner": None},
+            ],
+            rows,
+        )
+
+    @unittest.skipIf(columnar_writer.pq is None, "pyarrow is not installed")
+    def test_parquet(self):
+        # one row group per row
+        with patch.object(columnar_writer.ParquetWriter, "ROW_GROUP_SIZE", 1):
+            self.write_jobs(ColumnarFormat.PARQUET)
+        folder = Path(self.output_folder, columnar_writer.ParquetWriter.FOLDER_NAME)
+        self.assertListEqual([], list(folder.glob(".*")))
+        table = columnar_writer.pq.read_table(folder)
+        self.assertListEqual(["Ford", "Tesla"], sorted(table["entityName"].to_pylist()))
+        self.assertIn(LONG_SECTION, table["item1"].to_pylist())
+        self.assertIn(["Ford"], table["item1_ner"].to_pylist())
+
+    def write_ui_filing(self, output_format: ColumnarFormat):
+        row = DataWriter()._build_columnar_row(
+            UI_FILING,
+            {"item1": {"text": LONG_SECTION}},
+            {"item1": {"Ford", "Dearborn"}},
+        )
+        with ColumnarWriter.for_format(
+            output_format, self.output_folder, DataWriter.COLUMNAR_COLUMNS
+        ) as writer:
+            writer.append_row(row)
+            writer.save()
+
+    def test_ui_filing_json_lines(self):
+        self.write_ui_filing(ColumnarFormat.JSON_LINES)
+        with gzip.open(
+            Path(self.output_folder, columnar_writer.JsonLinesWriter.FILE_NAME),
+            mode="rt",
+        ) as file:
+            (row,) = [json.loads(line) for line in file]
+        self.assertDictEqual(UI_FILING["hqAddress"], row["hqAddress"])
+        self.assertListEqual(["Dearborn", "Ford"], row["item1_ner"])
+        self.assertNotIn("status", row)
+
+    @unittest.skipIf(columnar_writer.pq is None, "pyarrow is not installed")
+    def test_ui_filing_parquet(self):
+        self.write_ui_filing(ColumnarFormat.PARQUET)
+        table = columnar_writer.pq.read_table(
+            Path(self.output_folder, columnar_writer.ParquetWriter.FOLDER_NAME)
+        )
+        self.assertListEqual([UI_FILING["hqAddress"]], table["hqAddress"].to_pylist())
+        self.assertListEqual(["FORD MOTOR CO"], table["entityName"].to_pylist())
+        self.assertListEqual([LONG_SECTION], table["item1"].to_pylist())
+
+
+if __name__ == "__main__":
+    unittest.main()
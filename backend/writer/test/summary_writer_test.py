@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook  # type: ignore
+
+# Weird way to import a parent module in Python
+folder_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.dirname(folder_dir)
+sys.path.append(parent_dir)
+
+from summary_writer import SummaryWriter  # type: ignore # noqa: E402
+
+
+class TestSummaryWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.excel_path = Path(self.temp_dir.name, "summary.xlsx")
+        self.columns = ["Company Name", "EIN", "NER 1. Business"]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_rows(self):
+        workbook = load_workbook(self.excel_path)
+        return [list(row) for row in workbook.active.iter_rows(values_only=True)]
+
+    def test_new_workbook(self):
+        with SummaryWriter(self.excel_path, self.columns) as writer:
+            writer.append_row(
+                {"Company Name": "Ford", "NER 1. Business": ["Detroit", "Ford"]}
+            )
+            writer.append_row({"EIN": "000123", "Company Name": "<Tesla & Co>"})
+            writer.save()
+            self.assertEqual(0, writer.pending_row_count)
+        self.assertListEqual(
+            [
+                self.columns,
+                ["Ford", None, "['Detroit', 'Ford']"],
+                ["<Tesla & Co>", "000123", None],
+            ],
+            self.read_rows(),
+        )
+        self.assertEqual("A1:C3", load_workbook(self.excel_path).active.dimensions)
+
+    def test_append_across_saves(self):
+        for name in ["Ford", "Tesla", "Rivian"]:
+            with SummaryWriter(self.excel_path, self.columns) as writer:
+                writer.append_row({"Company Name": name})
+                writer.save()
+        self.assertListEqual(
+            [["Ford"], ["Tesla"], ["Rivian"]],
+            [row[:1] for row in self.read_rows()[1:]],
+        )
+
+    def test_append_to_pandas_spreadsheet(self):
+        # summaries written by older versions, with pandas
+        pd.DataFrame({"Company Name": ["Ford"], "EIN": ["000123"]}).to_excel(
+            self.excel_path, index=False
+        )
+        with SummaryWriter(self.excel_path, self.columns) as writer:
+            writer.append_row({"Company Name": "Tesla", "NER 1. Business": ["Texas"]})
+            writer.save()
+        self.assertListEqual(
+            [
+                ["Company Name", "EIN", "NER 1. Business"],
+                ["Ford", "000123", None],
+                ["Tesla", None, "['Texas']"],
+            ],
+            self.read_rows(),
+        )
+        appended = pd.read_excel(self.excel_path)
+        self.assertListEqual(["Ford", "Tesla"], list(appended["Company Name"]))
+
+    def test_append_to_empty_sheet(self):
+        Workbook().save(self.excel_path)
+        with SummaryWriter(self.excel_path, self.columns) as writer:
+            writer.append_row({"Company Name": "Ford", "EIN": 123})
+            writer.save()
+        self.assertListEqual(
+            [self.columns, ["Ford", 123, None]],
+            self.read_rows(),
+        )
+
+    def test_illegal_characters(self):
+        with SummaryWriter(self.excel_path, self.columns) as writer:
+            writer.append_row({"Company Name": "Ford\x00\x0b Motor"})
+            writer.save()
+        self.assertEqual("Ford Motor", self.read_rows()[1][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
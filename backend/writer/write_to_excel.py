@@ -1,23 +1,27 @@
 import os
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Any, Dict, NamedTuple, Optional, Set
-
-import pandas as pd
+from typing import TYPE_CHECKING, Any, Dict, NamedTuple, Optional, Set
 
 folder_dir = os.path.dirname(os.path.realpath(__file__))
 parent_dir = os.path.dirname(folder_dir)
 sys.path.append(parent_dir)
 
-from api.connection import BulkAddressData  # noqa: E402
+from api.connection import AddressData, BulkAddressData  # noqa: E402
+from writer.columnar_writer import ColumnarFormat, ColumnarWriter  # noqa: E402
+from writer.summary_writer import SummaryWriter  # noqa: E402
+
+# pandas takes a while to import, and is only used by the older DataFrame methods
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class FrontendFilingRequest(NamedTuple):
     entityName: str  # name of entity
     cikNumber: str  # cik number
     ein: str
-    hqAddress: str
+    hqAddress: AddressData  # sent as a dict of its fields
     stateOfIncorporation: str
     filingType: str  # type of filing
     filingDate: str  # filing date
@@ -97,30 +101,66 @@ class DataWriter:
         "item13_ner": "NER 13. Certain Relationships",
     }
 
+    SUMMARY_COLUMNS = [
+        "Company Name",
+        "EIN",
+        "HQ Address",
+        "State of Incorporation",
+    ] + list(SECTION_TITLES.values())
+
+    # Columns of the optional Parquet / JSON lines output, and their types:
+    # the filing's metadata (its address as AddressData's fields), then the full text of each
+    # section and the list of its entities
+    COLUMNAR_METADATA = [
+        field for field in FrontendFilingRequest._fields if field != "extractInfo"
+    ]
+    COLUMNAR_COLUMNS: Dict[str, type] = (
+        dict.fromkeys(COLUMNAR_METADATA, str)
+        | {"hqAddress": AddressData}
+        | {key: list if key.endswith("_ner") else str for key in SECTION_TITLES}
+    )
+
     def pwd(self):  # debug method to be called from the frontend
         return os.getcwd()
 
     def _load_main_spreadsheet(
         self, working_directory: str
     ):  # loads spreadsheet as DataFrame, or creates one if it doesn't exist
+        import pandas as pd
+
         # assume that the working directory exists
         excel_path = Path(working_directory, "summary.xlsx")
         if excel_path.exists():
             return pd.read_excel(excel_path)
         else:
-            column_names = [
-                "Company Name",
-                "EIN",
-                "HQ Address",
-                "State of Incorporation",
-            ] + list(DataWriter.SECTION_TITLES.values())
-            return pd.DataFrame(columns=column_names)
+            return pd.DataFrame(columns=DataWriter.SUMMARY_COLUMNS)
+
+    def _open_main_spreadsheet(self, working_directory: str) -> SummaryWriter:
+        """
+        Opens summary.xlsx in the working directory for appending rows with
+        SummaryWriter.append_row(); it's created on SummaryWriter.save() if it doesn't exist.
+        Unlike _load_main_spreadsheet(), the rows already in it aren't loaded.
+        """
+        return SummaryWriter(
+            Path(working_directory, "summary.xlsx"), DataWriter.SUMMARY_COLUMNS
+        )
+
+    def _open_columnar_output(
+        self, working_directory: str, output_format: ColumnarFormat
+    ) -> ColumnarWriter:
+        """
+        Opens the Parquet or JSON lines counterpart of summary.xlsx in the working directory,
+        for appending rows built with _build_columnar_row().
+        """
+        return ColumnarWriter.for_format(
+            output_format, Path(working_directory), DataWriter.COLUMNAR_COLUMNS
+        )
 
     # goes elsewhere
 
     def add_dataframe_row(
         self,
-        df: pd.DataFrame,
+        df: "pd.DataFrame",
         filing_info: Dict[str, Any],
         parser_results: Dict[str, Dict[str, str]],
         ner_results: Dict[str, Set[str]],
@@ -133,6 +173,30 @@ class DataWriter:
             parser_results: the return value of Parse.parse_document() for the filing in question
             ner_results: the return value of Parse._apply_named_entity_recognition() for the filing in question
         Returns the new, expanded dataframe, either to be written to disk or to be further expanded.
+
+        This copies the whole DataFrame; to add many rows, use _open_main_spreadsheet() instead.
+        """
+        all_row_data = self._build_summary_row(filing_info, parser_results, ner_results)
+        all_row_data_formatted: Dict[str, Any] = {}
+        for key in all_row_data.keys():
+            all_row_data_formatted[key] = []
+            all_row_data_formatted[key].append(all_row_data[key])
+        import pandas as pd
+
+        new_row = pd.DataFrame(all_row_data_formatted)
+        return pd.concat(
+            [df, new_row], sort=False, verify_integrity=True, ignore_index=True
+        )
+
+    def _build_summary_row(
+        self,
+        filing_info: Dict[str, Any],
+        parser_results: Dict[str, Dict[str, str]],
+        ner_results: Dict[str, Set[str]],
+    ) -> Dict[str, Any]:
+        """
+        Maps the titles of the summary spreadsheet's columns to the values of a new 10-K filing's row.
+        Takes the same arguments as add_dataframe_row(). NER results are sorted lists of entities.
         """
         metadata = {
             "EIN": filing_info["ein"],
@@ -153,19 +217,45 @@ class DataWriter:
             f"{section}_ner": sorted(list(ner_results[section]))
             for section in ner_results.keys()
         }
-        all_row_data = metadata | {
+        return metadata | {
             DataWriter.SECTION_TITLES[key]: all_section_data[key]
             for key in all_section_data.keys()
         }
-        all_row_data_formatted: Dict[str, Any] = {}
-        for key in all_row_data.keys():
-            all_row_data_formatted[key] = []
-            all_row_data_formatted[key].append(all_row_data[key])
-        # for ele in all_row_data.keys():
-        #    print(ele)
-        #    print(len(all_row_data_formatted[ele]))
-        # print(all_row_data) #todo remove debug
-        new_row = pd.DataFrame(all_row_data_formatted)
-        return pd.concat(
-            [df, new_row], sort=False, verify_integrity=True, ignore_index=True
-        )
+
+    def _build_columnar_row(
+        self,
+        filing_info: Dict[str, Any],
+        parser_results: Dict[str, Dict[str, str]],
+        ner_results: Dict[str, Set[str]],
+    ) -> Dict[str, Any]:
+        """
+        Maps the columns of COLUMNAR_COLUMNS to the values of a new 10-K filing's row.
+        Takes the same arguments as add_dataframe_row(). Unlike _build_summary_row(), sections
+        aren't shortened to fit in Excel. Sections and entities that weren't found are left out.
+        """
+        row = {
+            field: filing_info[field]
+            for field in DataWriter.COLUMNAR_METADATA
+            if field in filing_info
+        }
+        if "hqAddress" in row:
+            row["hqAddress"] = self._columnar_address(row["hqAddress"])
+        for section in parser_results:
+            row[section] = parser_results[section]["text"]
+        for section in ner_results:
+            row[f"{section}_ner"] = sorted(ner_results[section])
+        return row
+
+    def _columnar_address(self, address: Any) -> Optional[Dict[str, Optional[str]]]:
+        """
+        The fields of AddressData in an address from the frontend, as the strings (or nulls)
+        of the hqAddress struct of the Parquet output. Anything but a dict is left out.
+        """
+        if not isinstance(address, dict):
+            return None
+        return {
+            field.name: str(address[field.name])
+            if address.get(field.name) is not None
+            else None
+            for field in fields(AddressData)
+        }
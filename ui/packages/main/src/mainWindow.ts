@@ -1,7 +1,7 @@
 import {BrowserWindow, ipcMain, app} from 'electron';
 import {join, normalize} from 'path';
 import {URL} from 'url';
-import {connectToBackend,remoteCall} from './remote-procedure';
+import {connectToBackend,remoteCall,remoteStream} from './remote-procedure';
 import {spawn} from 'child_process';
 import { getPythonExecutableDir, getPythonExecutableName, gracefullyKillChild } from './platform-specific';
 import { createInterface } from 'readline';
@@ -11,6 +11,10 @@ async function createWindow() {
   ipcMain.handle('rpc', async (event, props) => {
     return remoteCall(props.name, props.args);
   });
+  // forwards the events of a job to the window as they're streamed; resolves once the job has finished
+  ipcMain.handle('streamJobEvents', async (event, jobId) => {
+    return remoteStream('stream_job_events', [jobId], (jobEvent) => event.sender.send('jobEvent', jobEvent));
+  });
   ipcMain.handle('getPath', ()=>app.getPath('desktop')); // todo make names more descriptive
   ipcMain.handle('selectOutputPath', async (event, props) => {
     return dialog.showOpenDialogSync({ properties: ['openDirectory', 'createDirectory', 'promptToCreate'] }); // return string[] or undefined, configure for no selection!!!
@@ -25,4 +25,23 @@ export async function remoteCall(funcName:string, args: any[] = []) {
         });
     });
 
-}
\ No newline at end of file
+}
+
+// For functions decorated with @zerorpc.stream: onItem is called with each item as it arrives,
+// and the promise resolves once the stream has ended.
+export async function remoteStream(funcName:string, args: any[], onItem: (item:any) => void) {
+    if (!connected){
+        throw new Error('Not connected to the backend!');
+    }
+    return new Promise<void>((resolve, reject) => {
+        client.invoke(funcName, ...args, (error:any, item:any, more:boolean) => {
+            if (error) {
+                reject(error);
+            } else if (more) {
+                onItem(item);
+            } else {
+                resolve();
+            }
+        });
+    });
+}
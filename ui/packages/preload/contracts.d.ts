@@ -5,6 +5,7 @@ interface Exposed {
   readonly requestRPC: Readonly<typeof import('./src/requestRPC').requestRPC>;
   readonly desktopPath: Readonly<typeof import('./src/desktopPath').desktopPath>;
   readonly pathSelector: Readonly<typeof import('./src/pathSelector').pathSelector>;
+  readonly jobEvents: Readonly<typeof import('./src/jobEvents').jobEvents>;
 }
 
 
@@ -7,4 +7,5 @@ import './versions';
 import './requestRPC';
 import './desktopPath';
 import './pathSelector';
+import './jobEvents';
 
@@ -0,0 +1,22 @@
+import { ipcRenderer, IpcRendererEvent } from 'electron';
+import { exposeInMainWorld } from './exposeInMainWorld';
+
+// Calls onEvent with each event of the job (see stream_job_events() in the backend), starting with
+// its current state. Resolves once the job has finished, or rejects if the stream is cut off.
+async function streamJobEvents(jobId: string, onEvent: (jobEvent: any) => void) {
+    const listener = (_event: IpcRendererEvent, jobEvent: any) => {
+        if (jobEvent.job.job_id === jobId) {
+            onEvent(jobEvent);
+        }
+    };
+    ipcRenderer.on('jobEvent', listener);
+    try {
+        await ipcRenderer.invoke('streamJobEvents', jobId);
+    } finally {
+        ipcRenderer.removeListener('jobEvent', listener);
+    }
+}
+
+export const jobEvents = {streamJobEvents} as const;
+
+exposeInMainWorld('jobEvents', jobEvents);
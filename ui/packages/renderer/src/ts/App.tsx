@@ -155,25 +155,55 @@ interface FormData { // data for the form
 }
 
 /**
- * @description interface that holds the state of backend
- * @params state: JobState, error: any
+ * @description interface that holds the result of one query of a batch form search
+ * @params cik: string, forms: Array<string>, start_date: string, end_date: string, result: FormData | null, error: string | null
  */
-interface BackendState{
-  'state': JobState, // specifies step of the process for a job
-  'error' : string | null // error message if any
+interface FormInfoBatchItem { // result of one line of a bulk import
+  cik: string; // normalized cik number
+  forms: Array<string>; // normalized forms
+  start_date: string; // start date
+  end_date: string; // end date
+  result: FormData | null; // form data, null if there was an error
+  error: string | null; // error message if any
+}
+
+/**
+ * @description interface that holds the state of a job of the backend
+ * @params job_id: string, state: JobState, error: string | null, finished_at: number | null
+ */
+interface JobInfo {
+  job_id: string; // id returned by process_filing_set
+  state: JobState; // specifies step of the process for a job
+  error: string | null; // error message if any
+  finished_at: number | null; // when the job finished, in seconds since the epoch, null if it hasn't
+}
+
+/**
+ * @description interface that holds an event streamed by the backend for a job
+ * @params event: string, job: JobInfo, filing_url: string | null, message: string | null
+ */
+interface JobEvent {
+  event: string; // type of event, e.g. 'state' or 'filing_downloaded'
+  job: JobInfo; // the job as of the event
+  filing_url: string | null; // documentAddress10k of the filing, for filing events
+  message: string | null; // error message of a failed filing
 }
 
 /**
  * @description enumeration of the states of jobs
- * @params NO_WORK, WORKING, COMPLETE, ERROR
+ * @params NO_WORK, QUEUED, WORKING, COMPLETE, ERROR, CANCELLED
  */
 enum JobState {
   NO_WORK = 'No Work', // job is not working
+  QUEUED = 'Queued', // job is waiting for other jobs to finish
   WORKING = 'Working', // job is working
   COMPLETE = 'Complete', // job is complete
-  ERROR = 'Error' // job has an error
+  ERROR = 'Error', // job has an error
+  CANCELLED = 'Cancelled' // job was cancelled
 }
 
+const FINISHED_JOB_STATES = [JobState.COMPLETE, JobState.ERROR, JobState.CANCELLED];
+
 /**
  * @description interface that holds information for a search result
  * @params cik: string, entity: string
@@ -362,7 +392,8 @@ function App() {
   const [performNER, setPerformNER] = useState(false); // check box for NER changes this value
   const [smShow, setSmShow] = useState(false); // shows popup for input file
   const [path, setPath] = useState(''); // path for download] # await window.desktopPath.getDesktopPath()
-  const [spinnerOn, setSpinnerOn] = useState(true); // spinner for download
+  const [spinnerOn, setSpinnerOn] = useState(false); // spinner for download
+  const [jobs, setJobs] = useState(new Map<string, JobInfo>()); // jobs of the backend by id, as of their last event
   
   // Entity search and result setup
   let result = useRef<Result>(new Result('', ''));
@@ -379,13 +410,43 @@ function App() {
     setPathToDesktop().catch(console.log);
   }, []); // empty list as second argument means that it only triggers once, on component mount. Acts like a 'default'
 
-  // Periodically poll the state of the backend
+  // Follow the jobs the backend is already working on, e.g. after the window was reloaded
   useEffect(()=> {
-    const timer = setInterval(()=>{
-      pollJobState();
-    }, 1000); //poll every second
-    return ()=> clearInterval(timer);
-  });
+    const followRunningJobs = async () => {
+      let runningJobs: JobInfo[] = await window.requestRPC.procedure('list_jobs');
+      for (let job of runningJobs) {
+        updateJob(job);
+        if (!FINISHED_JOB_STATES.includes(job.state)) {
+          followJob(job.job_id).catch(console.log);
+        }
+      }
+    };
+    followRunningJobs().catch(console.log);
+  }, []);
+
+  // Show the spinner while any job is queued or working, and the error of the job that finished last
+  useEffect(()=> {
+    let jobList = Array.from(jobs.values());
+    setSpinnerOn(jobList.some(job => !FINISHED_JOB_STATES.includes(job.state)));
+    let lastJob: JobInfo | null = null;
+    for (let job of jobList) {
+      if (job.finished_at !== null && (lastJob === null || job.finished_at > (lastJob.finished_at ?? 0))) {
+        lastJob = job;
+      }
+    }
+
+    // Since the backend will halt a job on its first uncaught exception, there's only ever a single error
+    // message to consider from it. Thus, we dedicate a key in the off-canvas alert map to this: 'backend_job_error'.
+    setAlertMessageOffcanvasMap(alertMap => {
+      let newAlertMap = new Map<string, AlertData>(alertMap);
+      if (lastJob === null || lastJob.error === null){
+        newAlertMap.delete('backend_job_error');
+      } else {
+        newAlertMap.set('backend_job_error', new AlertData(lastJob.error, true));
+      }
+      return newAlertMap;
+    });
+  }, [jobs]);
 
   // Add a new filing to the queue map
   const addQueueFilingToMap = (f: Filing) => {
@@ -507,23 +568,26 @@ function App() {
         filing[1].status = DocumentState.IN_PROGRESS;
       }
     }
-    await window.requestRPC.procedure('process_filing_set', [Array.from(queueFilingMap.values()), path, performNER]);
+    let jobId: string = await window.requestRPC.procedure('process_filing_set', [Array.from(queueFilingMap.values()), path, performNER]);
+    followJob(jobId).catch(console.log);
+  };
 
+  const updateJob = (job: JobInfo) => { // Triggers on each event streamed for a job
+    setJobs(oldJobs => new Map<string, JobInfo>(oldJobs).set(job.job_id, job));
   };
 
-  const pollJobState = async () => { // Triggers every second
-    let backendState: BackendState = await window.requestRPC.procedure('get_job_state');
-    setSpinnerOn(backendState.state === JobState.WORKING);
-    
-    // Since the backend will halt a job on its first uncaught exception, there's only ever a single error
-    // message to consider from it. Thus, we dedicate a key in the off-canvas alert map to this: 'backend_job_error'.
-    let newAlertMap = new Map<string, AlertData>(alertMessageOffcanvasMap);
-    if (backendState.error === null){
-      newAlertMap.delete('backend_job_error');
-    } else {
-      newAlertMap.set('backend_job_error', new AlertData(backendState.error, true));
+  const followJob = async (jobId: string) => { // Streams the events of a job until it has finished
+    let finished = false;
+    while (!finished) {
+      try {
+        await window.jobEvents.streamJobEvents(jobId, (jobEvent: JobEvent) => updateJob(jobEvent.job));
+        finished = true; // the stream ends once the job has finished
+      } catch (error) {
+        // the stream was cut off; subscribing again starts with the current state of the job
+        console.log(error);
+        await new Promise(resolve => setTimeout(resolve, 1000));
+      }
     }
-    setAlertMessageOffcanvasMap(newAlertMap);
   };
 
   const handleOutputPath = async () => {
@@ -649,30 +713,14 @@ function App() {
           });
         });
         let newQueueFilingMap = new Map<string,Filing>(queueFilingMap);
+        let type = '10-K';
+        let queries: [string, string[], string, string][] = []; // search_form_info arguments for each valid line
+        let queryLines: number[] = []; // index of the line each query came from
         for (let i = 0; i < lines.length; i++){ // iterate through all lines
           if (lines[i][0] !== null && lines[i][1] !== null && lines[i][2] !== null) { // check if line has at least 3 words
-            let type = '10-K';
-            try {
-              // get filings from backend
-              let filingResults:FormData | null = await window.requestRPC.procedure('search_form_info', [lines[i][0], [type], lines[i][1], lines[i][2]]);
-              if (filingResults !== null) {
-                let filingRows = filingResults.filings.map((filing) => new Filing(filingResults!.issuing_entity, filingResults!.cik, type, filing.filingDate, filing.document, false, filingResults!.state_of_incorporation, filingResults!.ein, filingResults!.address.business, DocumentState.SEARCH));
-                for (let ind = 0; ind < filingRows.length; ind++){ // add all filings to the queue
-                  addQueueFilingToMap(filingRows[ind]);
-                  newQueueFilingMap = new Map<string,Filing>(newQueueFilingMap);
-                  newQueueFilingMap.set(filingRows[ind].documentAddress10k, filingRows[ind]);
-                }
-              }
-            }
-            catch(error: any){
-              // add error to Alert Map
-              let strError = error.message;
-              strError = strError.split(':').pop();
-              strError = 'Line ' + (i + 1) + ': ' + strError;
-              let errorMessage: AlertData = new AlertData(strError, true); // create error message for empty search
-              addSearchAlertToAlertMap(errorMessage); // set alert message
+            queries.push([lines[i][0], [type], lines[i][1], lines[i][2]]);
+            queryLines.push(i);
           }
-        }
           else { // 
             let strError = 'You need to put in a CIK and a start date and an end date for line ' + (i + 1);
             let errorMessage: AlertData = new AlertData(strError, true); // create error message for empty search
@@ -680,6 +728,34 @@ function App() {
 
           }
         }
+        let batchResults: FormInfoBatchItem[] = [];
+        try {
+          // get filings for every line from backend at once; it looks them up concurrently
+          batchResults = await window.requestRPC.procedure('search_form_info_batch', [queries]);
+        }
+        catch(error: any){
+          let strError = error.message;
+          strError = strError.split(':').pop();
+          let errorMessage: AlertData = new AlertData(strError, true); // create error message for failed import
+          addSearchAlertToAlertMap(errorMessage); // set alert message
+        }
+        for (let j = 0; j < batchResults.length; j++){ // iterate through the results of each line
+          let filingResults: FormData | null = batchResults[j].result;
+          if (batchResults[j].error !== null) {
+            // add error to Alert Map
+            let strError = 'Line ' + (queryLines[j] + 1) + ': ' + batchResults[j].error;
+            let errorMessage: AlertData = new AlertData(strError, true); // create error message for failed search
+            addSearchAlertToAlertMap(errorMessage); // set alert message
+          }
+          else if (filingResults !== null) {
+            let filingRows = filingResults.filings.map((filing) => new Filing(filingResults!.issuing_entity, filingResults!.cik, type, filing.filingDate, filing.document, false, filingResults!.state_of_incorporation, filingResults!.ein, filingResults!.address.business, DocumentState.SEARCH));
+            for (let ind = 0; ind < filingRows.length; ind++){ // add all filings to the queue
+              addQueueFilingToMap(filingRows[ind]);
+              newQueueFilingMap = new Map<string,Filing>(newQueueFilingMap);
+              newQueueFilingMap.set(filingRows[ind].documentAddress10k, filingRows[ind]);
+            }
+          }
+        }
         setQueueFilingMap(newQueueFilingMap);
       }
     };